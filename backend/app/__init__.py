@@ -6,10 +6,11 @@ from flask_migrate import Migrate
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from config import Config
+from app.utils.db_routing import RoutingSession
 import os
 
-# Initialize extensions
-db = SQLAlchemy()
+# Initialize extensions (the session routes @read_replica SELECTs, see app/utils/db_routing.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 login_manager = LoginManager()
 
@@ -41,37 +42,95 @@ def create_app(config_class=Config):
     })
 
     # Create upload directory
-    upload_dir = os.path.join(app.root_path, 'static', 'uploads', 'stubs')
+    upload_dir = app.config.get('STUB_UPLOAD_FOLDER') or os.path.join(app.root_path, 'static', 'uploads', 'stubs')
+    app.config['STUB_UPLOAD_FOLDER'] = upload_dir
     os.makedirs(upload_dir, exist_ok=True)
 
+    # Image storage backend (see app/services/storage.py)
+    from app.services.storage import init_storage
+    init_storage(app)
+
+    # Engine profile: pool sizing, timeouts and SQLite pragmas per backend (see app/utils/db_engine.py)
+    from app.utils.db_engine import configure_engine_options, init_engine
+    configure_engine_options(app)
+
+    # Read replica binds for @read_replica endpoints (see app/utils/db_routing.py)
+    from app.utils.db_routing import configure_replicas, init_replica_routing
+    configure_replicas(app)
+
     # Initialize extensions with app
     db.init_app(app)
+    init_engine(app, db)
+    init_replica_routing(app)
     migrate.init_app(app, db)  # Initialize Flask-Migrate
     login_manager.init_app(app)
     
     # FIXED: Initialize rate limiter
     limiter.init_app(app)
 
+    # OpenTelemetry tracing, registered first so the request span wraps everything else (see app/utils/tracing.py)
+    from app.utils.tracing import init_tracing
+    init_tracing(app)
+
+    # Per-request SQL query counting (see app/utils/query_counter.py)
+    from app.utils.query_counter import init_query_counter
+    init_query_counter(app)
+
+    # Prometheus metrics (see app/utils/metrics.py)
+    from app.utils.metrics import init_metrics
+    init_metrics(app)
+
+    # Read-through cache for public marketplace pages (see app/utils/response_cache.py)
+    from app.utils.response_cache import init_response_cache
+    init_response_cache(app)
+
+    # Canonical events and venues for extracted names (see app/services/entity_normalizer.py)
+    from app.services.entity_normalizer import init_entity_index
+    init_entity_index(app)
+
+    # Market-value index kept in step with listing changes (see app/services/price_index.py)
+    from app.services.price_index import init_price_index
+    init_price_index(app)
+
+    # In-memory typeahead for marketplace search (see app/services/typeahead.py)
+    from app.services.typeahead import init_typeahead
+    init_typeahead(app)
+
+    # Admin-only sampling profiler, opt-in via PROFILER_ENABLED (see app/utils/profiler.py)
+    from app.utils.profiler import init_profiler
+    init_profiler(app)
+
     # FIXED: Import all models for Flask-Migrate to detect them
     from app import models
 
     # Import and register blueprints
-    from app.routes import auth, stubs, marketplace, direct_charges_payments, chatbot, stubcreationagent
+    from app.routes import auth, stubs, marketplace, direct_charges_payments, chatbot, stubcreationagent, metrics, profiler, media, exports
     app.register_blueprint(auth.bp, url_prefix='/auth')
     app.register_blueprint(stubs.bp, url_prefix='/api')
     app.register_blueprint(marketplace.bp, url_prefix='/api')
     app.register_blueprint(direct_charges_payments.bp, url_prefix='/api')  # NEW: Payment routes
     app.register_blueprint(chatbot.bp, url_prefix='/api/chatbot')  # NEW: Chatbot routes
     app.register_blueprint(stubcreationagent.bp, url_prefix='/api')  # NEW: Stub creation agent routes
+    app.register_blueprint(exports.bp, url_prefix='/api')  # Streaming CSV / NDJSON downloads
+    if app.config.get('UPLOAD_SERVE_MODE', 'flask') not in media.SERVE_MODES:
+        raise ValueError(f"Unknown UPLOAD_SERVE_MODE: {app.config['UPLOAD_SERVE_MODE']}. Options: {', '.join(media.SERVE_MODES)}")
+    app.register_blueprint(media.bp)  # Uploaded stub images, takes precedence over /static/<path>
+    if app.config.get('METRICS_ENABLED', True):
+        app.register_blueprint(metrics.bp)  # Prometheus scrape endpoint at /metrics
+    if app.config.get('PROFILER_ENABLED'):
+        app.register_blueprint(profiler.bp, url_prefix='/api')  # Admin profiler routes
 
     # Setup login manager
     login_manager.session_protection = "strong"
     login_manager.login_view = "auth.login"
     
+    # Cached user loader, saves a SELECT per authenticated request (see app/utils/user_cache.py)
+    from app.utils.user_cache import init_user_cache, load_user
+    init_user_cache(app)
+
     @login_manager.user_loader
-    def load_user(id):
-        from app.models.user import User
-        return User.query.get(int(id))
+    def user_loader(id):
+        return load_user(int(id))
 
     # Create database tables
     with app.app_context():
@@ -4,5 +4,7 @@ from .stub import Stub
 from .stub_listing import StubListing
 from .stub_order import StubOrder
 from .stub_payment import StubPayment
+from .price_index import PriceIndex
+from .canonical_entity import CanonicalEntity
 
-__all__ = ['User', 'Stub', 'StubListing', 'StubOrder', 'StubPayment']
+__all__ = ['User', 'Stub', 'StubListing', 'StubOrder', 'StubPayment', 'PriceIndex', 'CanonicalEntity']
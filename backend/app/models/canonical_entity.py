@@ -0,0 +1,31 @@
+from datetime import datetime
+from app import db
+
+ENTITY_KINDS = ('event', 'venue')
+
+
+class CanonicalEntity(db.Model):
+    """One real-world event or venue; stubs point at it instead of grouping on raw extracted text
+
+    match_key is the normalized, order-independent form used for exact and fuzzy
+    matching (app/services/entity_normalizer.py).
+    """
+    __tablename__ = 'canonical_entity'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(10), nullable=False)  # event, venue
+    name = db.Column(db.String(255), nullable=False)  # display name, the first spelling seen
+    match_key = db.Column(db.String(255), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # One entity per kind and match key (migration 9c4d1e7b2a53)
+    __table_args__ = (
+        db.Index('uq_canonical_entity_kind_match_key', kind, match_key, unique=True),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'name': self.name
+        }
@@ -0,0 +1,50 @@
+import re
+import unicodedata
+from datetime import datetime
+from app import db
+
+
+def normalize_key(value):
+    """Lowercase ASCII words, so 'Coldplay – Live!' and 'coldplay live' share a bucket"""
+    if not value:
+        return ''
+    text = unicodedata.normalize('NFKD', value).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', text.lower()).split())[:255]
+
+
+def month_bucket(event_date):
+    """YYYY-MM of the event, '' when unknown"""
+    return event_date.strftime('%Y-%m') if event_date else ''
+
+
+class PriceIndex(db.Model):
+    """Sold and listed price aggregates per canonical event, venue and event month
+
+    Maintained incrementally from listing changes (app/services/price_index.py);
+    `flask rebuild-price-index` recomputes it from stub_listing.
+    """
+    __tablename__ = 'price_index'
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_key = db.Column(db.String(255), nullable=False)
+    venue_key = db.Column(db.String(255), nullable=False, default='')
+    event_month = db.Column(db.String(7), nullable=False, default='')
+
+    # Completed sales (prices in cents, like StubOrder)
+    sold_count = db.Column(db.Integer, nullable=False, default=0)
+    sold_total_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    sold_min_cents = db.Column(db.Integer)
+    sold_max_cents = db.Column(db.Integer)
+    last_sold_cents = db.Column(db.Integer)
+    last_sold_at = db.Column(db.DateTime)
+
+    # Open listings (active or payment_pending)
+    listed_count = db.Column(db.Integer, nullable=False, default=0)
+    listed_total_cents = db.Column(db.BigInteger, nullable=False, default=0)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # One row per bucket; lookups filter on event_key (migration 7b3e9d2f4a61)
+    __table_args__ = (
+        db.Index('uq_price_index_bucket', event_key, venue_key, event_month, unique=True),
+    )
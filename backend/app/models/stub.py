@@ -1,7 +1,6 @@
 from datetime import datetime
 from app import db
 from flask_login import UserMixin
-import os
 
 SUPPORTED_CURRENCIES = ['USD']
 
@@ -22,15 +21,26 @@ class Stub(db.Model):
     event_name = db.Column(db.String(255))
     event_date = db.Column(db.DateTime)
     venue_name = db.Column(db.String(255))
+
+    # Canonical event and venue of the extracted names (app/services/entity_normalizer.py)
+    event_id = db.Column(db.Integer, db.ForeignKey('canonical_entity.id', name='fk_stub_event_id_canonical_entity'), index=True)
+    venue_id = db.Column(db.Integer, db.ForeignKey('canonical_entity.id', name='fk_stub_venue_id_canonical_entity'), index=True)
+
     ticket_price = db.Column(db.Float)
     currency = db.Column(db.String(3), default='USD')
     seat_info = db.Column(db.String(100))
     
     # Meta information
-    status = db.Column(db.String(20), default='pending')  # pending, processed, manual, verified
+    status = db.Column(db.String(20), default='pending')  # pending, processed, manual, verified, imported
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Indexes match the query shapes (migration 3c5e1f7a9b2d):
+    # - a user's collection, newest first (get_stubs, seller public stubs)
+    __table_args__ = (
+        db.Index('ix_stub_user_id_created_at', user_id, created_at.desc()),
+    )
+
     # Relationships
     user = db.relationship('User', backref='stubs')
 
@@ -51,7 +61,10 @@ class Stub(db.Model):
                 return None
 
     def get_image_url(self):
-        return f"/static/uploads/stubs/{self.user_id}/{os.path.basename(self.image_path)}"
+        # Local media route for the filesystem backend, pre-signed object URL for S3
+        from app.services.storage import get_storage, storage_key
+        key = storage_key(self.image_path)
+        return get_storage().url(key) if key else None  # imported stubs have no image until one is attached
 
     def to_dict(self):
         listing_status = "unlisted"
@@ -76,6 +89,8 @@ class Stub(db.Model):
             'event_name': self.event_name,
             'event_date': self.event_date.isoformat() if self.event_date else None,
             'venue_name': self.venue_name,
+            'event_id': self.event_id,
+            'venue_id': self.venue_id,
             'ticket_price': float(self.ticket_price) if self.ticket_price is not None else None,
             'currency': self.currency,
             'seat_info': self.seat_info,
@@ -1,7 +1,22 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from sqlalchemy.orm.attributes import set_committed_value
 from app import db
 from app.models.stub import SUPPORTED_CURRENCIES
 
+# A stub can have at most one listing in these statuses (enforced by OPEN_LISTING_INDEX)
+OPEN_STATUSES = ('active', 'payment_pending')
+OPEN_LISTING_INDEX = 'uq_stub_listing_open_stub_id'
+
+class ListingUnavailableError(ValueError):
+    """Another checkout reserved (or bought) the listing first"""
+
+def is_open_listing_conflict(error):
+    """True when an IntegrityError was raised by the one-open-listing-per-stub index"""
+    message = str(getattr(error, 'orig', error))
+    # PostgreSQL names the index; SQLite names the column
+    return OPEN_LISTING_INDEX in message or 'UNIQUE constraint failed: stub_listing.stub_id' in message
+
 class StubListing(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     stub_id = db.Column(db.Integer, db.ForeignKey('stub.id'), nullable=False)
@@ -11,7 +26,7 @@ class StubListing(db.Model):
     asking_price = db.Column(db.Float, nullable=False)
     currency = db.Column(db.String(3), default='USD')
     description = db.Column(db.Text)
-    status = db.Column(db.String(20), default='active', index=True)  # active, payment_pending, sold, cancelled
+    status = db.Column(db.String(20), default='active')  # active, payment_pending, sold, cancelled
     
     # Marketplace metadata
     listed_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -23,6 +38,19 @@ class StubListing(db.Model):
     stripe_product_id = db.Column(db.String(100), nullable=True)  # For tracking
     reserved_until = db.Column(db.DateTime, nullable=True)  # Temporary reservation during payment
     reserved_by_user_id = db.Column(db.Integer, db.ForeignKey('user.id', name='fk_stub_listing_reserved_by_user'), nullable=True)
+
+    # Indexes match the query shapes (migration 3c5e1f7a9b2d):
+    # - marketplace browse: status filter, newest first (also serves status-only filters)
+    # - seller pages and my-listings: seller, optionally status, newest first
+    # - Stub.listings loads: stub_id, optionally status
+    # - one open listing per stub (migration 5d2a8c4e6f10), checked atomically on insert
+    __table_args__ = (
+        db.Index('ix_stub_listing_status_listed_at', status, listed_at.desc()),
+        db.Index('ix_stub_listing_seller_id_status_listed_at', seller_id, status, listed_at),
+        db.Index('ix_stub_listing_stub_id_status', stub_id, status),
+        db.Index(OPEN_LISTING_INDEX, stub_id, unique=True,
+                 sqlite_where=status.in_(OPEN_STATUSES), postgresql_where=status.in_(OPEN_STATUSES)),
+    )
     
     # Relationships
     stub = db.relationship('Stub', backref='listings')
@@ -57,11 +85,40 @@ class StubListing(db.Model):
     
     def reserve_for_payment(self, buyer_id, minutes=15):
         """Reserve listing during payment process"""
-        from datetime import timedelta
         self.status = 'payment_pending'
         self.reserved_by_user_id = buyer_id
         self.reserved_until = datetime.utcnow() + timedelta(minutes=minutes)
     
+    def try_reserve_for_payment(self, buyer_id, minutes=15):
+        """Atomically reserve an active listing; False if another checkout reserved it first
+
+        A single conditional UPDATE, so concurrent buyers cannot both pass the status check.
+        Losers do not wait on a lock held for the whole checkout, only until the winner's
+        order insert commits, and then see zero rows updated.
+        """
+        now = datetime.utcnow()
+        values = {
+            'status': 'payment_pending',
+            'reserved_by_user_id': buyer_id,
+            'reserved_until': now + timedelta(minutes=minutes),
+            'updated_at': now
+        }
+        result = db.session.execute(
+            update(StubListing)
+            .where(StubListing.id == self.id, StubListing.status == 'active')
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            return False
+
+        # Mirror the row without marking the instance dirty (no second UPDATE on flush)
+        for key, value in values.items():
+            set_committed_value(self, key, value)
+        # Bulk UPDATEs skip the session's change tracking, so flag the marketplace cache here
+        db.session.info['invalidate_marketplace'] = True
+        return True
+
     def release_reservation(self):
         """Release reservation if payment fails"""
         if self.status == 'payment_pending':
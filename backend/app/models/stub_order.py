@@ -1,6 +1,7 @@
 # backend/app/models/stub_order.py - Connected to existing StubListing
 from datetime import datetime, timedelta
 from app import db
+from app.models.stub_listing import ListingUnavailableError
 
 class StubOrder(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -82,8 +83,9 @@ class StubOrder(db.Model):
         seller = listing.seller
         order.liability_shifted_to_seller = seller.can_accept_payments()
         
-        # FIXED: Reserve the listing during order creation
-        listing.reserve_for_payment(buyer_id)
+        # Reserve with a conditional UPDATE so two concurrent checkouts cannot both win
+        if not listing.try_reserve_for_payment(buyer_id):
+            raise ListingUnavailableError("Listing is no longer available")
         
         return order
     
@@ -105,7 +107,14 @@ class StubOrder(db.Model):
         elif self.order_status == 'cancelled' and self.stub_listing.status == 'payment_pending':
             self.stub_listing.release_reservation()
         elif self.order_status == 'refunded' and self.stub_listing.status == 'sold':
-            self.stub_listing.status = 'active'
+            # Relist, unless the seller has listed the stub again since the sale
+            from app.models.stub_listing import StubListing, OPEN_STATUSES
+            relisted = StubListing.query.filter(
+                StubListing.stub_id == self.stub_listing.stub_id,
+                StubListing.id != self.stub_listing.id,
+                StubListing.status.in_(OPEN_STATUSES)
+            ).first()
+            self.stub_listing.status = 'cancelled' if relisted else 'active'
             self.stub_listing.sold_at = None
         
     def to_dict(self):
@@ -53,10 +53,13 @@ class User(UserMixin, db.Model):
         """Return public profile information (safe for public viewing)"""
         from app.models.stub_listing import StubListing
         
-        # Calculate seller statistics
-        total_listings = StubListing.query.filter_by(seller_id=self.id).count()
-        active_listings = StubListing.query.filter_by(seller_id=self.id, status='active').count()
-        sold_listings = StubListing.query.filter_by(seller_id=self.id, status='sold').count()
+        # Calculate seller statistics (one GROUP BY over the seller's listings)
+        counts = dict(db.session.query(StubListing.status, db.func.count(StubListing.id)).filter(
+            StubListing.seller_id == self.id
+        ).group_by(StubListing.status).all())
+        total_listings = sum(counts.values())
+        active_listings = counts.get('active', 0)
+        sold_listings = counts.get('sold', 0)
         
         return {
             'id': self.id,
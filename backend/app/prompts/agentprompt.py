@@ -137,6 +137,9 @@ def stub_creation_agent_prompt():
   ==================================================
   TOOL CALLING RULES
   ==================================================
+  - Before writing Step 5, call the `lookup_market_value` tool with the event, venue and date.  
+    • If it returns a suggested market value, use it as {{price_estimate_value}} and for `estimated_market_value`.  
+    • Only estimate the value yourself when it reports no marketplace price data.  
   - When passing values to the `draft_listing` tool:  
     • `date` MUST always be in YYYY-MM-DD (e.g., 2019-10-23).  
     • `estimated_market_value` MUST always be numeric (int or float).  
@@ -6,11 +6,13 @@ import base64
 import json
 from datetime import datetime
 from typing import List, Dict, Optional
-import google.generativeai as genai
 from PIL import Image
 import io
 import logging
 from app.prompts.agentprompt import chatbot_agent_prompt
+from app.services.model_provider import get_model_provider
+from app.utils.metrics import track_external_call
+from app.utils.tracing import traced
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,15 +21,12 @@ bp = Blueprint('chatbot', __name__, url_prefix='/api/chatbot')
 
 # Configure Google Gemini AI
 def configure_gemini():
-    """Configure Google Gemini AI with API key"""
+    """Configure the chat model from the active model provider (Gemini unless MODEL_PROVIDER overrides it)"""
     try:
-        api_key = os.environ.get('GEMINI_API_KEY')
-        if not api_key:
+        model = get_model_provider().chat_model()
+        if not model:
             logger.warning("GEMINI_API_KEY not found in environment variables")
             return None
-        
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel("gemini-2.0-flash")
         return model
     except Exception as e:
         logger.error(f"Error configuring Gemini AI: {e}")
@@ -56,6 +55,7 @@ def validate_image_file(file) -> tuple[bool, str]:
     
     return True, ""
 
+@traced('PIL process_image_for_ai')
 def process_image_for_ai(image_file) -> Optional[Image.Image]:
     """Process image file for AI analysis"""
     try:
@@ -131,10 +131,12 @@ def generate_ai_response(
                     
         if image:
             # Generate response with image
-            response = model.generate_content([full_prompt, image])
+            with track_external_call('gemini', 'chat_with_image'):
+                response = model.generate_content([full_prompt, image])
         else:
             # Generate text-only response
-            response = model.generate_content(full_prompt)
+            with track_external_call('gemini', 'chat'):
+                response = model.generate_content(full_prompt)
         
         if response.text:
             return True, response.text.strip()
@@ -249,7 +249,9 @@ def get_onboarding_status():
             'message': f'Status check failed: {str(e)}'
         }), 500
 
-### PAYMENT PROCESSING ROUTES ###@bp.route('/payments/create-payment-intent', methods=['POST'])
+### PAYMENT PROCESSING ROUTES ###
+
+@bp.route('/payments/create-payment-intent', methods=['POST'])
 @limiter.limit("5 per minute")  # PHASE 5: Stricter limit for payment creation
 @login_required
 def create_payment_intent():
@@ -317,7 +319,7 @@ def create_payment_intent():
                 'status': 'error',
                 'message': result['error'],
                 'seller_requirements': result.get('seller_requirements')
-            }), 400
+            }), 409 if result.get('conflict') else 400
             
     except Exception as e:
         direct_charges_service.log_security_event("payment_intent_endpoint_error", {
@@ -340,7 +342,7 @@ def stripe_webhook():
         
         # PHASE 5 ENHANCEMENT: Enhanced IP validation for additional security
         client_ip = request.environ.get('HTTP_X_FORWARDED_FOR', request.remote_addr)
-        if client_ip:
+        if client_ip and direct_charges_service.WEBHOOK_IP_CHECK_ENABLED:
             client_ip = client_ip.split(',')[0].strip()
             if client_ip not in direct_charges_service.STRIPE_WEBHOOK_IPS:
                 direct_charges_service.log_security_event("webhook_unauthorized_ip", {
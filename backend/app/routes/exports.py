@@ -0,0 +1,41 @@
+from datetime import datetime
+
+from flask import Blueprint, current_app, jsonify, request, stream_with_context
+from flask_login import current_user, login_required
+
+from app import limiter
+from app.services.exports import EXPORT_FORMATS, EXPORTS, stream_export
+
+bp = Blueprint('exports', __name__)
+
+@bp.route('/exports/<name>', methods=['GET'])
+@limiter.limit("5 per minute")  # Each export reads the whole collection
+@login_required
+def export(name):
+    """
+    Download the current user's stubs, listings, purchases or sales
+    
+    Query Parameters:
+    - format: csv (default) or ndjson
+    
+    The file is streamed as it is read, so large collections start downloading
+    immediately and use constant memory (see app/services/exports.py).
+    """
+    if name not in EXPORTS:
+        return jsonify({
+            'status': 'error',
+            'message': f'Unknown export. Options: {", ".join(EXPORTS)}'
+        }), 404
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({
+            'status': 'error',
+            'message': f'Invalid format. Options: {", ".join(EXPORT_FORMATS)}'
+        }), 400
+    
+    chunks = stream_export(name, current_user.id, fmt, batch_size=current_app.config.get('EXPORT_BATCH_SIZE', 500))
+    response = current_app.response_class(stream_with_context(chunks), mimetype=EXPORT_FORMATS[fmt])
+    filename = f"{name}-{datetime.utcnow().strftime('%Y-%m-%d')}.{fmt}"
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
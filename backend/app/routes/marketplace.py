@@ -1,12 +1,22 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_login import login_required, current_user
 from app import db, limiter
 from app.models.stub import Stub, SUPPORTED_CURRENCIES
-from app.models.stub_listing import StubListing
+from app.models.canonical_entity import CanonicalEntity
+from app.models.stub_listing import OPEN_STATUSES, StubListing, is_open_listing_conflict
 from app.models.stub_order import StubOrder
 from app.models.user import User
+from app.services.price_index import price_stats
+from app.services.listing_facets import listing_facets
+from app.services.entity_normalizer import get_entity_index
+from app.services.typeahead import SUGGESTION_TYPES, get_typeahead_index
+from app.utils.db_routing import read_replica
+from app.utils.response_cache import MARKETPLACE_NAMESPACE, cached_response, cached_value, normalized_params
 from datetime import datetime
-from sqlalchemy.orm import joinedload
+import math
+from sqlalchemy import and_, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased, joinedload, selectinload
 
 bp = Blueprint('marketplace', __name__)
 
@@ -34,17 +44,6 @@ def create_listing():
             'message': 'Stub not found or you do not have permission to list it'
         }), 404
     
-    # Check if stub is already listed
-    existing_listing = StubListing.query.filter_by(
-        stub_id=data['stub_id'],
-        status='active'
-    ).first()
-    if existing_listing:
-        return jsonify({
-            'status': 'error',
-            'message': 'This stub is already listed in the marketplace'
-        }), 400
-    
     # PHASE 6: Validate currency (USD only for payment compatibility)
     if data['currency'] not in SUPPORTED_CURRENCIES:
         return jsonify({
@@ -74,6 +73,8 @@ def create_listing():
             payment_required=payment_required  # PHASE 6: Payment integration
         )
         
+        # One open listing per stub is enforced by a partial unique index, so the
+        # insert itself is the duplicate check (no SELECT first, no race between requests)
         db.session.add(listing)
         db.session.commit()
         
@@ -91,6 +92,18 @@ def create_listing():
             }
         }), 201
         
+    except IntegrityError as e:
+        db.session.rollback()
+        if is_open_listing_conflict(e):
+            return jsonify({
+                'status': 'error',
+                'message': 'This stub is already listed in the marketplace'
+            }), 400
+        return jsonify({
+            'status': 'error',
+            'message': 'An error occurred while creating the listing',
+            'error': str(e)
+        }), 500
     except ValueError as e:
         return jsonify({
             'status': 'error',
@@ -106,6 +119,8 @@ def create_listing():
 
 @bp.route('/marketplace/listings', methods=['GET'])
 @limiter.limit("30 per minute")  # PHASE 6: Add rate limiting
+@read_replica
+@cached_response(MARKETPLACE_NAMESPACE, defaults={'status': 'active', 'page': '1', 'per_page': '4'}, lowercase=('title', 'event', 'venue'))
 def get_listings():
     """
     Get all active marketplace listings with payment status and optional filtering
@@ -114,13 +129,18 @@ def get_listings():
     - status: Listing status (default: 'active')
     - payment_enabled: Filter by payment capability (true/false)
     - title: Search in stub titles (case-insensitive partial match)
+    - event_id / venue_id: Canonical event or venue (ids from the stub data)
+    - event / venue: Event or venue name, matched to its canonical entity
     - min_price: Minimum asking price (number)
     - max_price: Maximum asking price (number)
     - start_date: Start date for listings (YYYY-MM-DD format)
     - end_date: End date for listings (YYYY-MM-DD format)
+    - facets: 'true' to add counts per venue, event year, price band and payment_enabled
+      for the whole filter (see app/services/listing_facets.py)
     
     Examples:
     - /marketplace/listings?title=concert&min_price=50&max_price=200
+    - /marketplace/listings?venue=wembley&facets=true
     """
     try:
         # Get query parameters for filtering
@@ -129,16 +149,16 @@ def get_listings():
         
         # New optional filtering parameters
         title_search = request.args.get('title', None)
+        event_id = request.args.get('event_id', type=int)
+        venue_id = request.args.get('venue_id', type=int)
         min_price = request.args.get('min_price', None)
         max_price = request.args.get('max_price', None)
         start_date = request.args.get('start_date', None)
         end_date = request.args.get('end_date', None)
+        want_facets = request.args.get('facets', '').lower() == 'true'
         
-        # Build query with stub relationship for title search
-        query = StubListing.query.options(
-            joinedload(StubListing.seller),
-            joinedload(StubListing.stub)
-        )
+        # Filters first; the page query adds its eager loads, the facet query aggregates
+        query = StubListing.query
         
         # Filter by status
         query = query.filter_by(status=status)
@@ -148,11 +168,24 @@ def get_listings():
             payment_enabled = payment_enabled.lower() == 'true'
             query = query.filter_by(payment_required=payment_enabled)
         
+        # Names match any spelling of the canonical entity; an unknown name matches nothing (id 0)
+        entity_index = get_entity_index()
+        if event_id is None and request.args.get('event'):
+            event_id = entity_index.match('event', request.args['event'])[0] or 0
+        if venue_id is None and request.args.get('venue'):
+            venue_id = entity_index.match('venue', request.args['venue'])[0] or 0
+        if title_search or event_id is not None or venue_id is not None or want_facets:
+            query = query.join(Stub)
+
         # Filter by title search (case-insensitive partial match)
         if title_search:
-            query = query.join(Stub).filter(
+            query = query.filter(
                 Stub.title.ilike(f'%{title_search}%')
             )
+        if event_id is not None:
+            query = query.filter(Stub.event_id == event_id)
+        if venue_id is not None:
+            query = query.filter(Stub.venue_id == venue_id)
         # Filter by price range
         if min_price is not None:
             try:
@@ -207,7 +240,11 @@ def get_listings():
                 'message': 'Page and per_page must be integers.'
             }), 400
             
-        listings_paginated = query.paginate(
+        # Newest first; without an ORDER BY, pages are not stable between requests
+        listings_paginated = query.options(
+            joinedload(StubListing.seller),
+            joinedload(StubListing.stub).selectinload(Stub.listings)
+        ).order_by(StubListing.listed_at.desc()).paginate(
             page=page,
             per_page=per_page,
             error_out=False
@@ -229,7 +266,7 @@ def get_listings():
             
             listings_data.append(listing_dict)
         
-        return jsonify({
+        response = {
             'status': 'success',
             'data': listings_data,
             'pagination': {
@@ -249,7 +286,15 @@ def get_listings():
                 # 'start_date': start_date,
                 # 'end_date': end_date
             # }
-        })
+        }
+        if want_facets:
+            # Cached per filter signature, so paging through the results aggregates once
+            response['facets'] = cached_value(
+                MARKETPLACE_NAMESPACE, 'listing_facets',
+                normalized_params({'status': 'active'}, ('title', 'event', 'venue'), exclude=('page', 'per_page', 'facets')),
+                lambda: listing_facets(query)
+            )
+        return jsonify(response)
         
     except Exception as e:
         return jsonify({
@@ -260,6 +305,8 @@ def get_listings():
 
 @bp.route('/marketplace/listings/<int:listing_id>', methods=['GET'])
 @limiter.limit("30 per minute")  # PHASE 6: Add rate limiting
+@read_replica
+@cached_response(MARKETPLACE_NAMESPACE)
 def get_listing(listing_id):
     """Get a specific marketplace listing with payment status"""
     listing = StubListing.query.options(joinedload(StubListing.seller)).get_or_404(listing_id)
@@ -290,13 +337,77 @@ def get_listing(listing_id):
         'data': listing_dict
     })
 
+@bp.route('/marketplace/price-stats', methods=['GET'])
+@limiter.limit("60 per minute")
+@read_replica
+@cached_response(MARKETPLACE_NAMESPACE, lowercase=('event', 'venue'))
+def get_price_stats():
+    """
+    Sold and listed price statistics for an event from the price index
+    
+    Query Parameters:
+    - event: Event name (required unless event_id is given), any spelling of the canonical event
+    - venue: Venue name (optional)
+    - event_id / venue_id: Canonical event or venue (optional, instead of the names)
+    - date: Event date, YYYY-MM-DD or YYYY-MM (optional)
+    """
+    result = price_stats(
+        request.args.get('event', ''),
+        venue_name=request.args.get('venue'),
+        date=request.args.get('date'),
+        event_id=request.args.get('event_id', type=int),
+        venue_id=request.args.get('venue_id', type=int)
+    )
+    if not result['success']:
+        return jsonify({
+            'status': 'error',
+            'message': result['error']
+        }), 400
+    
+    result.pop('success')
+    return jsonify({
+        'status': 'success',
+        'data': result
+    })
+
+@bp.route('/marketplace/typeahead', methods=['GET'])
+@limiter.limit("120 per minute")  # Called on every keystroke
+@read_replica
+def get_typeahead():
+    """
+    Search suggestions by prefix over listed titles, events and venues, most listed first
+    
+    Query Parameters:
+    - q: What the user has typed so far (suggestions start at 2 characters)
+    - types: Comma separated subset of title, event, venue (default: all)
+    - limit: Number of suggestions (default: 8, max: 20)
+    
+    Event and venue suggestions carry their canonical id for /marketplace/listings?event_id=
+    """
+    types = tuple(t for t in request.args.get('types', ','.join(SUGGESTION_TYPES)).split(',') if t)
+    if not types or any(t not in SUGGESTION_TYPES for t in types):
+        return jsonify({
+            'status': 'error',
+            'message': f'Invalid types. Options: {", ".join(SUGGESTION_TYPES)}'
+        }), 400
+    limit = min(max(request.args.get('limit', 8, type=int), 1), 20)
+    
+    return jsonify({
+        'status': 'success',
+        'data': get_typeahead_index().suggest(request.args.get('q', ''), limit=limit, types=types)
+    })
+
 @bp.route('/marketplace/my-listings', methods=['GET'])
 @limiter.limit("20 per minute")  # PHASE 6: Add rate limiting
 @login_required
 def get_my_listings():
     """Get all listings for the current user with payment status"""
     try:
-        listings = StubListing.query.options(joinedload(StubListing.orders)).filter_by(seller_id=current_user.id).order_by(StubListing.listed_at.desc()).all()
+        listings = StubListing.query.options(
+            selectinload(StubListing.orders),
+            joinedload(StubListing.seller),
+            joinedload(StubListing.stub).selectinload(Stub.listings)
+        ).filter_by(seller_id=current_user.id).order_by(StubListing.listed_at.desc()).all()
         
         # PHASE 6: Enhanced response with payment information
         listings_data = []
@@ -458,10 +569,286 @@ def cancel_listing(listing_id):
             'error': str(e)
         }), 500
 
+# Bulk listing management: one ownership query, one transaction, per-item results.
+# Statements are batched by the unit of work (one multi-row INSERT, executemany UPDATEs),
+# and the marketplace cache / price index / typeahead listeners fire once at commit.
+
+def _bulk_items(key):
+    """(items, None) from the JSON body, or (None, error response)"""
+    data = request.get_json(silent=True) or {}
+    items = data.get(key)
+    max_items = current_app.config.get('BULK_LISTING_MAX_ITEMS', 500)
+    if not isinstance(items, list) or not items:
+        return None, (jsonify({
+            'status': 'error',
+            'message': f'{key} must be a non-empty list'
+        }), 400)
+    if len(items) > max_items:
+        return None, (jsonify({
+            'status': 'error',
+            'message': f'At most {max_items} items per request'
+        }), 400)
+    return items, None
+
+
+def _bulk_response(results, action):
+    succeeded = sum(1 for result in results if result['status'] == 'success')
+    return jsonify({
+        'status': 'success',
+        'message': f'{succeeded} of {len(results)} listings {action}',
+        'data': {
+            'results': results,
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded
+        }
+    })
+
+
+def _item_error(index, message, **ids):
+    return {'index': index, **ids, 'status': 'error', 'message': message}
+
+
+def _asking_price(value):
+    """A positive, finite price from a request value, else None"""
+    try:
+        price = float(value)
+    except (TypeError, ValueError):
+        return None
+    return price if math.isfinite(price) and price > 0 else None
+
+
+def _lock_active_listings(ids):
+    """
+    Claim the current user's active listings among ids with one conditional UPDATE
+    before loading them: checkouts (try_reserve_for_payment) then wait for this
+    request to commit (row locks on PostgreSQL, the write lock on SQLite) and the
+    listings loaded afterwards show their current status
+    """
+    ids = [listing_id for listing_id in ids if isinstance(listing_id, int)]
+    if ids:
+        db.session.execute(
+            update(StubListing)
+            .where(StubListing.id.in_(ids), StubListing.seller_id == current_user.id, StubListing.status == 'active')
+            .values(updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+
+
+def _owned_listings(ids):
+    """The current user's listings among ids, loaded in one query"""
+    ids = [listing_id for listing_id in ids if isinstance(listing_id, int)]
+    return {listing.id: listing for listing in StubListing.query.filter(
+        StubListing.id.in_(ids), StubListing.seller_id == current_user.id
+    )}
+
+
+def _listing_not_changeable(listing, action):
+    if listing is None:
+        return f'Listing not found or you do not have permission to {action} it'
+    if listing.status == 'payment_pending':
+        return f'Cannot {action} listing with pending payment'
+    if listing.status != 'active':
+        return f'Cannot {action} listing with status: {listing.status}'
+    return None
+
+
+@bp.route('/marketplace/bulk/list', methods=['POST'])
+@limiter.limit("10 per minute")
+@login_required
+def bulk_create_listings():
+    """
+    List many stubs at once
+    
+    Body: {"listings": [{"stub_id": 1, "asking_price": 50, "currency": "USD",
+                         "description": "...", "payment_required": true}, ...]}
+    Each item is validated like POST /marketplace/list; valid items are created
+    together, invalid ones are reported in data.results by index.
+    """
+    items, error = _bulk_items('listings')
+    if error:
+        return error
+    
+    stub_ids = [item.get('stub_id') for item in items if isinstance(item, dict) and isinstance(item.get('stub_id'), int)]
+    can_accept_payments = current_user.can_accept_payments()
+    
+    # A concurrent single listing can still claim a stub between the check and the insert;
+    # the partial unique index rejects the batch then, and the re-check reports that stub
+    for attempt in range(2):
+        owned = {stub_id for (stub_id,) in db.session.query(Stub.id).filter(
+            Stub.id.in_(stub_ids), Stub.user_id == current_user.id
+        )}
+        already_listed = {stub_id for (stub_id,) in db.session.query(StubListing.stub_id).filter(
+            StubListing.stub_id.in_(owned), StubListing.status.in_(OPEN_STATUSES)
+        )} if owned else set()
+        
+        results, created, seen = [], [], set()
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                results.append(_item_error(index, 'Each listing must be an object'))
+                continue
+            stub_id = item.get('stub_id')
+            missing = [field for field in ('stub_id', 'asking_price', 'currency') if field not in item]
+            if missing:
+                results.append(_item_error(index, f'Missing required field: {missing[0]}', stub_id=stub_id))
+                continue
+            if not isinstance(stub_id, int) or stub_id not in owned:
+                results.append(_item_error(index, 'Stub not found or you do not have permission to list it', stub_id=stub_id))
+                continue
+            if stub_id in already_listed or stub_id in seen:
+                results.append(_item_error(index, 'This stub is already listed in the marketplace', stub_id=stub_id))
+                continue
+            if item['currency'] not in SUPPORTED_CURRENCIES:
+                results.append(_item_error(
+                    index, f'Invalid currency. Supported currencies: {", ".join(SUPPORTED_CURRENCIES)}', stub_id=stub_id
+                ))
+                continue
+            payment_required = item.get('payment_required', True)
+            if payment_required and not can_accept_payments:
+                results.append(_item_error(
+                    index, 'You must complete Stripe onboarding before listing items for sale', stub_id=stub_id
+                ))
+                continue
+            asking_price = _asking_price(item['asking_price'])
+            if asking_price is None:
+                results.append(_item_error(index, 'asking_price must be a positive number', stub_id=stub_id))
+                continue
+            
+            seen.add(stub_id)
+            listing = StubListing(
+                stub_id=stub_id,
+                seller_id=current_user.id,
+                asking_price=asking_price,
+                currency=item['currency'],
+                description=item.get('description', ''),
+                status='active',
+                payment_required=payment_required
+            )
+            created.append(listing)
+            results.append({'index': index, 'stub_id': stub_id, 'status': 'success', 'listing': listing})
+        
+        try:
+            # One multi-row INSERT .. RETURNING on PostgreSQL; SQLite inserts row by row
+            db.session.add_all(created)
+            db.session.flush()
+            for result in results:
+                if 'listing' in result:
+                    result['listing_id'] = result.pop('listing').id  # read before commit expires it
+            db.session.commit()
+            break
+        except IntegrityError as e:
+            db.session.rollback()
+            if attempt or not is_open_listing_conflict(e):
+                return jsonify({
+                    'status': 'error',
+                    'message': 'An error occurred while creating the listings',
+                    'error': str(e)
+                }), 500
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({
+                'status': 'error',
+                'message': 'An error occurred while creating the listings',
+                'error': str(e)
+            }), 500
+    
+    return _bulk_response(results, 'created'), 201 if created else 200
+
+
+@bp.route('/marketplace/bulk/reprice', methods=['PUT'])
+@limiter.limit("10 per minute")
+@login_required
+def bulk_reprice_listings():
+    """
+    Change the asking price of many active listings at once
+    
+    Body: {"listings": [{"listing_id": 1, "asking_price": 45}, ...]}
+    """
+    items, error = _bulk_items('listings')
+    if error:
+        return error
+    
+    _lock_active_listings([item.get('listing_id') for item in items
+                           if isinstance(item, dict) and _asking_price(item.get('asking_price')) is not None])
+    listings = _owned_listings([item.get('listing_id') for item in items if isinstance(item, dict)])
+    results, seen = [], set()
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or 'listing_id' not in item or 'asking_price' not in item:
+            results.append(_item_error(index, 'Each listing needs listing_id and asking_price'))
+            continue
+        listing_id = item['listing_id']
+        listing = listings.get(listing_id) if isinstance(listing_id, int) else None
+        if listing is not None and listing_id in seen:
+            message = 'Listing appears more than once in this request'
+        else:
+            message = _listing_not_changeable(listing, 'update')
+        if message:
+            results.append(_item_error(index, message, listing_id=listing_id))
+            continue
+        asking_price = _asking_price(item['asking_price'])
+        if asking_price is None:
+            results.append(_item_error(index, 'asking_price must be a positive number', listing_id=listing_id))
+            continue
+        listing.asking_price = asking_price
+        seen.add(listing_id)
+        results.append({'index': index, 'listing_id': listing_id, 'status': 'success', 'asking_price': listing.asking_price})
+    
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': 'An error occurred while updating the listings',
+            'error': str(e)
+        }), 500
+    return _bulk_response(results, 'repriced')
+
+
+@bp.route('/marketplace/bulk/cancel', methods=['POST'])
+@limiter.limit("10 per minute")
+@login_required
+def bulk_cancel_listings():
+    """
+    Cancel many active listings at once
+    
+    Body: {"listing_ids": [1, 2, 3]}
+    """
+    listing_ids, error = _bulk_items('listing_ids')
+    if error:
+        return error
+    
+    _lock_active_listings(listing_ids)
+    listings = _owned_listings(listing_ids)
+    results, seen = [], set()
+    for index, listing_id in enumerate(listing_ids):
+        listing = listings.get(listing_id) if isinstance(listing_id, int) else None
+        if listing is not None and listing_id in seen:
+            message = 'Listing appears more than once in this request'
+        else:
+            message = _listing_not_changeable(listing, 'cancel')
+        if message:
+            results.append(_item_error(index, message, listing_id=listing_id))
+            continue
+        listing.status = 'cancelled'
+        seen.add(listing_id)
+        results.append({'index': index, 'listing_id': listing_id, 'status': 'success'})
+    
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': 'An error occurred while cancelling the listings',
+            'error': str(e)
+        }), 500
+    return _bulk_response(results, 'cancelled')
+
 # PHASE 6: Enhanced Seller Profile Routes with Payment Integration
 
 @bp.route('/marketplace/sellers/<int:seller_id>', methods=['GET'])
 @limiter.limit("20 per minute")  # PHASE 6: Add rate limiting
+@read_replica
 def get_seller_profile(seller_id):
     """Get public profile information for a specific seller with payment status"""
     seller = User.query.get(seller_id)
@@ -495,6 +882,7 @@ def get_seller_profile(seller_id):
     })
 
 @bp.route('/marketplace/sellers/<int:seller_id>/listings', methods=['GET'])
+@read_replica
 def get_seller_listings(seller_id):
     """Get all active listings from a specific seller"""
     # Verify seller exists
@@ -515,7 +903,10 @@ def get_seller_listings(seller_id):
         per_page = min(per_page, 50)  # Max 50 items per page
         
         # Query seller's listings with pagination
-        listings_query = StubListing.query.filter_by(
+        listings_query = StubListing.query.options(
+            joinedload(StubListing.seller),
+            joinedload(StubListing.stub).selectinload(Stub.listings)
+        ).filter_by(
             seller_id=seller_id, 
             status=status
         ).order_by(StubListing.listed_at.desc())
@@ -550,6 +941,7 @@ def get_seller_listings(seller_id):
         }), 500
 
 @bp.route('/marketplace/sellers/<int:seller_id>/stubs', methods=['GET'])
+@read_replica
 def get_seller_stubs_summary(seller_id):
     """Get a summary of seller's stub collection (public view)"""
     # Verify seller exists
@@ -561,30 +953,34 @@ def get_seller_stubs_summary(seller_id):
         }), 404
     
     try:
-        # Get only stubs that have active listings (public stubs)
-        public_stubs = db.session.query(Stub).join(StubListing).filter(
+        # Only stubs that have active listings (public stubs); counted in SQL, no rows loaded
+        public = and_(
             Stub.user_id == seller_id,
-            StubListing.status == 'active'
-        ).options(joinedload(Stub.listings)).all()
-        
-        # Group by event types or venues for summary
-        venues = {}
-        events = {}
+            db.session.query(StubListing.id).filter(
+                StubListing.stub_id == Stub.id,
+                StubListing.status == 'active'
+            ).exists()
+        )
+        total_public_stubs = db.session.query(func.count(Stub.id)).filter(public).scalar()
         
-        for stub in public_stubs:
-            if stub.venue_name:
-                venues[stub.venue_name] = venues.get(stub.venue_name, 0) + 1
-            if stub.event_name:
-                events[stub.event_name] = events.get(stub.event_name, 0) + 1
+        def top_five(entity_id, raw_name):
+            # Group by canonical venue/event, so spellings of the same one count together
+            entity = aliased(CanonicalEntity)
+            name = func.coalesce(entity.name, raw_name)
+            count = func.count(Stub.id)
+            rows = db.session.query(name, count).outerjoin(entity, entity.id == entity_id).filter(
+                public, name != ''
+            ).group_by(name).order_by(count.desc(), name).limit(5).all()
+            return [[row_name, row_count] for row_name, row_count in rows]
         
         return jsonify({
             'status': 'success',
             'data': {
                 'seller': seller.to_public_profile(),
                 'collection_summary': {
-                    'total_public_stubs': len(public_stubs),
-                    'top_venues': sorted(venues.items(), key=lambda x: x[1], reverse=True)[:5],
-                    'top_events': sorted(events.items(), key=lambda x: x[1], reverse=True)[:5]
+                    'total_public_stubs': total_public_stubs,
+                    'top_venues': top_five(Stub.venue_id, Stub.venue_name),
+                    'top_events': top_five(Stub.event_id, Stub.event_name)
                 }
             }
         })
@@ -0,0 +1,75 @@
+from flask import Blueprint, current_app, jsonify, redirect, request
+from werkzeug.utils import send_file
+import mimetypes
+import os
+from app import limiter
+from app.services.storage import get_storage
+
+bp = Blueprint('media', __name__)
+
+# Upload filenames are unique per upload (see StubProcessor.save_image), so the
+# bytes behind a URL never change and browsers may cache them forever
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+SERVE_MODES = ('flask', 'x-accel', 'x-sendfile')
+
+@bp.route('/static/uploads/stubs/<int:user_id>/<path:filename>', methods=['GET', 'HEAD'])
+@limiter.exempt  # A listing page loads many images; default limits would throttle browsing
+def stub_image(user_id, filename):
+    """
+    Serve an uploaded stub image with immutable caching.
+
+    UPLOAD_SERVE_MODE:
+    - flask (default): bytes are sent by Werkzeug with ETag, Last-Modified,
+      If-None-Match/If-Modified-Since (304) and Range (206) support
+    - x-accel: empty response with X-Accel-Redirect; nginx sends the file from
+      an internal location mapped to STUB_UPLOAD_FOLDER:
+
+          location /protected/uploads/stubs/ {
+              internal;
+              alias /srv/stubcollect/uploads/stubs/;
+          }
+
+    - x-sendfile: empty response with X-Sendfile (Apache mod_xsendfile, lighttpd)
+
+    Behind a proxy the images can also skip the app entirely by aliasing
+    /static/uploads/stubs/ to STUB_UPLOAD_FOLDER with the same Cache-Control.
+
+    With STORAGE_BACKEND=s3 the API already hands out object URLs; old links to
+    this route are redirected to the object.
+    """
+    storage = get_storage()
+    key = f"{user_id}/{filename}"
+    if storage.name != 'filesystem':
+        return redirect(storage.url(key), code=302)
+
+    path = storage.local_path(key)
+    if path is None or not os.path.isfile(path):
+        return jsonify({
+            'status': 'error',
+            'message': 'Image not found'
+        }), 404
+
+    mode = current_app.config.get('UPLOAD_SERVE_MODE', 'flask')
+    max_age = current_app.config.get('UPLOAD_CACHE_MAX_AGE', IMMUTABLE_MAX_AGE)
+
+    if mode == 'x-accel':
+        prefix = current_app.config.get('UPLOAD_ACCEL_PREFIX', '/protected/uploads/stubs/')
+        response = current_app.response_class(status=200)
+        response.headers['X-Accel-Redirect'] = f"{prefix.rstrip('/')}/{user_id}/{filename}"
+        response.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    else:
+        response = send_file(
+            path,
+            environ=request.environ,
+            use_x_sendfile=(mode == 'x-sendfile'),
+            response_class=current_app.response_class,
+            max_age=max_age,
+            conditional=True,
+            etag=True
+        )
+
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    response.cache_control.immutable = True
+    return response
@@ -0,0 +1,29 @@
+import hmac
+
+from flask import Blueprint, Response, current_app, jsonify, request
+from app import limiter
+from app.utils.metrics import render_metrics
+
+bp = Blueprint('metrics', __name__)
+
+@bp.route('/metrics', methods=['GET'])
+@limiter.exempt
+def metrics():
+    """
+    Prometheus scrape endpoint. Requires the METRICS_AUTH_TOKEN bearer token; without
+    a token it is only served when METRICS_ALLOW_UNAUTHENTICATED is set (internal-only listener)
+    """
+    token = current_app.config.get('METRICS_AUTH_TOKEN')
+    if not token and not current_app.config.get('METRICS_ALLOW_UNAUTHENTICATED', False):
+        return jsonify({
+            'status': 'error',
+            'message': 'Not found'
+        }), 404
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return jsonify({
+            'status': 'error',
+            'message': 'Unauthorized'
+        }), 401
+
+    data, content_type = render_metrics(current_app._get_current_object())
+    return Response(data, mimetype=content_type)
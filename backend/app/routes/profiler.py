@@ -0,0 +1,119 @@
+from flask import Blueprint, Response, current_app, jsonify, request
+from flask_login import login_required, current_user
+from functools import wraps
+import math
+from app.utils.profiler import registry
+
+bp = Blueprint('profiler', __name__)
+
+def admin_required(f):
+    """Reject non-admin users with 403"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not getattr(current_user, 'is_admin', False):
+            print(f"[WARNING] unauthorized_profiler_access: user_id={current_user.id}")
+            return jsonify({
+                'status': 'error',
+                'message': 'Admin access required'
+            }), 403
+        return f(*args, **kwargs)
+    return decorated
+
+@bp.route('/admin/profiler/start', methods=['POST'])
+@login_required
+@admin_required
+def start_profile():
+    """
+    Start sampling every thread of the worker that serves this request.
+
+    JSON body (all optional):
+    - duration: seconds before the profile stops itself (default 30, capped by PROFILER_MAX_DURATION)
+    - interval_ms: sampling interval (default 10)
+    """
+    data = request.get_json(silent=True) or {}
+    max_duration = current_app.config.get('PROFILER_MAX_DURATION', 60)
+
+    try:
+        duration = float(data.get('duration', 30))
+        interval_ms = float(data.get('interval_ms', 10))
+    except (TypeError, ValueError):
+        duration = interval_ms = math.nan
+    if not all(math.isfinite(value) and value > 0 for value in (duration, interval_ms)):
+        return jsonify({
+            'status': 'error',
+            'message': 'duration and interval_ms must be positive numbers'
+        }), 400
+    duration = min(duration, max_duration)
+    interval_ms = max(interval_ms, 1)
+
+    profiler = registry.start_worker_profile(duration, interval_ms)
+    if profiler is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'A profile is already running in this worker'
+        }), 409
+
+    return jsonify({
+        'status': 'success',
+        'message': f'Profiling this worker for up to {duration:g}s',
+        'data': profiler.summary()
+    }), 201
+
+@bp.route('/admin/profiler/stop', methods=['POST'])
+@login_required
+@admin_required
+def stop_profile():
+    """Stop the running worker profile early"""
+    profiler = registry.stop_worker_profile()
+    if profiler is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'No profile is running in this worker'
+        }), 404
+
+    return jsonify({
+        'status': 'success',
+        'data': profiler.summary()
+    })
+
+@bp.route('/admin/profiler/profiles', methods=['GET'])
+@login_required
+@admin_required
+def list_profiles():
+    """Recent worker and per-request profiles held by this worker"""
+    return jsonify({
+        'status': 'success',
+        'data': registry.list()
+    })
+
+@bp.route('/admin/profiler/profiles/<profile_id>', methods=['GET'])
+@login_required
+@admin_required
+def get_profile(profile_id):
+    """
+    Collapsed stacks for one profile, ready for flamegraph.pl or speedscope.
+
+    Query Parameters:
+    - format: 'collapsed' (default, text/plain) or 'json'
+    """
+    profiler = registry.get(profile_id)
+    if profiler is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Profile not found in this worker'
+        }), 404
+
+    if request.args.get('format') == 'json':
+        return jsonify({
+            'status': 'success',
+            'data': {
+                **profiler.summary(),
+                'stacks': dict(profiler.stacks.most_common())
+            }
+        })
+
+    return Response(
+        profiler.collapsed(),
+        mimetype='text/plain',
+        headers={'Content-Disposition': f'inline; filename=profile_{profile_id}.collapsed'}
+    )
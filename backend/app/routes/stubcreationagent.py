@@ -3,7 +3,6 @@ from flask_login import login_required, current_user
 import os
 import asyncio
 from agents import Agent, Runner, SQLiteSession, function_tool
-from agents.extensions.models.litellm_model import LitellmModel
 import base64
 from openai.types.responses import ResponseInputImageParam, ResponseInputTextParam
 from openai.types.responses.response_input_item_param import Message
@@ -20,6 +19,11 @@ from dataclasses import dataclass
 from flask_login import current_user
 from app.prompts.agentprompt import stub_creation_agent_prompt
 from app.services.stub_service import StubProcessor
+from app.services.storage import get_storage, storage_key
+from app.services.model_provider import get_model_provider
+from app.services.price_index import price_stats
+from app.services.entity_normalizer import canonicalize_stub
+from app.utils.metrics import instrument_agent_model
 from app.models.stub import Stub
 from app import db
 
@@ -41,27 +45,20 @@ def custom_save_image(image_file, user_id):
     Returns the saved image path
     """
     try:
-        # Create upload directory structure
-        upload_base = os.path.join(current_app.root_path, 'static', 'uploads', 'stubs')
-        user_upload_dir = os.path.join(upload_base, str(user_id))
-        
-        # Ensure directories exist
-        os.makedirs(user_upload_dir, exist_ok=True)
-        
         # Generate unique filename
         file_extension = image_file.filename.rsplit('.', 1)[1].lower()
         unique_filename = f"{uuid.uuid4().hex}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{file_extension}"
         
-        # Full file path
-        file_path = os.path.join(user_upload_dir, unique_filename)
-        
-        
+        # Storage key, also what gets stored as Stub.image_path
+        key = f"{user_id}/{unique_filename}"
+
         # Save the file
-        image_file.save(file_path)
-        
+        storage = get_storage()
+        storage.save(key, image_file.stream, image_file.mimetype)
+
         # Verify file was saved
-        if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
-            return file_path
+        if storage.exists(key) and storage.size(key) > 0:
+            return key
         else:
             raise Exception("File was not saved properly or is empty")
             
@@ -71,8 +68,7 @@ def custom_save_image(image_file, user_id):
 
 def get_stub_processor():
     """Get or create StubProcessor instance"""
-    UPLOAD_FOLDER = os.path.join(current_app.root_path, 'static', 'uploads', 'stubs')
-    return StubProcessor(UPLOAD_FOLDER)
+    return StubProcessor(get_storage())
 
 
 def get_session(user_id):
@@ -128,12 +124,36 @@ def clear_user_memory(user_id):
 def encode_image(image_path):
     """Encode image to base64"""
     try:
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode("utf-8")
+        return base64.b64encode(get_storage().read(storage_key(image_path))).decode("utf-8")
     except Exception as e:
         raise Exception(f"Failed to encode image: {str(e)}")
 
 
+@function_tool()
+async def lookup_market_value(event_plain: str, venue: str, date: str):
+    """
+    Looks up recent sale and asking prices for an event in the marketplace price index.
+
+    Parameters:
+        event_plain (str): The plain text name of the event (e.g., "Coldplay Concert").
+        venue (str): The name of the venue.
+        date (str): The date of the event, formatted as YYYY-MM-DD.
+    """
+    result = price_stats(event_plain, venue_name=venue, date=date)
+    if not result['success'] or result['suggested_price'] is None:
+        return f"No marketplace price data for {event_plain}. Estimate the market value yourself."
+
+    stats = result['levels'][result['match']]
+    scope = result['match'].replace('_', ' + ')
+    return (
+        f"Suggested market value: {result['suggested_price']:.2f} USD "
+        f"(average {result['suggested_from']} price, matched on {scope}). "
+        f"Sold: {stats['sold']['count']} (min {stats['sold']['min']}, max {stats['sold']['max']}, "
+        f"last {stats['sold']['last']}). Listed now: {stats['listed']['count']} "
+        f"(average asking {stats['listed']['average']})."
+    )
+
+
 @function_tool()
 async def draft_listing(
     listing_title: str,
@@ -197,6 +217,7 @@ async def draft_listing(
                 seat_info=seat_details,
                 status='processed'
             )
+            canonicalize_stub(new_stub)
             
             # Add to database
             db.session.add(new_stub)
@@ -241,11 +262,8 @@ def get_agent():
     return Agent(
         name="Stub Analyzer Agent",
         instructions=stub_creation_agent_prompt(),
-        model=LitellmModel(
-            model=os.getenv("MODEL"),
-            api_key=os.getenv("GEMINI_API_KEY")
-        ),
-        tools=[draft_listing],
+        model=instrument_agent_model(get_model_provider().agent_model()),
+        tools=[lookup_market_value, draft_listing],
     )
 
 
@@ -286,10 +304,10 @@ def stub_creation_agent():
                 saved_image_path = custom_save_image(image_file, current_user.id)
                 current_app.last_uploaded_image_path = saved_image_path  # persist image
 
-                if not os.path.exists(saved_image_path):
+                if not get_storage().exists(saved_image_path):
                     raise Exception("Saved image file does not exist")
 
-                if os.path.getsize(saved_image_path) == 0:
+                if get_storage().size(saved_image_path) == 0:
                     raise Exception("Saved image file is empty")
 
             except Exception as e:
@@ -1,11 +1,13 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required, current_user
-import os
 from app import db, limiter
 from app.models.stub import Stub, SUPPORTED_CURRENCIES
 from app.services.stub_service import StubProcessor
+from app.services.storage import get_storage, storage_key
+from app.services.entity_normalizer import canonicalize_stub
+from app.services.stub_import import IMPORT_FORMATS, detect_format, import_stubs, read_records
 from datetime import datetime
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, selectinload
 
 bp = Blueprint('stubs', __name__)
 
@@ -13,12 +15,34 @@ ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 
 def get_stub_processor():
     """Get or create StubProcessor instance"""
-    UPLOAD_FOLDER = os.path.join(current_app.root_path, 'static', 'uploads', 'stubs')
-    return StubProcessor(UPLOAD_FOLDER)
+    return StubProcessor(get_storage())
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def image_file_error(image_file):
+    """Error response for an unusable image upload, None when it can be saved"""
+    if image_file.filename == '':
+        return jsonify({
+            'status': 'error',
+            'message': 'No selected file'
+        }), 400
+
+    if not allowed_file(image_file.filename):
+        return jsonify({
+            'status': 'error',
+            'message': 'Invalid file type. Allowed types: PNG, JPG, JPEG'
+        }), 400
+
+    # Check file size (limit to 5MB)
+    if len(image_file.read()) > 5 * 1024 * 1024:  # 5MB in bytes
+        return jsonify({
+            'status': 'error',
+            'message': 'File size too large. Maximum size is 5MB'
+        }), 400
+    image_file.seek(0)  # Reset file pointer after reading
+    return None
+
 @bp.route('/stubs/upload', methods=['POST'])
 @limiter.limit("10 per minute")
 @login_required
@@ -39,25 +63,9 @@ def upload_stub():
         }), 400
 
     image_file = request.files['image']
-    if image_file.filename == '':
-        return jsonify({
-            'status': 'error',
-            'message': 'No selected file'
-        }), 400
-
-    if not allowed_file(image_file.filename):
-        return jsonify({
-            'status': 'error',
-            'message': 'Invalid file type. Allowed types: PNG, JPG, JPEG'
-        }), 400
-
-    # Check file size (limit to 5MB)
-    if len(image_file.read()) > 5 * 1024 * 1024:  # 5MB in bytes
-        return jsonify({
-            'status': 'error',
-            'message': 'File size too large. Maximum size is 5MB'
-        }), 400
-    image_file.seek(0)  # Reset file pointer after reading
+    error = image_file_error(image_file)
+    if error:
+        return error
 
     try:
         stub_processor = get_stub_processor()
@@ -90,6 +98,7 @@ def upload_stub():
             seat_info=parsed_data.get('seat_info'),
             status='processed'
         )
+        canonicalize_stub(stub)
 
         db.session.add(stub)
         db.session.commit()
@@ -109,6 +118,110 @@ def upload_stub():
             'error': str(e)
         }), 500
 
+@bp.route('/stubs/import', methods=['POST'])
+@limiter.limit("5 per minute")
+@login_required
+def import_stub_file():
+    """
+    Create stubs from a CSV, NDJSON or JSON file of stub metadata, without image extraction
+    
+    Send the file as multipart field 'file', or as the request body with a text/csv,
+    application/x-ndjson or application/json content type. Fields: title (required),
+    event_name, event_date, venue_name, ticket_price, currency, seat_info; the stubs
+    export can be imported as is. Invalid rows are skipped and reported by row number.
+    
+    Query Parameters:
+    - format: csv, ndjson or json (default: from the file name or content type)
+    - dry_run: 'true' to validate the file without creating stubs
+    """
+    upload = request.files.get('file')
+    if upload is not None:
+        stream, fmt = upload.stream, detect_format(upload.filename, upload.mimetype)
+    else:
+        stream, fmt = request.stream, detect_format(None, request.mimetype)
+    fmt = request.args.get('format', fmt or '').lower()
+    if fmt not in IMPORT_FORMATS:
+        return jsonify({
+            'status': 'error',
+            'message': f'Unknown file format. Supported formats: {", ".join(IMPORT_FORMATS)}'
+        }), 400
+
+    try:
+        result = import_stubs(
+            current_user.id,
+            read_records(stream, fmt),
+            batch_size=current_app.config.get('IMPORT_BATCH_SIZE', 1000),
+            max_rows=current_app.config.get('IMPORT_MAX_ROWS', 50000),
+            dry_run=request.args.get('dry_run', 'false').lower() == 'true'
+        )
+    except UnicodeDecodeError:
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': 'The file must be UTF-8 encoded'
+        }), 400
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error importing stubs: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': 'An error occurred while importing stubs',
+            'error': str(e)
+        }), 500
+
+    del result['success']
+    verb = 'Validated' if result['dry_run'] else 'Imported'
+    return jsonify({
+        'status': 'success',
+        'message': f"{verb} {result['imported']} stubs, {result['failed']} rows failed",
+        'data': result
+    }), 201 if result['imported'] and not result['dry_run'] else 200
+
+@bp.route('/stubs/<int:stub_id>/image', methods=['PUT'])
+@limiter.limit("10 per minute")
+@login_required
+def attach_stub_image(stub_id):
+    """Attach or replace a stub's image without re-running extraction (e.g. for imported stubs)"""
+    stub = Stub.query.filter_by(id=stub_id, user_id=current_user.id).first()
+    if not stub:
+        return jsonify({
+            'status': 'error',
+            'message': 'Stub not found'
+        }), 404
+
+    if 'image' not in request.files:
+        return jsonify({
+            'status': 'error',
+            'message': 'No image file provided'
+        }), 400
+    image_file = request.files['image']
+    error = image_file_error(image_file)
+    if error:
+        return error
+
+    try:
+        previous_image = stub.image_path
+        stub.image_path = get_stub_processor().save_image(image_file, current_user.id)
+        db.session.commit()
+
+        # Image keys are unique per upload, so the old object can go once the row points elsewhere
+        if previous_image:
+            get_storage().delete(storage_key(previous_image))
+
+        return jsonify({
+            'status': 'success',
+            'message': 'Image attached successfully',
+            'data': stub.to_dict()
+        })
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error attaching stub image: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': 'An error occurred while attaching the image',
+            'error': str(e)
+        }), 500
+
 @bp.route('/stubs/<int:stub_id>', methods=['PUT'])
 @login_required
 def update_stub(stub_id):
@@ -155,6 +268,8 @@ def update_stub(stub_id):
             stub.currency = data['currency']
         if 'seat_info' in data:
             stub.seat_info = data['seat_info']
+        if 'event_name' in data or 'venue_name' in data:
+            canonicalize_stub(stub)
 
         stub.status = 'manual'
         db.session.commit()
@@ -183,9 +298,9 @@ def delete_stub(stub_id):
         }), 404
 
     try:
-        # Delete the associated image file if it exists
-        if stub.image_path and os.path.exists(stub.image_path):
-            os.remove(stub.image_path)
+        # Delete the associated image from storage (a no-op if it is already gone)
+        if stub.image_path:
+            get_storage().delete(storage_key(stub.image_path))
         
         # Remove the stub from database
         db.session.delete(stub)
@@ -231,7 +346,7 @@ def get_stubs():
         end_date = request.args.get('end_date', None)
         
         # Build query
-        query = Stub.query.filter_by(user_id=current_user.id)
+        query = Stub.query.options(selectinload(Stub.listings)).filter_by(user_id=current_user.id)
         
         # Filter by title search (case-insensitive partial match)
         if title_search:
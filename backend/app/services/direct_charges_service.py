@@ -11,7 +11,8 @@ from app import db
 from app.models.user import User
 from app.models.stub_order import StubOrder
 from app.models.stub_payment import StubPayment
-from app.models.stub_listing import StubListing
+from app.models.stub_listing import StubListing, ListingUnavailableError
+from app.utils.tracing import trace_span, traced
 
 class DirectChargesService:
     """
@@ -25,6 +26,10 @@ class DirectChargesService:
         stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
         self.webhook_secret = os.getenv('STRIPE_WEBHOOK_SECRET')
         
+        # Optional API base override (e.g. the local Stripe mock in benchmarks/stripe_mock.py)
+        if os.getenv('STRIPE_API_BASE'):
+            stripe.api_base = os.getenv('STRIPE_API_BASE')
+        
         # Validate required environment variables
         if not stripe.api_key:
             raise ValueError("STRIPE_SECRET_KEY environment variable is not set")
@@ -45,6 +50,8 @@ class DirectChargesService:
             '18.211.135.69', '3.89.151.148', '34.234.32.107', '52.15.183.38',
             '35.154.171.200', '52.74.223.119', '18.139.77.50', '52.221.197.229'
         ]
+        # Only disable for offline benchmarks that deliver signed webhooks locally
+        self.WEBHOOK_IP_CHECK_ENABLED = os.getenv('STRIPE_WEBHOOK_IP_CHECK', 'true').lower() == 'true'
         
         # PHASE 5 ENHANCEMENT: Event idempotency tracking
         self.processed_events: Set[str] = set()
@@ -99,6 +106,7 @@ class DirectChargesService:
         except Exception as e:
             return False, f"Webhook validation error: {str(e)}"
     
+    @traced()
     def validate_seller_eligibility(self, seller_id: int) -> Tuple[bool, str, Optional[Dict]]:
         """Enhanced seller eligibility validation for liability shift"""
         try:
@@ -171,6 +179,7 @@ class DirectChargesService:
         except Exception as e:
             return False, f"Validation error: {str(e)}", None
     
+    @traced()
     def create_direct_charge_payment_intent(self, listing_id: int, buyer_id: int) -> Dict:
         """PHASE 5 ENHANCED: Create PaymentIntent with enhanced security validation"""
         try:
@@ -255,9 +264,10 @@ class DirectChargesService:
 
                 try:
                     # Create order (this also reserves the listing)
-                    order = StubOrder.from_listing(listing, buyer_id, self.PLATFORM_FEE_PERCENTAGE)
-                    db.session.add(order)
-                    db.session.flush()  # Get order ID
+                    with trace_span('StubOrder.from_listing', listing_id=listing.id):
+                        order = StubOrder.from_listing(listing, buyer_id, self.PLATFORM_FEE_PERCENTAGE)
+                        db.session.add(order)
+                        db.session.flush()  # Get order ID
 
                     # Set seller payout schedule
                     order.set_seller_payout_schedule(self.PAYOUT_HOLD_DAYS)
@@ -265,7 +275,7 @@ class DirectChargesService:
                     # Create payment record with temporary status
                     payment = StubPayment(
                         order_id=order.id,
-                        payment_intent_id='pending',  # Temporary until Stripe call succeeds
+                        payment_intent_id=f'pending_{order.id}',  # Temporary (unique per order) until Stripe call succeeds
                         amount_total_cents=order.total_amount_cents,
                         platform_fee_cents=order.platform_fee_cents,
                         currency=self.SUPPORTED_CURRENCY,
@@ -276,6 +286,14 @@ class DirectChargesService:
 
                     db.session.add(payment)
                     db.session.commit()
+                except ListingUnavailableError as e:
+                    # Lost the reservation race to a concurrent checkout
+                    db.session.rollback()
+                    self.log_security_event("payment_attempt_listing_reserved", {
+                        'listing_id': listing_id,
+                        'buyer_id': buyer_id
+                    }, "INFO")
+                    return {'success': False, 'error': str(e), 'conflict': True}
                 except Exception as db_error:
                     db.session.rollback()
                     return {'success': False, 'error': f'Order creation failed: {str(db_error)}'}
@@ -356,6 +374,7 @@ class DirectChargesService:
         except Exception as e:
             return {'success': False, 'error': f'Payment creation failed: {str(e)}'}
     
+    @traced()
     def handle_successful_payment(self, payment_intent_id: str) -> Dict:
         """FIXED: Handle successful payment with proper listing status sync"""
         try:
@@ -383,7 +402,7 @@ class DirectChargesService:
             # Retrieve PaymentIntent details
             intent = stripe.PaymentIntent.retrieve(
                 payment_intent_id,
-                expand=['latest_charge']
+                expand=['latest_charge.balance_transaction']
             )
 
             if intent.status == 'succeeded':
@@ -465,6 +484,7 @@ class DirectChargesService:
         except stripe.error.StripeError as e:
             return {'success': False, 'error': f'Payout schedule configuration failed: {str(e)}'}
     
+    @traced()
     def process_refund(self, order_id: int, refund_reason: str = 'requested_by_customer') -> Dict:
         """FIXED: Process refund with proper listing status restoration"""
         try:
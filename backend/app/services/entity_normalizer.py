@@ -0,0 +1,338 @@
+# backend/app/services/entity_normalizer.py - Canonical events and venues for extracted names
+"""
+Maps the free-text event and venue names that extraction produces (Gemini, the
+listing agent, manual edits) to canonical_entity rows, so 'FC Barcelona vs Real
+Madrid' and 'Real Madrid v Barcelona' group, filter and price as one event.
+
+Matching, per kind:
+1. match key: ASCII-folded lowercase tokens, filler words (the, vs, fc, ...)
+   dropped, sorted, so punctuation and word order do not matter
+2. exact match-key hit
+3. fuzzy: Dice similarity of the token trigram sets. Candidates come from a
+   prefix-filtered trigram index: each entity is posted under its rarest
+   trigrams only and a query probes only its own rarest ones, which any pair
+   above the threshold must share, so common words ('stadium', 'tour') never
+   fan out to every entity. Numbers (years, editions) must agree
+4. otherwise a new entity
+
+The index lives in memory per process, loaded from canonical_entity on first use.
+A miss loads the entities other workers created since (by id) and matches again:
+resolve() always does before creating one, so workers do not duplicate each
+other's entities; read-only lookups (listing filters, price stats) do at most
+once every ENTITY_REFRESH_SECONDS. New
+entities are committed on their own connection: they are reference data, and a
+stub write that rolls back must not leave the index pointing at a missing row.
+"""
+import math
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import click
+from flask import current_app
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.models.canonical_entity import CanonicalEntity
+from app.models.price_index import normalize_key
+
+# Words that vary between spellings of the same event or venue
+STOP_TOKENS = frozenset({
+    'a', 'an', 'and', 'at', 'in', 'of', 'the', 'v', 'vs', 'versus', 'fc', 'cf', 'afc', 'sc',
+})
+
+
+def match_key(name):
+    """'The Lakers vs. Celtics' -> 'celtics lakers'; '' when there is nothing to match"""
+    tokens = normalize_key(name).split()
+    kept = [token for token in tokens if token not in STOP_TOKENS] or tokens
+    return ' '.join(sorted(set(kept)))[:255]
+
+
+def _trigrams(key):
+    grams = set()
+    for token in key.split():
+        padded = f' {token} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _numbers(key):
+    return frozenset(token for token in key.split() if token.isdigit())
+
+
+class EntityIndex:
+    """In-memory exact and trigram index over canonical_entity"""
+
+    def __init__(self, threshold=0.8, refresh_seconds=5):
+        self.threshold = threshold
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._refreshed_at = 0.0
+        self._max_id = 0
+        self._names = {}                  # id -> display name
+        self._keys = {}                   # id -> match key
+        self._kinds = {}                  # id -> kind
+        self._by_key = {}                 # (kind, match key) -> id
+        self._grams = {}                  # id -> trigram set
+        self._numbers = {}                # id -> numeric tokens
+        self._postings = defaultdict(list)  # (kind, trigram) -> (id, position) for entity prefixes
+        self._frequency = {}              # trigram -> entity count when the postings were built
+        self._indexed_size = 0
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _prefix(self, grams):
+        """
+        The rarest trigrams of a set (rarity frozen in _frequency, so every set uses the
+        same order). Two sets with Dice >= threshold share a trigram within their
+        prefixes: at that similarity a set of n trigrams shares at least
+        t * n / (2 - t) of them, so the first n - that + 1 cannot all miss.
+        """
+        t = self.threshold
+        shared = max(math.ceil(t * len(grams) / (2 - t) - 1e-9), 1)
+        ordered = sorted(grams, key=lambda gram: (self._frequency.get(gram, 0), gram))
+        return ordered[:len(grams) - shared + 1]
+
+    def _add(self, entity_id, kind, name, key):
+        grams = _trigrams(key)
+        self._names[entity_id] = name
+        self._keys[entity_id] = key
+        self._kinds[entity_id] = kind
+        self._by_key[(kind, key)] = entity_id
+        self._grams[entity_id] = grams
+        self._numbers[entity_id] = _numbers(key)
+        for position, gram in enumerate(self._prefix(grams)):
+            self._postings[(kind, gram)].append((entity_id, position))
+
+    def _reindex(self):
+        """Re-rank trigrams by current frequency and rebuild the prefix postings"""
+        self._frequency = {}
+        for grams in self._grams.values():
+            for gram in grams:
+                self._frequency[gram] = self._frequency.get(gram, 0) + 1
+        self._postings = defaultdict(list)
+        for entity_id, grams in self._grams.items():
+            for position, gram in enumerate(self._prefix(grams)):
+                self._postings[(self._kinds[entity_id], gram)].append((entity_id, position))
+        self._indexed_size = len(self._grams)
+
+    def refresh(self):
+        """Load entities created since the last refresh (by any process)"""
+        from app import db
+
+        table = CanonicalEntity.__table__
+        with self._lock:
+            with db.engine.connect() as connection:
+                rows = connection.execute(
+                    select(table.c.id, table.c.kind, table.c.name, table.c.match_key)
+                    .where(table.c.id > self._max_id).order_by(table.c.id)
+                ).all()
+            for entity_id, kind, name, key in rows:
+                self._add(entity_id, kind, name, key)
+                self._max_id = entity_id
+            # Rarity drifts as entities are added; any fixed order is correct, a current one is fast
+            if len(self._grams) >= 2 * max(self._indexed_size, 500):
+                self._reindex()
+            self._loaded = True
+            self._refreshed_at = time.monotonic()
+        return len(rows)
+
+    def match(self, kind, name):
+        """(entity id or None, match key) for a raw name; no writes"""
+        entity_id, key = self._match(kind, name)
+        if entity_id is None and key and time.monotonic() - self._refreshed_at > self.refresh_seconds \
+                and self.refresh():
+            entity_id, key = self._match(kind, name)  # created by another worker since
+        return entity_id, key
+
+    def _match(self, kind, name):
+        key = match_key(name)
+        if not key:
+            return None, ''
+        if not self._loaded:
+            self.refresh()
+
+        entity_id = self._by_key.get((kind, key))
+        if entity_id is not None:
+            return entity_id, key
+
+        grams = _trigrams(key)
+        size, t = len(grams), self.threshold
+        min_size, max_size = t * size / (2 - t), (2 - t) * size / t
+        numbers = _numbers(key)
+        seen = set()
+        best, best_score = None, 0.0
+        for i, gram in enumerate(self._prefix(grams)):
+            for candidate, j in self._postings.get((kind, gram), ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                other = self._grams[candidate]
+                # First shared trigram in the common order: nothing before i / j is shared,
+                # so the overlap is at most what is left of the shorter remainder
+                if not min_size <= len(other) <= max_size \
+                        or 2 * min(size - i, len(other) - j) < t * (size + len(other)) - 1e-9 \
+                        or self._numbers[candidate] != numbers:
+                    continue
+                score = 2 * len(grams & other) / (size + len(other))
+                if score >= t and score > best_score:
+                    best, best_score = candidate, score
+        return best, key
+
+    def resolve(self, kind, name):
+        """Canonical id for a raw name, creating the entity when nothing matches"""
+        entity_id, key = self._match(kind, name)
+        if entity_id is None and key and self.refresh():
+            entity_id, key = self._match(kind, name)  # another worker may have created it
+        if entity_id is not None or not key:
+            return entity_id
+        return self._create(kind, ' '.join(name.split())[:255], key)
+
+    def resolve_many(self, kind, names):
+        """
+        {name: canonical id} for many raw names (bulk imports). Missing entities are
+        created with one INSERT; a new name that matches another new name in the same
+        call shares its entity, as it would when resolved one by one.
+        """
+        from app import db
+
+        matches = {name: self._match(kind, name) for name in names}
+        if any(entity_id is None and key for entity_id, key in matches.values()) and self.refresh():
+            # Misses may be entities other workers created since our last refresh
+            matches = {name: self._match(kind, name) for name in names}
+
+        pending = EntityIndex(self.threshold)  # entities this call will create, by row number
+        pending._loaded = True
+        ids, rows = {}, []
+        for name, (entity_id, key) in matches.items():
+            if entity_id is None and key:
+                row, _ = pending._match(kind, name)
+                if row is None:
+                    row = len(rows)
+                    rows.append({'kind': kind, 'name': ' '.join(name.split())[:255], 'match_key': key})
+                    pending._add(row, kind, rows[row]['name'], key)
+                entity_id = ('new', row)
+            ids[name] = entity_id
+        if not rows:
+            return ids
+
+        now = datetime.utcnow()
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(CanonicalEntity.__table__.insert(), [dict(row, created_at=now) for row in rows])
+        except IntegrityError:
+            # Another worker created one of the keys since our last refresh; fall back to one by one
+            self.refresh()
+            return {name: self.resolve(kind, name) if isinstance(entity_id, tuple) else entity_id
+                    for name, entity_id in ids.items()}
+
+        self.refresh()
+        return {name: self._by_key.get((kind, rows[entity_id[1]]['match_key'])) if isinstance(entity_id, tuple)
+                else entity_id for name, entity_id in ids.items()}
+
+    def _create(self, kind, name, key):
+        from app import db
+
+        try:
+            with db.engine.begin() as connection:
+                result = connection.execute(CanonicalEntity.__table__.insert().values(
+                    kind=kind, name=name, match_key=key, created_at=datetime.utcnow()
+                ))
+        except IntegrityError:
+            # Another worker created the same key since our last refresh
+            self.refresh()
+            return self._by_key.get((kind, key))
+
+        # _max_id is left alone so the next refresh still sees entities other workers added
+        entity_id = result.inserted_primary_key[0]
+        with self._lock:
+            self._add(entity_id, kind, name, key)
+        return entity_id
+
+    def key_for(self, entity_id):
+        if entity_id not in self._keys:
+            self.refresh()
+        return self._keys.get(entity_id)
+
+    def name_for(self, entity_id):
+        if entity_id not in self._names:
+            self.refresh()
+        return self._names.get(entity_id)
+
+
+def get_entity_index():
+    return current_app.extensions['entity_index']
+
+
+def canonicalize_stub(stub):
+    """Normalization stage: point the stub at the canonical event and venue of its extracted names"""
+    index = get_entity_index()
+    stub.event_id = index.resolve('event', stub.event_name) if stub.event_name else None
+    stub.venue_id = index.resolve('venue', stub.venue_name) if stub.venue_name else None
+
+
+def canonical_key(kind, name, entity_id=None):
+    """Grouping key: the canonical entity's match key, else the raw name's match key"""
+    index = get_entity_index()
+    if entity_id is not None:
+        key = index.key_for(entity_id)
+        if key:
+            return key
+    matched, key = index.match(kind, name)
+    return index.key_for(matched) if matched is not None else key
+
+
+def canonicalize_stubs(batch_size=500):
+    """Backfill event_id/venue_id for stubs that have names but no canonical ids"""
+    from app import db
+    from app.models.stub import Stub
+
+    index = get_entity_index()
+    needs_ids = or_(
+        and_(Stub.event_id.is_(None), Stub.event_name.isnot(None), Stub.event_name != ''),
+        and_(Stub.venue_id.is_(None), Stub.venue_name.isnot(None), Stub.venue_name != '')
+    )
+    updated, last_id = 0, 0
+    while True:
+        rows = db.session.execute(
+            select(Stub.id, Stub.event_name, Stub.venue_name, Stub.event_id, Stub.venue_id)
+            .where(Stub.id > last_id, needs_ids).order_by(Stub.id).limit(batch_size)
+        ).all()
+        # End the read transaction before entities are written on another connection (SQLite)
+        db.session.rollback()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        params = [{
+            'id': row.id,
+            'event_id': row.event_id or (index.resolve('event', row.event_name) if row.event_name else None),
+            'venue_id': row.venue_id or (index.resolve('venue', row.venue_name) if row.venue_name else None),
+        } for row in rows]
+        db.session.execute(update(Stub), params)
+        db.session.info['invalidate_marketplace'] = True
+        db.session.commit()
+        updated += len(params)
+    return {'success': True, 'stubs': updated, 'entities': len(index)}
+
+
+def init_entity_index(app):
+    """Create the per-process index and register `flask canonicalize-stubs`"""
+    app.extensions['entity_index'] = EntityIndex(
+        threshold=app.config.get('ENTITY_MATCH_THRESHOLD', 0.8),
+        refresh_seconds=app.config.get('ENTITY_REFRESH_SECONDS', 5)
+    )
+
+    @app.cli.command('canonicalize-stubs')
+    def canonicalize_stubs_command():
+        """Assign canonical events and venues to existing stubs, then rebuild the price index"""
+        from app.services.price_index import rebuild_price_index
+
+        result = canonicalize_stubs()
+        click.echo(f"Canonicalized {result['stubs']} stubs ({result['entities']} entities)")
+        result = rebuild_price_index()
+        click.echo(f"Rebuilt price index: {result['buckets']} buckets")
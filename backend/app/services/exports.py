@@ -0,0 +1,121 @@
+# backend/app/services/exports.py - Streaming CSV / NDJSON exports of a user's data
+"""
+Exports a user's stubs, listings, purchases and sales as CSV or NDJSON.
+
+Rows are read with yield_per on a dedicated connection (a server-side cursor on
+PostgreSQL) and encoded one batch at a time, so memory stays at one batch of
+rows whatever the collection size. The connection is held until the download
+finishes or the client disconnects.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+from app.models.stub import Stub
+from app.models.stub_listing import StubListing
+from app.models.stub_order import StubOrder
+from app.models.user import User
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Spreadsheet apps run cells starting with these as formulas (titles come from OCR)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _stubs(user_id):
+    return select(
+        Stub.id, Stub.title, Stub.event_name, Stub.event_date, Stub.venue_name, Stub.event_id, Stub.venue_id,
+        Stub.ticket_price, Stub.currency, Stub.seat_info, Stub.status, Stub.created_at
+    ).where(Stub.user_id == user_id).order_by(Stub.created_at.desc())
+
+
+def _listings(user_id):
+    return select(
+        StubListing.id, StubListing.stub_id, Stub.title.label('stub_title'), Stub.event_name, Stub.event_date,
+        StubListing.asking_price, StubListing.currency, StubListing.status, StubListing.payment_required,
+        StubListing.listed_at, StubListing.sold_at
+    ).join(Stub, Stub.id == StubListing.stub_id).where(StubListing.seller_id == user_id).order_by(StubListing.id)
+
+
+def _orders(user_id, role):
+    counterparty = aliased(User)
+    if role == 'buyer':
+        mine, theirs, label = StubOrder.buyer_id, StubOrder.seller_id, 'seller'
+        amounts = (StubOrder.total_amount_cents,)
+    else:
+        mine, theirs, label = StubOrder.seller_id, StubOrder.buyer_id, 'buyer'
+        amounts = (StubOrder.total_amount_cents, StubOrder.platform_fee_cents, StubOrder.seller_amount_cents)
+    return select(
+        StubOrder.id, StubOrder.stub_listing_id.label('listing_id'), Stub.title.label('stub_title'), Stub.event_name,
+        Stub.event_date, counterparty.username.label(label), *amounts, StubOrder.currency, StubOrder.order_status,
+        StubOrder.created_at, StubOrder.payment_confirmed_at, StubOrder.completed_at
+    ).join(StubListing, StubListing.id == StubOrder.stub_listing_id) \
+        .join(Stub, Stub.id == StubListing.stub_id) \
+        .join(counterparty, counterparty.id == theirs) \
+        .where(mine == user_id).order_by(StubOrder.created_at.desc())
+
+
+# name -> (user id) -> SELECT of the rows to export
+EXPORTS = {
+    'stubs': _stubs,
+    'listings': _listings,
+    'purchases': lambda user_id: _orders(user_id, 'buyer'),
+    'sales': lambda user_id: _orders(user_id, 'seller'),
+}
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def _csv_cell(value):
+    value = _plain(value)
+    if value is None:
+        return ''
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _encode_csv(columns, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows([_csv_cell(value) for value in row] for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.getvalue():
+        yield buffer.getvalue()  # header only, when there are no rows
+
+
+def _encode_ndjson(columns, batches):
+    for rows in batches:
+        yield ''.join(
+            json.dumps({column: _plain(value) for column, value in zip(columns, row)}) + '\n' for row in rows
+        )
+
+
+def stream_export(name, user_id, fmt, batch_size=500):
+    """Generator of encoded chunks; one chunk per batch of rows"""
+    from app import db
+
+    statement = EXPORTS[name](user_id)
+    columns = [column.name for column in statement.selected_columns]
+    encode = _encode_csv if fmt == 'csv' else _encode_ndjson
+    with db.engine.connect() as connection:
+        result = connection.execution_options(yield_per=batch_size).execute(statement)
+        yield from encode(columns, result.partitions())
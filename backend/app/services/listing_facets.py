@@ -0,0 +1,68 @@
+# backend/app/services/listing_facets.py - Facet counts for the listings browse page
+"""
+How many of the listings matching a browse filter fall under each venue, event
+year, price band and payment_enabled value, so the UI can show counts next to
+its filter options without paging through every listing.
+
+All four come from one GROUP BY over the filtered listings (venue x year x price
+band x payment flag) and are summed per facet here; there are few combinations
+per filter. Counts cover the whole filter, including the facet's own filter
+(with venue_id set, the venue facet has one entry).
+"""
+from collections import Counter
+
+from sqlalchemy import case, extract, func, literal_column
+
+from app.models.stub import Stub
+from app.models.stub_listing import StubListing
+
+# Lower bounds of the price bands (asking price); the last band is open-ended
+PRICE_BANDS = (0, 25, 50, 100, 250, 500)
+VENUE_LIMIT = 20
+
+
+def _price_band(column):
+    # Literal bounds, so the CASE is textually identical in SELECT and GROUP BY (PostgreSQL)
+    return case(
+        *((column >= literal_column(str(low)), literal_column(str(band)))
+          for band, low in reversed(list(enumerate(PRICE_BANDS)))),
+        else_=literal_column('0')
+    )
+
+
+def listing_facets(query):
+    """Facet counts for a filtered StubListing query that is joined to Stub"""
+    from app.services.entity_normalizer import get_entity_index
+
+    year = extract('year', Stub.event_date)
+    band = _price_band(StubListing.asking_price)
+    rows = query.with_entities(
+        Stub.venue_id, year, band, StubListing.payment_required, func.count(StubListing.id)
+    ).group_by(Stub.venue_id, year, band, StubListing.payment_required).all()
+
+    venues, years, bands, payment = Counter(), Counter(), Counter(), Counter()
+    for venue_id, event_year, price_band, payment_required, count in rows:
+        venues[venue_id] += count
+        years[int(event_year) if event_year is not None else None] += count
+        bands[price_band] += count
+        payment[bool(payment_required)] += count
+
+    entity_index = get_entity_index()
+    top_venues = sorted(venues.items(), key=lambda item: (-item[1], item[0] is None, item[0] or 0))[:VENUE_LIMIT]
+    return {
+        'venue': [{
+            'id': venue_id,
+            'name': entity_index.name_for(venue_id) if venue_id is not None else None,
+            'count': count
+        } for venue_id, count in top_venues],
+        'event_year': [
+            {'year': event_year, 'count': years[event_year]}
+            for event_year in sorted(years, key=lambda y: (y is None, y or 0))
+        ],
+        'price': [{
+            'min': low,
+            'max': PRICE_BANDS[band + 1] if band + 1 < len(PRICE_BANDS) else None,
+            'count': bands.get(band, 0)
+        } for band, low in enumerate(PRICE_BANDS)],
+        'payment_enabled': {'true': payment[True], 'false': payment[False]}
+    }
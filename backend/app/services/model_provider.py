@@ -0,0 +1,338 @@
+# backend/app/services/model_provider.py - Pluggable AI model providers
+import os
+import json
+import math
+import itertools
+import time
+import random
+import asyncio
+import threading
+from typing import Dict, Optional
+import dotenv
+
+dotenv.load_dotenv()
+
+
+class ModelProvider:
+    """
+    Supplies the model clients used by the AI features:
+    - vision_model(): LangChain-style chat model used by StubProcessor
+    - chat_model(): google.generativeai-style model used by the chatbot
+    - agent_model(): openai-agents Model used by the stub creation agent
+    """
+
+    name = 'base'
+
+    def vision_model(self):
+        raise NotImplementedError
+
+    def chat_model(self):
+        raise NotImplementedError
+
+    def agent_model(self):
+        raise NotImplementedError
+
+
+class GeminiModelProvider(ModelProvider):
+    """Remote Google Gemini / LiteLLM models (production default)"""
+
+    name = 'gemini'
+
+    def __init__(self):
+        self.api_key = os.getenv("GEMINI_API_KEY")
+
+    def vision_model(self):
+        if not self.api_key:
+            raise ValueError("GEMINI_API_KEY environment variable is not set")
+
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        return ChatGoogleGenerativeAI(
+            model="gemini-2.0-flash",
+            google_api_key=self.api_key,
+            temperature=0.1
+        )
+
+    def chat_model(self):
+        if not self.api_key:
+            return None
+
+        import google.generativeai as genai
+        genai.configure(api_key=self.api_key)
+        return genai.GenerativeModel("gemini-2.0-flash")
+
+    def agent_model(self):
+        from agents.extensions.models.litellm_model import LitellmModel
+        return LitellmModel(
+            model=os.getenv("MODEL"),
+            api_key=self.api_key
+        )
+
+
+class LatencyDistribution:
+    """
+    Simulated model latency in milliseconds, parsed from a spec string:
+    - fixed:50
+    - uniform:20:80
+    - normal:50:10        (mean, standard deviation)
+    - lognormal:50:0.5    (median, sigma)
+    """
+
+    def __init__(self, spec: str = 'fixed:0', seed: Optional[int] = None):
+        parts = (spec or 'fixed:0').split(':')
+        self.kind = parts[0].lower()
+        self.params = [float(p) for p in parts[1:]]
+        if self.kind not in ('fixed', 'uniform', 'normal', 'lognormal'):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample_ms(self) -> float:
+        with self._lock:
+            if self.kind == 'fixed':
+                value = self.params[0] if self.params else 0.0
+            elif self.kind == 'uniform':
+                value = self._random.uniform(self.params[0], self.params[1])
+            elif self.kind == 'normal':
+                value = self._random.gauss(self.params[0], self.params[1])
+            else:
+                value = self._random.lognormvariate(math.log(max(self.params[0], 1e-6)), self.params[1])
+        return max(value, 0.0)
+
+    def sample_seconds(self) -> float:
+        return self.sample_ms() / 1000.0
+
+
+DEFAULT_FAKE_STUB_DATA = {
+    'event_name': 'FC Barcelona vs Real Madrid',
+    'event_date': '2024-10-26',
+    'venue_name': 'Estadi Olimpic Lluis Companys',
+    'ticket_price': 95.0,
+    'currency': 'USD',
+    'seat_info': 'Section 112, Row 8, Seat 14',
+}
+
+DEFAULT_FAKE_CHAT_RESPONSE = "This is a canned response from the local fake model provider."
+
+DEFAULT_FAKE_AGENT_RESPONSE = "## Step 1: OCR and Ticket Details Extraction\n**Event:** FC Barcelona vs Real Madrid"
+
+
+class FakeStructuredModel:
+    """Result of FakeVisionModel.with_structured_output()"""
+
+    def __init__(self, provider, schema):
+        self.provider = provider
+        self.schema = schema
+
+    def invoke(self, messages):
+        time.sleep(self.provider.latency.sample_seconds())
+
+        # Batched extraction schemas carry a list of per-image stubs
+        if 'stubs' in getattr(self.schema, 'model_fields', {}):
+            item_schema = self.schema.model_fields['stubs'].annotation.__args__[0]
+            image_count = self.provider.count_images(messages)
+            return self.schema(stubs=[
+                item_schema(image_index=index, **self.provider.stub_data)
+                for index in range(image_count)
+            ])
+
+        return self.schema(**self.provider.stub_data)
+
+
+class FakeVisionModel:
+    """Stand-in for ChatGoogleGenerativeAI"""
+
+    def __init__(self, provider):
+        self.provider = provider
+
+    def with_structured_output(self, schema):
+        return FakeStructuredModel(self.provider, schema)
+
+
+class FakeChatResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeChatModel:
+    """Stand-in for google.generativeai.GenerativeModel"""
+
+    def __init__(self, provider):
+        self.provider = provider
+
+    def generate_content(self, contents):
+        time.sleep(self.provider.latency.sample_seconds())
+        return FakeChatResponse(self.provider.chat_response)
+
+
+class FakeModelProvider(ModelProvider):
+    """
+    Deterministic local provider for offline development and load testing.
+    Never touches the network; responses are canned and latency is simulated.
+    """
+
+    name = 'fake'
+
+    def __init__(
+        self,
+        latency: Optional[str] = None,
+        seed: Optional[int] = None,
+        stub_data: Optional[Dict] = None,
+        chat_response: Optional[str] = None,
+        agent_response: Optional[str] = None,
+        agent_tool_calls: Optional[bool] = None
+    ):
+        if latency is None:
+            latency = os.getenv('FAKE_MODEL_LATENCY', 'fixed:0')
+        if seed is None and os.getenv('FAKE_MODEL_SEED'):
+            seed = int(os.getenv('FAKE_MODEL_SEED'))
+        if stub_data is None:
+            stub_data = json.loads(os.getenv('FAKE_MODEL_STUB_DATA', 'null')) or DEFAULT_FAKE_STUB_DATA
+        if agent_tool_calls is None:
+            agent_tool_calls = os.getenv('FAKE_MODEL_AGENT_TOOL_CALLS', 'true').lower() == 'true'
+
+        self.latency = LatencyDistribution(latency, seed)
+        self.stub_data = dict(stub_data)
+        self.chat_response = chat_response or os.getenv('FAKE_MODEL_CHAT_RESPONSE', DEFAULT_FAKE_CHAT_RESPONSE)
+        self.agent_response = agent_response or os.getenv('FAKE_MODEL_AGENT_RESPONSE', DEFAULT_FAKE_AGENT_RESPONSE)
+        self.agent_tool_calls = agent_tool_calls
+
+    @staticmethod
+    def count_images(messages):
+        """Count image parts in a list of LangChain messages"""
+        count = 0
+        for message in messages:
+            content = getattr(message, 'content', message)
+            if isinstance(content, list):
+                count += sum(1 for part in content if isinstance(part, dict) and part.get('type') == 'image_url')
+        return count
+
+    def draft_listing_arguments(self):
+        """Canned arguments for the draft_listing tool call"""
+        return {
+            'listing_title': self.stub_data.get('event_name') or 'Ticket stub',
+            'listing_description_paragraph': f"Original ticket stub from {self.stub_data.get('event_name')}.",
+            'event_plain': self.stub_data.get('event_name') or 'Unknown',
+            'date': self.stub_data.get('event_date') or 'Unknown',
+            'venue': self.stub_data.get('venue_name') or 'Unknown',
+            'seat_details': self.stub_data.get('seat_info') or 'Unknown',
+            'estimated_market_value': int(self.stub_data.get('ticket_price') or 0),
+        }
+
+    def vision_model(self):
+        return FakeVisionModel(self)
+
+    def chat_model(self):
+        return FakeChatModel(self)
+
+    def agent_model(self):
+        # Imported lazily so the agents SDK is only required when the agent is used
+        from agents.items import ModelResponse
+        from agents.models.interface import Model
+        from agents.usage import Usage
+        from openai.types.responses import (
+            Response, ResponseCompletedEvent, ResponseCreatedEvent, ResponseFunctionToolCall,
+            ResponseOutputItemAddedEvent, ResponseOutputItemDoneEvent, ResponseOutputMessage, ResponseOutputText,
+            ResponseTextDeltaEvent, ResponseUsage,
+        )
+        from openai.types.responses.response_usage import InputTokensDetails, OutputTokensDetails
+
+        provider = self
+
+        class FakeAgentModel(Model):
+            """Stand-in for LitellmModel: calls draft_listing once, then answers"""
+
+            async def get_response(self, system_instructions, input, model_settings, tools,
+                                   output_schema, handoffs, tracing, **kwargs):
+                await asyncio.sleep(provider.latency.sample_seconds())
+
+                items = input if isinstance(input, list) else []
+                already_called = any(
+                    isinstance(item, dict) and item.get('type') == 'function_call_output'
+                    for item in items
+                )
+                tool_names = {getattr(tool, 'name', None) for tool in tools}
+
+                if provider.agent_tool_calls and 'draft_listing' in tool_names and not already_called:
+                    output = ResponseFunctionToolCall(
+                        type='function_call',
+                        id='fake_fc_1',
+                        call_id=f'fake_call_{int(time.time() * 1000)}',
+                        name='draft_listing',
+                        arguments=json.dumps(provider.draft_listing_arguments()),
+                    )
+                else:
+                    output = ResponseOutputMessage(
+                        type='message',
+                        id='fake_msg_1',
+                        role='assistant',
+                        status='completed',
+                        content=[ResponseOutputText(type='output_text', text=provider.agent_response, annotations=[])],
+                    )
+
+                return ModelResponse(output=[output], usage=Usage(requests=1), response_id=None)
+
+            async def stream_response(self, system_instructions, input, model_settings, tools,
+                                      output_schema, handoffs, tracing, **kwargs):
+                """get_response replayed as Responses API stream events (Runner.run_streamed)"""
+                result = await self.get_response(system_instructions, input, model_settings, tools,
+                                                 output_schema, handoffs, tracing, **kwargs)
+                response = Response(
+                    id='fake_response', created_at=time.time(), model='fake', object='response', output=[],
+                    tool_choice='auto', tools=[], parallel_tool_calls=False,
+                )
+                sequence = itertools.count()
+
+                yield ResponseCreatedEvent(response=response, type='response.created', sequence_number=next(sequence))
+                for index, item in enumerate(result.output):
+                    yield ResponseOutputItemAddedEvent(item=item, output_index=index, type='response.output_item.added',
+                                                       sequence_number=next(sequence))
+                    if isinstance(item, ResponseOutputMessage):
+                        for content_index, part in enumerate(item.content):
+                            yield ResponseTextDeltaEvent(
+                                content_index=content_index, delta=part.text, item_id=item.id, output_index=index,
+                                type='response.output_text.delta', sequence_number=next(sequence), logprobs=[],
+                            )
+                    yield ResponseOutputItemDoneEvent(item=item, output_index=index, type='response.output_item.done',
+                                                      sequence_number=next(sequence))
+
+                usage = ResponseUsage(
+                    input_tokens=0, output_tokens=0, total_tokens=0,
+                    input_tokens_details=InputTokensDetails(cached_tokens=0),
+                    output_tokens_details=OutputTokensDetails(reasoning_tokens=0),
+                )
+                yield ResponseCompletedEvent(
+                    response=response.model_copy(update={'output': result.output, 'usage': usage}),
+                    type='response.completed', sequence_number=next(sequence),
+                )
+
+        return FakeAgentModel()
+
+
+PROVIDERS = {
+    'gemini': GeminiModelProvider,
+    'fake': FakeModelProvider,
+}
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_model_provider() -> ModelProvider:
+    """Return the process-wide model provider selected by MODEL_PROVIDER"""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                name = os.getenv('MODEL_PROVIDER', 'gemini').lower()
+                if name not in PROVIDERS:
+                    raise ValueError(f"Unknown MODEL_PROVIDER: {name}. Options: {', '.join(PROVIDERS)}")
+                _provider = PROVIDERS[name]()
+    return _provider
+
+
+def set_model_provider(provider: Optional[ModelProvider]):
+    """Override the process-wide model provider (None resets to MODEL_PROVIDER)"""
+    global _provider
+    with _provider_lock:
+        _provider = provider
@@ -0,0 +1,400 @@
+# backend/app/services/price_index.py - Market-value index over listing and sale prices
+"""
+Sold and listed price aggregates per canonical event, venue and event month
+(the price_index table), so price lookups read a handful of precomputed rows
+instead of asking the model for a guess or scanning listings.
+
+The index is maintained in the same transaction as the change that moves it:
+after each flush, listing inserts, status changes (listed, sold, refunded,
+cancelled) and price edits, plus event/venue/date edits of listed stubs, become
+per-bucket deltas applied with one atomic upsert per bucket. Concurrent sales
+of the same event add up instead of overwriting each other.
+
+Buckets are keyed by the canonical entity's match key
+(app/services/entity_normalizer.py), so spellings of one event share a bucket;
+stubs without canonical ids fall back to the match key of their raw names.
+
+Refunds take a sale out of the count and total; min/max keep the observed range.
+`flask rebuild-price-index` recomputes everything (backfill, or after bulk imports).
+"""
+import math
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+import click
+from sqlalchemy import and_, case, event, inspect, insert, literal, null, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models.price_index import PriceIndex, month_bucket
+from app.models.stub_listing import OPEN_STATUSES
+from app.services.entity_normalizer import canonical_key
+
+BUCKET_COLUMNS = ('event_id', 'event_name', 'venue_id', 'venue_name', 'event_date')
+INDEXED_STATUSES = OPEN_STATUSES + ('sold',)
+
+_MONTH = re.compile(r'^(\d{4})-(\d{2})')
+
+
+def _cents(price):
+    # A NaN / infinite price (bad data) counts as 0 rather than failing the whole flush
+    return int(round(price * 100)) if price and math.isfinite(price) else 0
+
+
+def _bucket(event_id, event_name, venue_id, venue_name, event_date):
+    return (canonical_key('event', event_name, event_id), canonical_key('venue', venue_name, venue_id),
+            month_bucket(event_date))
+
+
+@dataclass
+class BucketDelta:
+    listed_count: int = 0
+    listed_total_cents: int = 0
+    sold_count: int = 0
+    sold_total_cents: int = 0
+    sold_min_cents: Optional[int] = None
+    sold_max_cents: Optional[int] = None
+    last_sold_cents: Optional[int] = None
+    last_sold_at: Optional[datetime] = None
+
+    def listed(self, cents, sign):
+        self.listed_count += sign
+        self.listed_total_cents += sign * cents
+
+    def sold(self, cents, sold_at):
+        self.sold_count += 1
+        self.sold_total_cents += cents
+        self.sold_min_cents = cents if self.sold_min_cents is None else min(self.sold_min_cents, cents)
+        self.sold_max_cents = cents if self.sold_max_cents is None else max(self.sold_max_cents, cents)
+        sold_at = sold_at or datetime.utcnow()
+        if self.last_sold_at is None or sold_at >= self.last_sold_at:
+            self.last_sold_cents, self.last_sold_at = cents, sold_at
+
+    def unsold(self, cents):
+        self.sold_count -= 1
+        self.sold_total_cents -= cents
+
+    def is_empty(self):
+        return not (self.listed_count or self.listed_total_cents or self.sold_count
+                    or self.sold_total_cents or self.last_sold_at)
+
+
+def _remove(delta, status, cents):
+    if status in OPEN_STATUSES:
+        delta.listed(cents, -1)
+    elif status == 'sold':
+        delta.unsold(cents)
+
+
+def _add(delta, status, cents, sold_at):
+    if status in OPEN_STATUSES:
+        delta.listed(cents, 1)
+    elif status == 'sold':
+        delta.sold(cents, sold_at)
+
+
+# ---------------------------------------------------------------------------
+# Incremental maintenance
+# ---------------------------------------------------------------------------
+
+def _stub_buckets(session, stub_ids, moved):
+    """(old bucket, new bucket) per stub id, from the identity map when loaded"""
+    from app.models.stub import Stub
+
+    buckets = dict(moved)
+    missing = []
+    for stub_id in stub_ids:
+        if stub_id in buckets:
+            continue
+        stub = session.identity_map.get(session.identity_key(Stub, stub_id))
+        loaded = inspect(stub).dict if stub is not None else {}
+        if all(column in loaded for column in BUCKET_COLUMNS):
+            key = _bucket(*(loaded[column] for column in BUCKET_COLUMNS))
+            buckets[stub_id] = (key, key)
+        else:
+            missing.append(stub_id)
+
+    if missing:
+        rows = session.connection().execute(
+            select(Stub.id, *(getattr(Stub, column) for column in BUCKET_COLUMNS)).where(Stub.id.in_(missing))
+        )
+        for stub_id, *columns in rows:
+            key = _bucket(*columns)
+            buckets[stub_id] = (key, key)
+    return buckets
+
+
+def _moved_stubs(session):
+    """Stubs whose event, venue or date changed in this flush: id -> (old bucket, new bucket)"""
+    from app.models.stub import Stub
+
+    moved = {}
+    for obj in session.dirty:
+        if not isinstance(obj, Stub):
+            continue
+        state = inspect(obj)
+        old, changed = [], False
+        for column in BUCKET_COLUMNS:
+            history = state.attrs[column].history
+            changed = changed or history.has_changes()
+            old.append(history.deleted[0] if history.deleted else getattr(obj, column))
+        if changed:
+            old_key, new_key = _bucket(*old), _bucket(*(getattr(obj, column) for column in BUCKET_COLUMNS))
+            if old_key != new_key:
+                moved[obj.id] = (old_key, new_key)
+    return moved
+
+
+def _apply_listing_changes(session, flush_context):
+    from app.models.stub_listing import StubListing
+
+    # listing id -> (stub_id, old status, old cents, new status, new cents, sold_at)
+    transitions = {}
+    for obj in session.new:
+        if isinstance(obj, StubListing):
+            transitions[obj.id] = (obj.stub_id, None, 0, obj.status or 'active', _cents(obj.asking_price), obj.sold_at)
+    for obj in session.dirty:
+        if isinstance(obj, StubListing):
+            state = inspect(obj)
+            status, price = state.attrs.status.history, state.attrs.asking_price.history
+            if not status.has_changes() and not price.has_changes():
+                continue
+            old_status = status.deleted[0] if status.deleted else obj.status
+            old_price = price.deleted[0] if price.deleted else obj.asking_price
+            transitions[obj.id] = (obj.stub_id, old_status, _cents(old_price), obj.status, _cents(obj.asking_price), obj.sold_at)
+    for obj in session.deleted:
+        if isinstance(obj, StubListing):
+            loaded = inspect(obj).dict  # deleted rows cannot be refreshed; use what was loaded
+            if 'status' in loaded and 'stub_id' in loaded:
+                transitions[obj.id] = (loaded['stub_id'], loaded['status'], _cents(loaded.get('asking_price')), None, 0, None)
+
+    moved = _moved_stubs(session)
+    if not transitions and not moved:
+        return
+
+    deltas = defaultdict(BucketDelta)
+    buckets = _stub_buckets(session, {t[0] for t in transitions.values()}, moved)
+    for stub_id, old_status, old_cents, new_status, new_cents, sold_at in transitions.values():
+        if (old_status, old_cents) == (new_status, new_cents):
+            continue
+        old_key, new_key = buckets.get(stub_id, (None, None))
+        if old_key is None:
+            continue
+        _remove(deltas[old_key], old_status, old_cents)
+        _add(deltas[new_key], new_status, new_cents, sold_at)
+
+    if moved:
+        # Listings of re-bucketed stubs that this flush did not already move
+        rows = session.connection().execute(
+            select(StubListing.id, StubListing.stub_id, StubListing.status, StubListing.asking_price, StubListing.sold_at)
+            .where(StubListing.stub_id.in_(list(moved)), StubListing.status.in_(INDEXED_STATUSES))
+        )
+        for listing_id, stub_id, status, price, sold_at in rows:
+            if listing_id in transitions:
+                continue
+            old_key, new_key = moved[stub_id]
+            _remove(deltas[old_key], status, _cents(price))
+            _add(deltas[new_key], status, _cents(price), sold_at)
+
+    changed = [(key, delta) for key, delta in deltas.items() if key[0] and not delta.is_empty()]
+    if changed:
+        _upsert_buckets(session.connection(), changed)
+
+
+def _merged_values(table, incoming):
+    """SET clause folding an incoming delta row into an existing bucket row"""
+    c = table.c
+    newer_sale = and_(incoming['last_sold_at'].isnot(None),
+                      or_(c.last_sold_at.is_(None), incoming['last_sold_at'] >= c.last_sold_at))
+    return {
+        'listed_count': c.listed_count + incoming['listed_count'],
+        'listed_total_cents': c.listed_total_cents + incoming['listed_total_cents'],
+        'sold_count': c.sold_count + incoming['sold_count'],
+        'sold_total_cents': c.sold_total_cents + incoming['sold_total_cents'],
+        'sold_min_cents': case(
+            (or_(c.sold_min_cents.is_(None), incoming['sold_min_cents'] < c.sold_min_cents), incoming['sold_min_cents']),
+            else_=c.sold_min_cents),
+        'sold_max_cents': case(
+            (or_(c.sold_max_cents.is_(None), incoming['sold_max_cents'] > c.sold_max_cents), incoming['sold_max_cents']),
+            else_=c.sold_max_cents),
+        'last_sold_cents': case((newer_sale, incoming['last_sold_cents']), else_=c.last_sold_cents),
+        'last_sold_at': case((newer_sale, incoming['last_sold_at']), else_=c.last_sold_at),
+        'updated_at': incoming['updated_at'],
+    }
+
+
+def _upsert_buckets(connection, changed, batch_size=200):
+    """Fold (bucket key, delta) pairs into price_index; one statement per batch where upserts exist"""
+    table = PriceIndex.__table__
+    now = datetime.utcnow()
+    rows = [dict(vars(delta), event_key=key[0], venue_key=key[1], event_month=key[2], updated_at=now)
+            for key, delta in changed]
+
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        dialect_insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        # Keys are distinct within a flush, so no row is hit twice by one statement
+        for start in range(0, len(rows), batch_size):
+            statement = dialect_insert(table).values(rows[start:start + batch_size])
+            statement = statement.on_conflict_do_update(
+                index_elements=[table.c.event_key, table.c.venue_key, table.c.event_month],
+                set_=_merged_values(table, statement.excluded)
+            )
+            connection.execute(statement)
+        return
+
+    # Other databases: update, then insert for a new bucket
+    for values in rows:
+        incoming = {name: literal(value) if value is not None else null() for name, value in values.items()}
+        result = connection.execute(
+            update(table)
+            .where(table.c.event_key == values['event_key'], table.c.venue_key == values['venue_key'],
+                   table.c.event_month == values['event_month'])
+            .values(**_merged_values(table, incoming))
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(table).values(**values))
+
+
+# ---------------------------------------------------------------------------
+# Lookup
+# ---------------------------------------------------------------------------
+
+def _dollars(cents):
+    return round(cents / 100, 2) if cents is not None else None
+
+
+def _summarize(rows):
+    sold_count = sum(max(row.sold_count, 0) for row in rows)
+    sold_total = sum(row.sold_total_cents for row in rows)
+    listed_count = sum(max(row.listed_count, 0) for row in rows)
+    listed_total = sum(row.listed_total_cents for row in rows)
+    mins = [row.sold_min_cents for row in rows if row.sold_min_cents is not None]
+    maxes = [row.sold_max_cents for row in rows if row.sold_max_cents is not None]
+    last = max((row for row in rows if row.last_sold_at), key=lambda row: row.last_sold_at, default=None)
+    return {
+        'sold': {
+            'count': sold_count,
+            'average': _dollars(sold_total / sold_count) if sold_count else None,
+            'min': _dollars(min(mins)) if sold_count and mins else None,
+            'max': _dollars(max(maxes)) if sold_count and maxes else None,
+            'last': _dollars(last.last_sold_cents) if last else None,
+            'last_sold_at': last.last_sold_at.isoformat() if last else None,
+        },
+        'listed': {
+            'count': listed_count,
+            'average': _dollars(listed_total / listed_count) if listed_count else None,
+        },
+    }
+
+
+def parse_month(value):
+    """'YYYY-MM' from 'YYYY-MM' or 'YYYY-MM-DD', '' when missing or malformed"""
+    match = _MONTH.match((value or '').strip())
+    if not match or not 1 <= int(match.group(2)) <= 12:
+        return ''
+    return f'{match.group(1)}-{match.group(2)}'
+
+
+def price_stats(event_name, venue_name=None, date=None, event_id=None, venue_id=None):
+    """
+    Price statistics for an event, from the most specific bucket level with data:
+    event + venue + month, event + venue, event + month, then the whole event.
+    Names resolve to their canonical entity (ids take precedence).
+    One indexed query (all buckets of the event).
+    """
+    event_key = canonical_key('event', event_name, event_id)
+    if not event_key:
+        return {'success': False, 'error': 'event is required'}
+    venue_key = canonical_key('venue', venue_name, venue_id) if venue_name or venue_id else ''
+    month = parse_month(date)
+
+    rows = PriceIndex.query.filter_by(event_key=event_key).all()
+
+    levels = []
+    if venue_key and month:
+        levels.append(('event_venue_month', lambda row: row.venue_key == venue_key and row.event_month == month))
+    if venue_key:
+        levels.append(('event_venue', lambda row: row.venue_key == venue_key))
+    if month:
+        levels.append(('event_month', lambda row: row.event_month == month))
+    levels.append(('event', lambda row: True))
+
+    summaries = {name: _summarize([row for row in rows if matches(row)]) for name, matches in levels}
+
+    match, suggested, basis = None, None, None
+    for name, _ in levels:
+        if summaries[name]['sold']['count']:
+            match, suggested, basis = name, summaries[name]['sold']['average'], 'sold'
+            break
+    if match is None:
+        for name, _ in levels:
+            if summaries[name]['listed']['count']:
+                match, suggested, basis = name, summaries[name]['listed']['average'], 'listed'
+                break
+
+    return {
+        'success': True,
+        'event_key': event_key,
+        'venue_key': venue_key or None,
+        'month': month or None,
+        'match': match,
+        'suggested_price': suggested,
+        'suggested_from': basis,
+        'levels': summaries,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Full rebuild
+# ---------------------------------------------------------------------------
+
+def rebuild_price_index(batch_size=1000):
+    """Recompute every bucket from stub_listing (backfill, or after bulk imports)"""
+    from app import db
+    from app.models.stub import Stub
+    from app.models.stub_listing import StubListing
+
+    deltas = defaultdict(BucketDelta)
+    rows = db.session.execute(
+        select(StubListing.status, StubListing.asking_price, StubListing.sold_at,
+               *(getattr(Stub, column) for column in BUCKET_COLUMNS))
+        .join(Stub, Stub.id == StubListing.stub_id)
+        .where(StubListing.status.in_(INDEXED_STATUSES))
+        .execution_options(yield_per=batch_size)
+    )
+    for status, price, sold_at, *columns in rows:
+        key = _bucket(*columns)
+        if key[0]:
+            _add(deltas[key], status, _cents(price), sold_at)
+
+    now = datetime.utcnow()
+    db.session.execute(PriceIndex.__table__.delete())
+    if deltas:
+        db.session.execute(insert(PriceIndex.__table__), [
+            dict(vars(delta), event_key=key[0], venue_key=key[1], event_month=key[2], updated_at=now)
+            for key, delta in deltas.items()
+        ])
+    db.session.commit()
+    return {'success': True, 'buckets': len(deltas)}
+
+
+_listeners_installed = False
+
+
+def init_price_index(app):
+    """Keep the index in step with listing changes and register `flask rebuild-price-index`"""
+    global _listeners_installed
+
+    if not _listeners_installed:
+        event.listen(Session, 'after_flush', _apply_listing_changes)
+        _listeners_installed = True
+
+    @app.cli.command('rebuild-price-index')
+    def rebuild_price_index_command():
+        """Recompute the market-value index from all listings"""
+        result = rebuild_price_index()
+        click.echo(f"Rebuilt price index: {result['buckets']} buckets")
@@ -0,0 +1,274 @@
+# backend/app/services/storage.py - Pluggable object storage for uploaded stub images
+"""
+Stub images are addressed by a storage key ('<user_id>/<filename>') rather than
+a path on one node's disk, so app servers can scale out and clients can fetch
+image bytes straight from object storage.
+
+Backends (STORAGE_BACKEND):
+- filesystem (default): files under STUB_UPLOAD_FOLDER, served by the media route
+  (or by the reverse proxy via X-Accel-Redirect)
+- s3: any S3-compatible store (AWS S3, MinIO, R2). Uploads stream through
+  multipart transfers and clients receive pre-signed GET URLs (or plain URLs
+  under STORAGE_S3_PUBLIC_URL for a public bucket or CDN)
+"""
+import mimetypes
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import closing
+
+from flask import current_app
+from werkzeug.security import safe_join
+
+from app.utils.metrics import track_external_call
+
+# Keys never get new content (filenames are unique per upload), so objects can be cached forever
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def storage_key(image_path):
+    """
+    Storage key for a Stub.image_path. Rows written before the storage
+    abstraction hold an absolute path under STUB_UPLOAD_FOLDER; their last two
+    components are the key.
+    """
+    if not image_path:
+        return None
+    if os.path.isabs(image_path):
+        return '/'.join(os.path.normpath(image_path).split(os.sep)[-2:])
+    return image_path.replace(os.sep, '/')
+
+
+class StorageBackend:
+    """Interface shared by the storage backends; keys use '/' separators"""
+
+    name = 'base'
+
+    def save(self, key, fileobj, content_type=None):
+        raise NotImplementedError
+
+    def open(self, key):
+        """Binary file-like object for the key (the caller closes it)"""
+        raise NotImplementedError
+
+    def read(self, key):
+        with closing(self.open(key)) as f:
+            return f.read()
+
+    def size(self, key):
+        raise NotImplementedError
+
+    def exists(self, key):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def url(self, key):
+        """URL a browser can fetch the image from"""
+        raise NotImplementedError
+
+    def local_path(self, key):
+        """Path on this node's disk, or None when the bytes live elsewhere"""
+        return None
+
+
+class FileSystemStorage(StorageBackend):
+    """Local directory; also the stand-in for object storage in development and benchmarks"""
+
+    name = 'filesystem'
+
+    def __init__(self, root, base_url='/static/uploads/stubs'):
+        self.root = root
+        self.base_url = base_url.rstrip('/')
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key):
+        path = safe_join(self.root, key)
+        if path is None:
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def save(self, key, fileobj, content_type=None):
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        # Write to a temp file and rename, so readers never see a partial image
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                shutil.copyfileobj(fileobj, f, 1024 * 1024)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return key
+
+    def open(self, key):
+        return open(self._path(key), 'rb')
+
+    def size(self, key):
+        return os.path.getsize(self._path(key))
+
+    def exists(self, key):
+        return os.path.isfile(self._path(key))
+
+    def delete(self, key):
+        path = self._path(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def url(self, key):
+        return f"{self.base_url}/{key}"
+
+    def local_path(self, key):
+        return safe_join(self.root, key)
+
+
+class S3Storage(StorageBackend):
+    """S3-compatible bucket accessed through boto3"""
+
+    name = 's3'
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, region=None, access_key_id=None,
+                 secret_access_key=None, public_url=None, url_expires=3600,
+                 multipart_threshold=8 * 1024 * 1024, multipart_chunksize=8 * 1024 * 1024):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+            from botocore.config import Config as BotoConfig
+        except ImportError:
+            raise ImportError("STORAGE_BACKEND=s3 requires the 'boto3' package")
+
+        if not bucket:
+            raise ValueError("STORAGE_S3_BUCKET must be set when STORAGE_BACKEND=s3")
+
+        self.bucket = bucket
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        self.public_url = public_url.rstrip('/') if public_url else None
+        self.url_expires = url_expires
+
+        self.client = boto3.client(
+            's3',
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+            config=BotoConfig(
+                signature_version='s3v4',
+                # MinIO and most self-hosted stores only support path-style addressing
+                s3={'addressing_style': 'path' if endpoint_url else 'auto'},
+                # Skip the streaming trailer checksums that older S3-compatible stores reject
+                request_checksum_calculation='when_required',
+                response_checksum_validation='when_required',
+                retries={'max_attempts': 3, 'mode': 'standard'}
+            )
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_chunksize
+        )
+
+        # Re-signing on every call would give each listing page new image URLs,
+        # defeating browser caches and the listing response ETags
+        self._url_cache = {}
+        self._url_lock = threading.Lock()
+
+    def _object_key(self, key):
+        return self.prefix + key
+
+    def save(self, key, fileobj, content_type=None):
+        extra_args = {
+            'ContentType': content_type or mimetypes.guess_type(key)[0] or 'application/octet-stream',
+            'CacheControl': IMMUTABLE_CACHE_CONTROL,
+        }
+        with track_external_call('s3', 'upload'):
+            # upload_fileobj switches to a multipart upload above multipart_threshold
+            self.client.upload_fileobj(fileobj, self.bucket, self._object_key(key),
+                                       ExtraArgs=extra_args, Config=self.transfer_config)
+        return key
+
+    def open(self, key):
+        with track_external_call('s3', 'get_object'):
+            response = self.client.get_object(Bucket=self.bucket, Key=self._object_key(key))
+        return response['Body']
+
+    def size(self, key):
+        with track_external_call('s3', 'head_object'):
+            return self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))['ContentLength']
+
+    def exists(self, key):
+        from botocore.exceptions import ClientError
+
+        try:
+            self.size(key)
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def delete(self, key):
+        with track_external_call('s3', 'delete_object'):
+            self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+
+    def url(self, key):
+        if self.public_url:
+            return f"{self.public_url}/{self._object_key(key)}"
+
+        now = time.monotonic()
+        with self._url_lock:
+            cached = self._url_cache.get(key)
+            # Reuse a signature while more than half of its lifetime remains
+            if cached and cached[0] > now:
+                return cached[1]
+
+        url = self.client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket, 'Key': self._object_key(key)},
+            ExpiresIn=self.url_expires
+        )
+        with self._url_lock:
+            if len(self._url_cache) >= 10000:
+                self._url_cache.clear()
+            self._url_cache[key] = (now + self.url_expires / 2, url)
+        return url
+
+
+def build_storage(config):
+    """Storage backend selected by STORAGE_BACKEND"""
+    backend = (config.get('STORAGE_BACKEND') or 'filesystem').lower()
+
+    if backend == 'filesystem':
+        return FileSystemStorage(config['STUB_UPLOAD_FOLDER'])
+
+    if backend == 's3':
+        multipart_mb = int(config.get('STORAGE_MULTIPART_CHUNK_MB', 8))
+        return S3Storage(
+            bucket=config.get('STORAGE_S3_BUCKET'),
+            prefix=config.get('STORAGE_S3_PREFIX', 'stubs/'),
+            endpoint_url=config.get('STORAGE_S3_ENDPOINT_URL'),
+            region=config.get('STORAGE_S3_REGION'),
+            access_key_id=config.get('STORAGE_S3_ACCESS_KEY_ID'),
+            secret_access_key=config.get('STORAGE_S3_SECRET_ACCESS_KEY'),
+            public_url=config.get('STORAGE_S3_PUBLIC_URL'),
+            url_expires=int(config.get('STORAGE_URL_EXPIRES', 3600)),
+            multipart_threshold=multipart_mb * 1024 * 1024,
+            multipart_chunksize=multipart_mb * 1024 * 1024
+        )
+
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}. Options: filesystem, s3")
+
+
+def init_storage(app):
+    app.extensions['storage'] = build_storage(app.config)
+    return app.extensions['storage']
+
+
+def get_storage():
+    """Storage backend of the current app"""
+    return current_app.extensions['storage']
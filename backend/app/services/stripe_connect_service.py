@@ -17,6 +17,10 @@ class StripeConnectService:
         # Load Stripe configuration from environment
         stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
         
+        # Optional API base override (e.g. the local Stripe mock in benchmarks/stripe_mock.py)
+        if os.getenv('STRIPE_API_BASE'):
+            stripe.api_base = os.getenv('STRIPE_API_BASE')
+        
         # Validate required environment variables
         if not stripe.api_key:
             raise ValueError("STRIPE_SECRET_KEY environment variable is not set")
@@ -0,0 +1,185 @@
+# backend/app/services/stub_import.py - Bulk import of stub metadata from CSV / NDJSON / JSON
+"""
+Creates stubs from spreadsheets collectors already keep, without image
+extraction. Columns match the stubs export (app/services/exports.py), so an
+export can be imported again (the CSV export's formula escaping is undone);
+columns the import does not know (id, event_id, created_at, ...) are ignored.
+
+CSV and NDJSON are read row by row from the upload, validated, and inserted in
+batches of IMPORT_BATCH_SIZE with one executemany INSERT each, so memory stays at
+one batch. A JSON array is parsed whole (bounded by MAX_CONTENT_LENGTH).
+
+Event and venue names go through the canonical entity index like every other
+ingestion path; each distinct name is resolved once per import. Imported stubs
+have no image (image_path '') and status 'imported'; one can be attached later
+with PUT /api/stubs/<id>/image.
+"""
+import csv
+import io
+import json
+import math
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from app.models.stub import Stub, SUPPORTED_CURRENCIES
+from app.services.exports import FORMULA_PREFIXES
+
+IMPORT_FORMATS = ('csv', 'ndjson', 'json')
+MAX_REPORTED_ERRORS = 100
+
+# field -> max length, for the text columns
+TEXT_FIELDS = {'title': 255, 'event_name': 255, 'venue_name': 255, 'seat_info': 100}
+
+
+def detect_format(filename, mimetype):
+    """csv / ndjson / json from the file extension or content type, else None"""
+    extension = filename.rsplit('.', 1)[-1].lower() if filename and '.' in filename else ''
+    if extension in IMPORT_FORMATS:
+        return extension
+    if extension == 'jsonl' or mimetype in ('application/x-ndjson', 'application/jsonl'):
+        return 'ndjson'
+    if mimetype == 'text/csv':
+        return 'csv'
+    if mimetype == 'application/json':
+        return 'json'
+    return None
+
+
+def _csv_value(value):
+    """Undo the CSV export's formula escaping (a quote added before =, +, -, @)"""
+    if isinstance(value, str) and value.startswith("'") and value[1:].startswith(FORMULA_PREFIXES):
+        return value[1:]
+    return value
+
+
+def read_records(stream, fmt):
+    """Yield (row number, record, error message or None) from a binary stream"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        for number, record in enumerate(csv.DictReader(text), start=1):
+            yield number, {field: _csv_value(value) for field, value in record.items()}, None
+    elif fmt == 'ndjson':
+        number = 0
+        for line in text:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield number, None, 'Invalid JSON'
+                continue
+            yield number, record, None
+    else:
+        try:
+            data = json.load(text)
+        except ValueError:
+            yield 0, None, 'Invalid JSON'
+            return
+        if isinstance(data, dict):
+            data = data.get('stubs')
+        if not isinstance(data, list):
+            yield 0, None, 'Expected a JSON array of stubs (or {"stubs": [...]})'
+            return
+        for number, record in enumerate(data, start=1):
+            yield number, record, None
+
+
+def _text(record, field):
+    value = record.get(field)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def validate_record(record):
+    """(column values, None) for a valid record, else (None, error message)"""
+    if not isinstance(record, dict):
+        return None, 'Each stub must be an object'
+
+    values = {field: _text(record, field) for field in TEXT_FIELDS}
+    if not values['title']:
+        return None, 'title is required'
+    for field, max_length in TEXT_FIELDS.items():
+        if values[field] and len(values[field]) > max_length:
+            return None, f'{field} is longer than {max_length} characters'
+
+    raw_date = _text(record, 'event_date')
+    values['event_date'] = Stub.parse_date(raw_date) if raw_date else None
+    if raw_date and values['event_date'] is None:
+        return None, 'Invalid event_date. Use YYYY-MM-DD'
+
+    raw_price = _text(record, 'ticket_price')
+    try:
+        values['ticket_price'] = float(raw_price) if raw_price else None
+    except ValueError:
+        return None, 'ticket_price must be a number'
+    if values['ticket_price'] is not None and not (math.isfinite(values['ticket_price']) and values['ticket_price'] >= 0):
+        return None, 'ticket_price must be a finite, non-negative number'
+
+    values['currency'] = _text(record, 'currency') or 'USD'
+    if values['currency'] not in SUPPORTED_CURRENCIES:
+        return None, f'Invalid currency. Supported currencies: {", ".join(SUPPORTED_CURRENCIES)}'
+    return values, None
+
+
+def import_stubs(user_id, records, batch_size=1000, max_rows=50000, dry_run=False):
+    """Validate and insert records from read_records; returns counts and the first errors"""
+    from app import db
+    from app.services.entity_normalizer import get_entity_index
+
+    index = get_entity_index()
+    resolved = {}  # (kind, name) -> canonical id, once per distinct name
+
+    imported, failed, errors, truncated = 0, 0, [], False
+    batch = []
+
+    def fail(number, message):
+        nonlocal failed
+        failed += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({'row': number, 'message': message})
+
+    def flush():
+        nonlocal imported
+        if batch and not dry_run:
+            # New entities commit on their own connection; nothing of ours is written yet (SQLite)
+            for kind, field in (('event', 'event_name'), ('venue', 'venue_name')):
+                names = sorted({values[field] for values in batch if values[field]} - {name for k, name in resolved if k == kind})
+                resolved.update(((kind, name), entity_id) for name, entity_id in index.resolve_many(kind, names).items())
+                for values in batch:
+                    values[f'{kind}_id'] = resolved.get((kind, values[field]))
+            db.session.execute(insert(Stub), batch)
+            db.session.commit()
+        imported += len(batch)
+        batch.clear()
+
+    # End any read transaction before entities are written on another connection (SQLite)
+    db.session.rollback()
+    now = datetime.utcnow()
+    for count, (number, record, error) in enumerate(records):
+        if count >= max_rows:
+            truncated = True
+            break
+        if error:
+            fail(number, error)
+            continue
+        values, message = validate_record(record)
+        if message:
+            fail(number, message)
+            continue
+        batch.append(dict(values, user_id=user_id, image_path='', status='imported', created_at=now, updated_at=now))
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    return {
+        'success': True,
+        'imported': imported,
+        'failed': failed,
+        'errors': errors,
+        'truncated': truncated,
+        'dry_run': dry_run,
+    }
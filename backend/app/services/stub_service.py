@@ -2,13 +2,20 @@ import os
 from PIL import Image
 from datetime import datetime
 from werkzeug.utils import secure_filename
-# from langchain_google_genai import ChatGoogleGenerativeAI
-# from langchain_core.messages import HumanMessage
+from langchain_core.messages import HumanMessage
 from pydantic import BaseModel, Field
-from typing import Optional, Literal
+from typing import Optional, Literal, List
 import base64
+import io
+import math
+import uuid
 import dotenv
+from contextlib import closing
 from app.models.stub import SUPPORTED_CURRENCIES
+from app.services.storage import FileSystemStorage, storage_key
+from app.services.model_provider import get_model_provider
+from app.utils.metrics import track_external_call
+from app.utils.tracing import traced
 
 dotenv.load_dotenv()
 
@@ -29,34 +36,50 @@ class StubData(BaseModel):
     )
     seat_info: Optional[str] = Field(None, description="Detailed seat information (e.g., Row, Section, Seat Number).")
 
+class BatchStubData(StubData):
+    """
+    Extracted stub information tagged with the image it was read from.
+    """
+    image_index: int = Field(..., description="Zero-based position of the image this stub was extracted from.")
+
+class StubBatchData(BaseModel):
+    """
+    Represents the extracted information for every image in a batched request.
+    """
+    stubs: List[BatchStubData] = Field(default_factory=list, description="One entry per image, in any order.")
+
 class StubProcessor:
-    def __init__(self, upload_folder):
-        self.upload_folder = upload_folder
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY environment variable is not set")
-        
-        # Initialize Google Gemini Vision model
-        self.llm_vision = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash",
-            google_api_key=api_key,
-            temperature=0.1
-        )
+    # Batch limits for multi-image extraction requests
+    BATCH_MAX_IMAGES = 8
+    BATCH_MAX_BYTES = 15 * 1024 * 1024  # Stay well under Gemini's 20MB inline request limit
+    BATCH_MAX_TOKENS = 16000
+
+    # Gemini bills images in 768x768 tiles of 258 tokens each
+    IMAGE_TILE_SIZE = 768
+    IMAGE_TILE_TOKENS = 258
+
+    def __init__(self, storage):
+        # A plain directory path is still accepted for scripts and the example below
+        self.storage = FileSystemStorage(storage) if isinstance(storage, str) else storage
 
+        # Vision model comes from the configured provider (Gemini by default, or the local fake)
+        self.llm_vision = get_model_provider().vision_model()
+
+    @traced('PIL save_image')
     def save_image(self, image_file, user_id):
-        """Save the uploaded image and return the path"""
+        """Save the uploaded image to storage and return its storage key"""
         try:
-            # Create user directory if it doesn't exist
-            user_dir = os.path.join(self.upload_folder, str(user_id))
-            os.makedirs(user_dir, exist_ok=True)
-
             # Secure the filename and save the image
             filename = secure_filename(image_file.filename)
+            # The random suffix keeps every upload at a new URL, which is what lets
+            # the image route mark responses immutable
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
-            filename = timestamp + filename
-            file_path = os.path.join(user_dir, filename)
-            
-            # Process and save the image
+            filename = f"{timestamp}{uuid.uuid4().hex[:8]}_{filename}"
+            key = f"{user_id}/{filename}"
+            image_format = Image.registered_extensions().get(os.path.splitext(filename)[1].lower(), 'JPEG')
+
+            # Process the image in memory, then hand the bytes to storage
+            buffer = io.BytesIO()
             with Image.open(image_file) as img:
                 # Convert RGBA to RGB if necessary
                 if img.mode == 'RGBA':
@@ -64,9 +87,10 @@ class StubProcessor:
                 # Resize if too large (max 2000x2000)
                 if img.size[0] > 2000 or img.size[1] > 2000:
                     img.thumbnail((2000, 2000))
-                img.save(file_path, quality=85, optimize=True)
-            
-            return file_path
+                img.save(buffer, format=image_format, quality=85, optimize=True)
+            buffer.seek(0)
+
+            return self.storage.save(key, buffer, Image.MIME.get(image_format))
         except Exception as e:
             raise Exception(f"Error saving image: {str(e)}")
 
@@ -93,25 +117,19 @@ class StubProcessor:
                 'error': str(e)
             }
 
-    def parse_image_with_gemini_vision(self, image_path: str) -> Optional[StubData]:
-        """
-        Parses the image using Google Gemini Vision to extract structured stub data.
-        """
-        try:
-            # Configure the LLM to return structured output
-            structured_llm_vision = self.llm_vision.with_structured_output(StubData)
-
-            # Read and encode image
-            with open(image_path, "rb") as image_file:
-                encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
+    def extraction_instructions(self, image_count=1):
+        """Build the extraction prompt for one or several stub images"""
+        if image_count == 1:
+            intro = "Analyze the provided image of a ticket stub and extract the following information:"
+        else:
+            intro = (
+                f"You are given {image_count} images of ticket stubs, numbered 0 to {image_count - 1} "
+                "in the order they appear. Analyze each image separately and extract the following information:"
+            )
 
-            # Create the prompt
-            message_content = [
-                {
-                    "type": "text",
-                    "text": f"""
+        instructions = f"""
                     You are an expert at extracting information from ticket stubs.
-                    Analyze the provided image of a ticket stub and extract the following information:
+                    {intro}
                     - Event Name
                     - Event Date (format as YYYY-MM-DD)
                     - Venue Name
@@ -128,6 +146,84 @@ class StubProcessor:
                     If a piece of information is not clearly visible or found, return None for that field.
                     Prioritize accuracy over completeness.
                     """
+
+        if image_count > 1:
+            instructions += f"""
+                    Return exactly {image_count} stubs, one per image, and set image_index to the
+                    number of the image each stub was read from. Never merge two images into one stub.
+                    """
+        return instructions
+
+    def encode_image(self, image_path):
+        """Read an image from storage and return it base64 encoded"""
+        return base64.b64encode(self.storage.read(storage_key(image_path))).decode('utf-8')
+
+    @traced('PIL estimate_image_tokens')
+    def estimate_image_tokens(self, image_path):
+        """Estimate the prompt tokens Gemini will bill for an image"""
+        try:
+            with closing(self.storage.open(storage_key(image_path))) as f, Image.open(f) as img:
+                width, height = img.size
+        except Exception:
+            # Unknown dimensions: assume the largest image save_image produces
+            width = height = 2000
+
+        tiles = math.ceil(width / self.IMAGE_TILE_SIZE) * math.ceil(height / self.IMAGE_TILE_SIZE)
+        return max(tiles, 1) * self.IMAGE_TILE_TOKENS
+
+    def plan_batches(self, image_paths, max_images=None, max_bytes=None, max_tokens=None):
+        """
+        Group image paths into batches that respect the image count, payload size and
+        prompt token budgets. Returns a list of lists of indexes into image_paths.
+        """
+        max_images = max_images or self.BATCH_MAX_IMAGES
+        max_bytes = max_bytes or self.BATCH_MAX_BYTES
+        max_tokens = max_tokens or self.BATCH_MAX_TOKENS
+
+        # Base64 inflates the payload by 4/3, and the prompt itself costs tokens too
+        prompt_tokens = len(self.extraction_instructions(max_images)) // 4
+
+        batches = []
+        current, current_bytes, current_tokens = [], 0, prompt_tokens
+        for index, image_path in enumerate(image_paths):
+            try:
+                image_bytes = math.ceil(self.storage.size(storage_key(image_path)) * 4 / 3)
+            except Exception:
+                image_bytes = 0
+            image_tokens = self.estimate_image_tokens(image_path)
+
+            if current and (
+                len(current) >= max_images
+                or current_bytes + image_bytes > max_bytes
+                or current_tokens + image_tokens > max_tokens
+            ):
+                batches.append(current)
+                current, current_bytes, current_tokens = [], 0, prompt_tokens
+
+            current.append(index)
+            current_bytes += image_bytes
+            current_tokens += image_tokens
+
+        if current:
+            batches.append(current)
+        return batches
+
+    def parse_image_with_gemini_vision(self, image_path: str) -> Optional[StubData]:
+        """
+        Parses the image using Google Gemini Vision to extract structured stub data.
+        """
+        try:
+            # Configure the LLM to return structured output
+            structured_llm_vision = self.llm_vision.with_structured_output(StubData)
+
+            # Read and encode image
+            encoded_string = self.encode_image(image_path)
+
+            # Create the prompt
+            message_content = [
+                {
+                    "type": "text",
+                    "text": self.extraction_instructions()
                 },
                 {
                     "type": "image_url",
@@ -138,13 +234,86 @@ class StubProcessor:
             ]
             
             # Process with Gemini Vision
-            response = structured_llm_vision.invoke([HumanMessage(content=message_content)])
+            with track_external_call('gemini', 'vision_extract'):
+                response = structured_llm_vision.invoke([HumanMessage(content=message_content)])
             
             return response
         except Exception as e:
             print(f"Error parsing with Gemini Vision: {e}")
             return StubData()
 
+    def parse_images_with_gemini_vision(self, image_paths: List[str]) -> Optional[List[StubData]]:
+        """
+        Parses several images in a single Gemini Vision request.
+        Returns one StubData per image in input order, or None if the model's answer
+        does not map cleanly back onto the images.
+        """
+        try:
+            structured_llm_vision = self.llm_vision.with_structured_output(StubBatchData)
+
+            message_content = [
+                {
+                    "type": "text",
+                    "text": self.extraction_instructions(len(image_paths))
+                }
+            ]
+            for index, image_path in enumerate(image_paths):
+                message_content.append({"type": "text", "text": f"Image {index}:"})
+                message_content.append({
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:image/png;base64,{self.encode_image(image_path)}"
+                    }
+                })
+
+            with track_external_call('gemini', 'vision_extract_batch'):
+                response = structured_llm_vision.invoke([HumanMessage(content=message_content)])
+        except Exception as e:
+            print(f"Error batch parsing with Gemini Vision: {e}")
+            return None
+
+        # Validate that every image got exactly one result
+        if response is None or len(response.stubs) != len(image_paths):
+            return None
+
+        by_index = {}
+        for item in response.stubs:
+            if not 0 <= item.image_index < len(image_paths) or item.image_index in by_index:
+                return None
+            by_index[item.image_index] = StubData(**item.model_dump(exclude={'image_index'}))
+
+        return [by_index[index] for index in range(len(image_paths))]
+
+    def process_images(self, image_paths, max_images=None, max_bytes=None, max_tokens=None):
+        """
+        Process several images with batched Gemini Vision requests.
+        Returns one result per image, in input order, shaped like process_image's result.
+        Batches whose response fails validation fall back to single-image requests.
+        """
+        results = [None] * len(image_paths)
+
+        for batch in self.plan_batches(image_paths, max_images, max_bytes, max_tokens):
+            batch_paths = [image_paths[index] for index in batch]
+
+            parsed = None
+            if len(batch_paths) > 1:
+                parsed = self.parse_images_with_gemini_vision(batch_paths)
+
+            if parsed is None:
+                # Single image batch, or the batch response could not be trusted
+                for index in batch:
+                    results[index] = self.process_image(image_paths[index])
+                continue
+
+            for index, parsed_data in zip(batch, parsed):
+                results[index] = {
+                    'success': True,
+                    'raw_text': "Image processed by Gemini Vision API (batched)",
+                    'parsed_data': parsed_data.model_dump()
+                }
+
+        return results
+
 # Example Usage (you'd typically integrate this into your Flask routes)
 if __name__ == '__main__':
     # Create a dummy upload folder for testing
@@ -218,7 +387,7 @@ if __name__ == '__main__':
         
         # Clean up the dummy image and saved file
         os.remove(dummy_image_path)
-        os.remove(saved_path)
+        processor.storage.delete(saved_path)
         os.rmdir(os.path.join('uploads', '456'))
         print("\nCleanup complete.")
 
@@ -0,0 +1,299 @@
+# backend/app/services/typeahead.py - Prefix suggestions for marketplace search
+"""
+Typeahead over listed stub titles and canonical events and venues, ranked by
+how many open listings (active or reserved for checkout) each has. Served from
+memory, so a keystroke costs a binary search instead of an ilike scan of stub
+titles.
+
+The index is a sorted array of search terms: every suffix of a normalized name
+that starts at a word ('taylor swift eras tour', 'swift eras tour', 'eras tour',
+'tour'), so 'eras t' finds the Eras Tour. A prefix lookup is two bisects plus a
+pass over the matching range.
+
+It is built on first use per process and remembers the labels and open listing
+count of every listed stub, so listings that open or close and title/event/venue
+edits of listed stubs update it after commit without extra queries, in the
+worker that made the change. Other workers pick changes up at the periodic
+rebuild (TYPEAHEAD_REBUILD_SECONDS), which runs in a background thread while
+requests keep using the current arrays, so no keystroke waits for the GROUP BY.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from app.models.price_index import normalize_key
+from app.models.stub_listing import OPEN_STATUSES
+
+SUGGESTION_TYPES = ('title', 'event', 'venue')
+MIN_PREFIX = 2
+STUB_COLUMNS = ('title', 'event_id', 'event_name', 'venue_id', 'venue_name')
+
+
+def _terms(key):
+    words = key.split()
+    return [' '.join(words[i:]) for i in range(len(words))]
+
+
+def _labels(title, event_id, event_name, venue_id, venue_name):
+    """(entry key, display text) for each suggestion a listed stub counts towards"""
+    from app.services.entity_normalizer import get_entity_index
+
+    entity_index = get_entity_index()
+    labels = []
+    title_key = normalize_key(title)
+    if title_key:
+        labels.append((('title', title_key), ' '.join(title.split())))
+    for kind, entity_id, name in (('event', event_id, event_name), ('venue', venue_id, venue_name)):
+        if entity_id:
+            labels.append(((kind, entity_id), entity_index.name_for(entity_id) or name))
+        elif normalize_key(name):
+            labels.append(((kind, normalize_key(name)), ' '.join(name.split())))
+    return labels
+
+
+class TypeaheadIndex:
+    """Sorted term array -> suggestion entries with open listing counts"""
+
+    def __init__(self, rebuild_seconds=60):
+        self.rebuild_seconds = rebuild_seconds
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._built_at = None
+        self._rebuilding = False
+        self._entries = {}  # (type, canonical id or normalized name) -> [display, open listings]
+        self._stubs = {}    # stub id -> (labels, open listings), for stubs with open listings
+        self._terms = []    # sorted search terms
+        self._refs = []     # entry key of each term, same order
+
+    @property
+    def loaded(self):
+        return self._built_at is not None
+
+    def _stale(self):
+        return self._built_at is None or time.monotonic() - self._built_at > self.rebuild_seconds
+
+    def _add(self, labels, delta):
+        for key, display in labels:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[1] += delta
+            elif delta > 0:
+                self._entries[key] = [display, delta]
+                for term in _terms(normalize_key(display)):
+                    position = bisect_left(self._terms, term)
+                    self._terms.insert(position, term)
+                    self._refs.insert(position, key)
+
+    def rebuild(self):
+        """Recount open listings per title, event and venue and swap in a fresh index"""
+        from app import db
+        from app.models.stub import Stub
+        from app.models.stub_listing import StubListing
+
+        with self._build_lock:
+            if not self._stale():
+                return  # another thread rebuilt it while we waited
+            rows = db.session.execute(
+                select(Stub.id, *(getattr(Stub, column) for column in STUB_COLUMNS), func.count(StubListing.id))
+                .join(StubListing, StubListing.stub_id == Stub.id)
+                .where(StubListing.status.in_(OPEN_STATUSES))
+                .group_by(Stub.id)
+            )
+            entries, stubs = {}, {}
+            for stub_id, *columns, count in rows:
+                labels = _labels(*columns)
+                stubs[stub_id] = (labels, count)
+                for key, display in labels:
+                    entry = entries.setdefault(key, [display, 0])
+                    entry[1] += count
+
+            pairs = sorted((term, key) for key in entries for term in _terms(normalize_key(entries[key][0])))
+            with self._lock:
+                self._entries = entries
+                self._stubs = stubs
+                self._terms = [term for term, _ in pairs]
+                self._refs = [key for _, key in pairs]
+                self._built_at = time.monotonic()
+
+    def _rebuild_in_background(self):
+        """Start a rebuild in a daemon thread unless one is already running"""
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        app = current_app._get_current_object()
+
+        def run():
+            from app import db
+
+            try:
+                with app.app_context():
+                    try:
+                        self.rebuild()
+                    finally:
+                        db.session.remove()
+            except Exception as e:
+                print(f"Typeahead rebuild failed: {e}")
+            finally:
+                self._rebuilding = False
+
+        threading.Thread(target=run, name='typeahead-rebuild', daemon=True).start()
+
+    def labels_for(self, stub_id):
+        """Labels a listed stub counts towards, None when it has no open listings here"""
+        known = self._stubs.get(stub_id)
+        return known[0] if known else None
+
+    def apply(self, changes):
+        """Apply committed (stub id, open listing delta, new labels or None) changes"""
+        with self._lock:
+            for stub_id, delta, labels in changes:
+                old_labels, count = self._stubs.get(stub_id, (labels, 0))
+                if labels is None:
+                    labels = old_labels
+                elif labels != old_labels:
+                    # Title, event or venue edited: the stub's listings move to the new entries
+                    self._add(old_labels, -count)
+                    self._add(labels, count)
+                if labels is None:
+                    continue  # not listed here before this change; picked up at the next rebuild
+                self._add(labels, delta)
+                if count + delta > 0:
+                    self._stubs[stub_id] = (labels, count + delta)
+                else:
+                    self._stubs.pop(stub_id, None)
+
+    def suggest(self, prefix, limit=8, types=SUGGESTION_TYPES):
+        """Entries with the most open listings that have a word starting with `prefix`"""
+        prefix = normalize_key(prefix)
+        if len(prefix) < MIN_PREFIX:
+            return []
+        if not self.loaded:
+            self.rebuild()  # first use in this process: nothing to serve yet
+        elif self._stale():
+            self._rebuild_in_background()
+
+        with self._lock:
+            start = bisect_left(self._terms, prefix)
+            end = bisect_left(self._terms, prefix + '\x7f', start)
+            matches = {key for key in self._refs[start:end] if key[0] in types}
+            ranked = heapq.nsmallest(
+                limit, ((key, self._entries[key]) for key in matches if self._entries[key][1] > 0),
+                key=lambda item: (-item[1][1], len(item[1][0]), item[1][0])
+            )
+        return [{
+            'type': key[0],
+            'text': display,
+            'id': key[1] if key[0] != 'title' else None,
+            'listings': count
+        } for key, (display, count) in ranked]
+
+
+def get_typeahead_index():
+    return current_app.extensions['typeahead_index']
+
+
+# ---------------------------------------------------------------------------
+# Incremental maintenance
+# ---------------------------------------------------------------------------
+
+def _loaded_index():
+    if not has_app_context():
+        return None
+    index = current_app.extensions.get('typeahead_index')
+    return index if index is not None and index.loaded else None
+
+
+def _stub_columns(session, stub_id):
+    """Current title/event/venue columns of a stub, from the identity map when loaded"""
+    from app.models.stub import Stub
+
+    stub = session.identity_map.get(session.identity_key(Stub, stub_id))
+    loaded = inspect(stub).dict if stub is not None else {}
+    if all(column in loaded for column in STUB_COLUMNS):
+        return [loaded[column] for column in STUB_COLUMNS]
+    return session.connection().execute(
+        select(*(getattr(Stub, column) for column in STUB_COLUMNS)).where(Stub.id == stub_id)
+    ).first()
+
+
+def _collect_changes(session, flush_context):
+    """Record this flush's open listing deltas and label edits per stub"""
+    from app.models.stub import Stub
+    from app.models.stub_listing import StubListing
+
+    index = _loaded_index()
+    if index is None:
+        return  # nothing to keep up to date in this process yet
+
+    listing_deltas = {}  # stub id -> change in open listings
+    for obj in session.new:
+        if isinstance(obj, StubListing) and (obj.status or 'active') in OPEN_STATUSES:
+            listing_deltas[obj.stub_id] = listing_deltas.get(obj.stub_id, 0) + 1
+    for obj in session.dirty:
+        if isinstance(obj, StubListing):
+            history = inspect(obj).attrs.status.history
+            if history.has_changes():
+                was_open = bool(history.deleted) and history.deleted[0] in OPEN_STATUSES
+                delta = (obj.status in OPEN_STATUSES) - was_open
+                if delta:
+                    listing_deltas[obj.stub_id] = listing_deltas.get(obj.stub_id, 0) + delta
+    for obj in session.deleted:
+        if isinstance(obj, StubListing):
+            loaded = inspect(obj).dict
+            if loaded.get('status') in OPEN_STATUSES and 'stub_id' in loaded:
+                listing_deltas[loaded['stub_id']] = listing_deltas.get(loaded['stub_id'], 0) - 1
+
+    # Listed stubs whose title, event or venue changed
+    edited = {}
+    for obj in session.dirty:
+        if isinstance(obj, Stub) and index.labels_for(obj.id) is not None:
+            state = inspect(obj)
+            if any(state.attrs[column].history.has_changes() for column in STUB_COLUMNS):
+                edited[obj.id] = _labels(*(getattr(obj, column) for column in STUB_COLUMNS))
+
+    changes = session.info.setdefault('typeahead_changes', [])
+    for stub_id in set(listing_deltas) | set(edited):
+        delta = listing_deltas.get(stub_id, 0)
+        labels = edited.get(stub_id)
+        if labels is None and delta > 0 and index.labels_for(stub_id) is None:
+            # First open listing of this stub: its labels are not cached yet
+            columns = _stub_columns(session, stub_id)
+            if columns is None:
+                continue
+            labels = _labels(*columns)
+        if delta or labels is not None:
+            changes.append((stub_id, delta, labels))
+
+
+def _apply_after_commit(session):
+    changes = session.info.pop('typeahead_changes', None)
+    index = _loaded_index() if changes else None
+    if index is not None:
+        index.apply(changes)
+
+
+def _discard_after_rollback(session, previous_transaction):
+    session.info.pop('typeahead_changes', None)
+
+
+_listeners_installed = False
+
+
+def init_typeahead(app):
+    """Create the per-process index and keep it in step with committed listing changes"""
+    global _listeners_installed
+
+    app.extensions['typeahead_index'] = TypeaheadIndex(
+        rebuild_seconds=app.config.get('TYPEAHEAD_REBUILD_SECONDS', 60)
+    )
+    if not _listeners_installed:
+        event.listen(Session, 'after_flush', _collect_changes)
+        event.listen(Session, 'after_commit', _apply_after_commit)
+        event.listen(Session, 'after_soft_rollback', _discard_after_rollback)
+        _listeners_installed = True
@@ -0,0 +1,132 @@
+# backend/app/utils/db_engine.py - SQLAlchemy engine profiles
+"""
+Engine options and connection setup per database backend, chosen by DB_ENGINE_PROFILE.
+
+- postgresql: a pool of pool_size + max_overflow connections per worker, pre-ping,
+  recycled before server or firewall idle timeouts, statement_timeout set once per
+  connection through libpq startup options
+- pgbouncer: PgBouncer in transaction pooling mode. It rejects startup options and
+  hands a server connection to another client between transactions, so
+  statement_timeout is applied with SET LOCAL at the start of each transaction.
+  Keep the app-side pool small; PgBouncer does the real pooling
+- sqlite: WAL journaling (readers no longer block the writer), synchronous=NORMAL,
+  busy_timeout so concurrent writers wait instead of failing with "database is
+  locked", and mmap_size for memory-mapped reads
+- auto (default): postgresql or sqlite from SQLALCHEMY_DATABASE_URI
+- none: driver defaults
+
+DB_STATEMENT_TIMEOUT_MS (off by default) only applies to request-serving
+processes: an app loaded by the flask CLI (db upgrade, rebuild-price-index,
+canonicalize-stubs) runs without it, so index builds and full-table scans are not
+cancelled halfway.
+
+Options already in SQLALCHEMY_ENGINE_OPTIONS take precedence over the profile.
+"""
+import click
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+ENGINE_PROFILES = ('auto', 'postgresql', 'pgbouncer', 'sqlite', 'none')
+
+
+def resolve_profile(config):
+    profile = config.get('DB_ENGINE_PROFILE', 'auto')
+    if profile not in ENGINE_PROFILES:
+        raise ValueError(f"Unknown DB_ENGINE_PROFILE: {profile}. Options: {', '.join(ENGINE_PROFILES)}")
+    if profile != 'auto':
+        return profile
+
+    backend = make_url(config['SQLALCHEMY_DATABASE_URI']).get_backend_name()
+    if backend == 'postgresql':
+        return 'postgresql'
+    if backend == 'sqlite':
+        return 'sqlite'
+    return 'none'
+
+
+def _is_memory_sqlite(url):
+    database = make_url(url).database
+    return not database or database == ':memory:' or database.startswith('file::memory:')
+
+
+def engine_options(config, profile=None):
+    """SQLALCHEMY_ENGINE_OPTIONS for a profile, before any explicit overrides"""
+    profile = profile or resolve_profile(config)
+    pool = {
+        'pool_size': config.get('DB_POOL_SIZE', 5),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 10),
+    }
+
+    if profile == 'postgresql':
+        options = dict(pool, pool_pre_ping=config.get('DB_POOL_PRE_PING', True),
+                       pool_recycle=config.get('DB_POOL_RECYCLE', 1800))
+        timeout = config.get('DB_STATEMENT_TIMEOUT_MS', 0)
+        if timeout:
+            options['connect_args'] = {'options': f'-c statement_timeout={timeout}'}
+        return options
+
+    if profile == 'pgbouncer':
+        return dict(pool, pool_pre_ping=config.get('DB_POOL_PRE_PING', True),
+                    pool_recycle=config.get('DB_POOL_RECYCLE', 1800))
+
+    if profile == 'sqlite' and not _is_memory_sqlite(config['SQLALCHEMY_DATABASE_URI']):
+        return pool
+
+    return {}
+
+
+def configure_engine_options(app):
+    """Fill SQLALCHEMY_ENGINE_OPTIONS from the profile; call before db.init_app"""
+    profile = resolve_profile(app.config)
+    if click.get_current_context(silent=True) is not None:
+        app.config['DB_STATEMENT_TIMEOUT_MS'] = 0  # loaded by a flask CLI command (migrations, backfills)
+    options = engine_options(app.config, profile)
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+    app.config['DB_ENGINE_PROFILE_RESOLVED'] = profile
+    return profile
+
+
+def _sqlite_pragmas(config):
+    return [
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f"PRAGMA busy_timeout={int(config.get('DB_SQLITE_BUSY_TIMEOUT_MS', 5000))}",
+        f"PRAGMA mmap_size={int(config.get('DB_SQLITE_MMAP_SIZE', 0))}",
+    ]
+
+
+def attach_engine_events(engine, config, profile):
+    """Per-connection and per-transaction setup that engine options cannot express"""
+    if profile == 'sqlite':
+        pragmas = _sqlite_pragmas(config)
+
+        @event.listens_for(engine, 'connect')
+        def _set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for pragma in pragmas:
+                    cursor.execute(pragma)
+            finally:
+                cursor.close()
+
+    elif profile == 'pgbouncer' and config.get('DB_STATEMENT_TIMEOUT_MS'):
+        statement = f"SET LOCAL statement_timeout = {int(config['DB_STATEMENT_TIMEOUT_MS'])}"
+
+        @event.listens_for(engine, 'begin')
+        def _set_statement_timeout(conn):
+            conn.exec_driver_sql(statement)
+
+
+def init_engine(app, db):
+    """Attach profile events and pool metrics to every engine; call after db.init_app"""
+    profile = app.config.get('DB_ENGINE_PROFILE_RESOLVED') or resolve_profile(app.config)
+    with app.app_context():
+        engines = dict(db.engines)
+
+    for bind_key, engine in engines.items():
+        attach_engine_events(engine, app.config, profile)
+        if app.config.get('METRICS_ENABLED', True):
+            from app.utils.metrics import instrument_pool
+            instrument_pool(engine, bind_key or 'default')
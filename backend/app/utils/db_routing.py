@@ -0,0 +1,116 @@
+# backend/app/utils/db_routing.py - Read replica routing
+"""
+Sends SELECTs from read-only endpoints to read replicas.
+
+Endpoints opt in with @read_replica. Everything else, and any statement that
+writes, locks (FOR UPDATE) or runs during a flush, stays on the primary.
+
+Read-your-writes: after a request writes, the user's Flask session remembers it
+and their @read_replica requests go to the primary for REPLICA_STICKY_SECONDS,
+so a seller sees their new listing even if the replicas lag behind.
+
+The shared response cache (app/utils/response_cache.py) is filled from the
+primary only, and is neither read nor filled while a user is pinned to the
+primary, so a lagging replica cannot put a stale page back after an invalidation.
+
+Replicas are configured with DATABASE_REPLICA_URLS and become the binds
+replica_0, replica_1, ... (engine profile options and pool metrics apply to them too).
+"""
+import random
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context, session as flask_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql import Select
+
+REPLICA_BIND_PREFIX = 'replica_'
+STICKY_SESSION_KEY = '_db_primary_until'
+
+
+def read_replica(view):
+    """Route the view's SELECTs to a replica (unless the user wrote recently)"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_read_replica = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def primary_pinned():
+    """True while this request's user must read from the primary (they wrote recently)"""
+    if not has_request_context() or not current_app.extensions.get('db_replicas'):
+        return False
+    return bool(g.get('db_wrote')) or flask_session.get(STICKY_SESSION_KEY, 0) >= time.time()
+
+
+def use_primary():
+    """Send the rest of this request's reads to the primary (e.g. to fill a shared cache)"""
+    if has_request_context():
+        g.db_read_replica = False
+
+
+def _replica_allowed():
+    if not has_request_context() or not g.get('db_read_replica') or g.get('db_wrote'):
+        return False
+    return flask_session.get(STICKY_SESSION_KEY, 0) < time.time()
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that picks a replica engine for eligible SELECTs"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and isinstance(clause, Select)
+                and clause._for_update_arg is None and _replica_allowed()):
+            replicas = current_app.extensions.get('db_replicas')
+            if replicas:
+                engines = self._db.engines
+                return engines[random.choice(replicas)]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _mark_write(*args):
+    if has_request_context():
+        g.db_wrote = True
+
+
+def _mark_bulk_write(orm_execute_state):
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        _mark_write()
+
+
+def _remember_write(response):
+    if g.get('db_wrote') and current_app.extensions.get('db_replicas'):
+        flask_session[STICKY_SESSION_KEY] = time.time() + current_app.config.get('REPLICA_STICKY_SECONDS', 5)
+    return response
+
+
+def configure_replicas(app):
+    """Add DATABASE_REPLICA_URLS to SQLALCHEMY_BINDS; call before db.init_app"""
+    urls = app.config.get('DATABASE_REPLICA_URLS') or []
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    keys = []
+    for index, url in enumerate(urls):
+        key = f'{REPLICA_BIND_PREFIX}{index}'
+        binds[key] = url
+        keys.append(key)
+    app.config['SQLALCHEMY_BINDS'] = binds
+    app.extensions['db_replicas'] = keys
+    return keys
+
+
+_listeners_installed = False
+
+
+def init_replica_routing(app):
+    """Track writes for read-your-writes stickiness when replicas are configured"""
+    global _listeners_installed
+
+    if not app.extensions.get('db_replicas'):
+        return
+    if not _listeners_installed:
+        event.listen(Session, 'after_flush', _mark_write)
+        event.listen(Session, 'do_orm_execute', _mark_bulk_write)
+        _listeners_installed = True
+    app.after_request(_remember_write)
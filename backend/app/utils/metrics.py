@@ -0,0 +1,345 @@
+# backend/app/utils/metrics.py - Prometheus metrics
+"""
+Request, database, connection pool, external-call, queue and cache metrics exposed on /metrics.
+
+Multi-process servers (gunicorn with several workers): set PROMETHEUS_MULTIPROC_DIR
+to an empty, writable directory before the workers start. Each worker then writes
+its samples to memory-mapped files there and /metrics aggregates them across
+workers. Clear the directory on deploy and call mark_worker_dead(pid) from the
+server's child_exit hook.
+"""
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+from app.utils.tracing import trace_span
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+REQUEST_LATENCY = Histogram(
+    'stubcollect_http_request_duration_seconds',
+    'HTTP request latency by blueprint and route',
+    ['method', 'blueprint', 'route', 'status'],
+    buckets=LATENCY_BUCKETS
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    'stubcollect_http_requests_in_progress',
+    'HTTP requests currently being handled',
+    ['blueprint'],
+    multiprocess_mode='livesum'
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    'stubcollect_db_queries_per_request',
+    'SQL statements issued per request',
+    ['blueprint', 'route'],
+    buckets=QUERY_COUNT_BUCKETS
+)
+DB_TIME_PER_REQUEST = Histogram(
+    'stubcollect_db_query_seconds_per_request',
+    'Time spent in SQL statements per request',
+    ['blueprint', 'route'],
+    buckets=LATENCY_BUCKETS
+)
+EXTERNAL_CALL_LATENCY = Histogram(
+    'stubcollect_external_call_duration_seconds',
+    'Latency of calls to external services (gemini, litellm, stripe)',
+    ['service', 'operation', 'outcome'],
+    buckets=LATENCY_BUCKETS
+)
+CACHE_LOOKUPS = Counter(
+    'stubcollect_cache_lookups_total',
+    'Cache lookups by cache and result (hit ratio = hit / (hit + miss))',
+    ['cache', 'result']
+)
+QUEUE_DEPTH = Gauge(
+    'stubcollect_queue_depth',
+    'Items waiting in in-process work queues',
+    ['queue'],
+    multiprocess_mode='livesum'
+)
+DB_POOL_CONNECTIONS = Gauge(
+    'stubcollect_db_pool_connections',
+    'Database connections per engine: open, checked_out (in use) and capacity (pool_size + max_overflow)',
+    ['engine', 'state'],
+    multiprocess_mode='livesum'
+)
+DB_POOL_EVENTS = Counter(
+    'stubcollect_db_pool_events_total',
+    'Pool events per engine: checkout, connect (new connection) and invalidate (dropped after an error)',
+    ['engine', 'event']
+)
+
+# Stripe object ids in request paths (acct_..., pi_..., re_...) are dropped from operation labels
+_STRIPE_ID = re.compile(r'^[a-z]{2,5}_[A-Za-z0-9]+$')
+
+
+def _route_labels():
+    rule = request.url_rule.rule if request.url_rule else '<unmatched>'
+    return request.blueprint or 'app', rule
+
+
+def observe_request_start():
+    g.metrics_started = time.perf_counter()
+    g.metrics_blueprint = request.blueprint or 'app'
+    REQUESTS_IN_PROGRESS.labels(g.metrics_blueprint).inc()
+
+
+def observe_request_end(response):
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return response
+
+    blueprint, route = _route_labels()
+    REQUEST_LATENCY.labels(request.method, blueprint, route, str(response.status_code)).observe(
+        time.perf_counter() - started
+    )
+    DB_QUERIES_PER_REQUEST.labels(blueprint, route).observe(g.get('query_count', 0))
+    DB_TIME_PER_REQUEST.labels(blueprint, route).observe(g.get('query_time', 0.0))
+    return response
+
+
+def observe_request_teardown(exc):
+    # Runs even when the view raised, so the in-progress gauge never leaks
+    blueprint = g.pop('metrics_blueprint', None)
+    if blueprint is not None:
+        REQUESTS_IN_PROGRESS.labels(blueprint).dec()
+
+
+@contextmanager
+def track_external_call(service, operation):
+    """
+    Time a call to an external service (and trace it as a client span).
+
+    Usage:
+        with track_external_call('gemini', 'vision_extract'):
+            response = structured_llm_vision.invoke(...)
+    """
+    started = time.perf_counter()
+    outcome = 'success'
+    try:
+        with trace_span(f'{service} {operation}', kind='client', **{'peer.service': service}):
+            yield
+    except Exception:
+        outcome = 'error'
+        raise
+    finally:
+        EXTERNAL_CALL_LATENCY.labels(service, operation, outcome).observe(time.perf_counter() - started)
+
+
+def record_cache_lookup(cache, hit):
+    CACHE_LOOKUPS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def set_queue_depth(queue, depth):
+    QUEUE_DEPTH.labels(queue).set(depth)
+
+
+def stripe_operation(method, url):
+    """POST https://api.stripe.com/v1/accounts/acct_1/login_links -> 'POST accounts/login_links'"""
+    path = re.sub(r'^https?://[^/]+', '', url).split('?', 1)[0]
+    parts = [part for part in path.split('/') if part and part != 'v1' and not _STRIPE_ID.match(part)]
+    return f"{method.upper()} {'/'.join(parts) or '/'}"
+
+
+class InstrumentedStripeHTTPClient:
+    """Wraps the Stripe SDK's HTTP client to time every API call (retries included)"""
+
+    def __init__(self, client):
+        self._client = client
+
+    def request_with_retries(self, method, url, *args, **kwargs):
+        operation = stripe_operation(method, url)
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            with trace_span(f'stripe {operation}', kind='client', **{'peer.service': 'stripe'}) as span:
+                response = self._client.request_with_retries(method, url, *args, **kwargs)
+                if span is not None and span.is_recording():
+                    span.set_attribute('http.response.status_code', response[1])
+            outcome = 'success' if response[1] < 400 else f'http_{response[1]}'
+            return response
+        finally:
+            EXTERNAL_CALL_LATENCY.labels('stripe', operation, outcome).observe(time.perf_counter() - started)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def instrument_stripe():
+    """Install the timing wrapper as stripe.default_http_client (idempotent)"""
+    import stripe
+
+    if isinstance(stripe.default_http_client, InstrumentedStripeHTTPClient):
+        return
+    stripe.default_http_client = InstrumentedStripeHTTPClient(
+        stripe.default_http_client or stripe.new_default_http_client()
+    )
+
+
+def instrument_agent_model(model, service='litellm'):
+    """Wrap an openai-agents Model so each model turn is timed"""
+    from agents.models.interface import Model
+
+    class InstrumentedAgentModel(Model):
+        async def get_response(self, *args, **kwargs):
+            with track_external_call(service, 'agent_turn'):
+                return await model.get_response(*args, **kwargs)
+
+        def stream_response(self, *args, **kwargs):
+            return model.stream_response(*args, **kwargs)
+
+    return InstrumentedAgentModel()
+
+
+def instrument_pool(engine, name='default'):
+    """Track pool usage from pool events (connects/checkouts per worker, summed across workers)"""
+    from sqlalchemy import event
+
+    pool = engine.pool
+    if hasattr(pool, 'size') and hasattr(pool, '_max_overflow'):
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        DB_POOL_CONNECTIONS.labels(name, 'capacity').set(capacity)
+
+    open_connections = DB_POOL_CONNECTIONS.labels(name, 'open')
+    checked_out = DB_POOL_CONNECTIONS.labels(name, 'checked_out')
+
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        open_connections.inc()
+        DB_POOL_EVENTS.labels(name, 'connect').inc()
+
+    @event.listens_for(engine, 'close')
+    def _on_close(dbapi_connection, connection_record):
+        open_connections.dec()
+
+    @event.listens_for(engine, 'close_detached')
+    def _on_close_detached(dbapi_connection):
+        open_connections.dec()
+
+    @event.listens_for(engine, 'checkout')
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_out.inc()
+        DB_POOL_EVENTS.labels(name, 'checkout').inc()
+
+    @event.listens_for(engine, 'checkin')
+    def _on_checkin(dbapi_connection, connection_record):
+        checked_out.dec()
+
+    @event.listens_for(engine, 'invalidate')
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        DB_POOL_EVENTS.labels(name, 'invalidate').inc()
+
+
+class MarketplaceBacklogCollector:
+    """
+    Scrape-time gauges for orders and listings waiting on payment or completion.
+    The counts are cached for cache_seconds, so frequent scrapes cost no queries.
+    """
+
+    def __init__(self, app, cache_seconds=15):
+        self.app = app
+        self.cache_seconds = cache_seconds
+        self._lock = threading.Lock()
+        self._counts = None
+        self._counted_at = 0.0
+
+    def collect(self):
+        with self._lock:
+            if self._counts is None or time.monotonic() - self._counted_at > self.cache_seconds:
+                self._counts = self._count()
+                self._counted_at = time.monotonic()
+            counts = self._counts
+
+        gauge = GaugeMetricFamily(
+            'stubcollect_marketplace_backlog',
+            'Orders and listings waiting on payment or completion',
+            labels=['queue']
+        )
+        for queue, value in counts:
+            gauge.add_metric([queue], value)
+        yield gauge
+
+    def _count(self):
+        from app import db
+        from app.models.stub_listing import StubListing
+        from app.models.stub_order import StubOrder
+
+        with self.app.app_context():
+            order_counts = dict(
+                db.session.query(StubOrder.order_status, db.func.count(StubOrder.id))
+                .filter(StubOrder.order_status.in_(['pending', 'payment_processing', 'payment_completed']))
+                .group_by(StubOrder.order_status)
+                .all()
+            )
+            reserved = StubListing.query.filter_by(status='payment_pending').count()
+            db.session.remove()
+
+        return [
+            ('orders_awaiting_payment', order_counts.get('pending', 0) + order_counts.get('payment_processing', 0)),
+            ('orders_awaiting_completion', order_counts.get('payment_completed', 0)),
+            ('listings_reserved', reserved),
+        ]
+
+
+def metrics_registry(app):
+    """Registry to render on /metrics (aggregated across workers in multi-process mode)"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = CollectorRegistry()
+        registry.register(_DefaultRegistryCollector())
+
+    backlog = app.extensions.get('metrics_backlog')
+    if backlog is not None:
+        registry.register(backlog)
+    return registry
+
+
+class _DefaultRegistryCollector:
+    """Expose the process-wide default registry inside a per-scrape registry"""
+
+    def collect(self):
+        return REGISTRY.collect()
+
+
+def render_metrics(app):
+    return generate_latest(metrics_registry(app)), CONTENT_TYPE_LATEST
+
+
+def mark_worker_dead(pid):
+    """Call from the server's child_exit hook in multi-process mode"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
+
+
+def init_metrics(app):
+    """Register request instrumentation and the Stripe client wrapper"""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    if app.config.get('METRICS_BACKLOG_GAUGES', True):
+        # One per app so its cached counts outlive the per-scrape registry
+        app.extensions['metrics_backlog'] = MarketplaceBacklogCollector(
+            app, cache_seconds=app.config.get('METRICS_BACKLOG_CACHE_SECONDS', 15)
+        )
+    app.before_request(observe_request_start)
+    app.after_request(observe_request_end)
+    app.teardown_request(observe_request_teardown)
+    instrument_stripe()
@@ -0,0 +1,182 @@
+# backend/app/utils/profiler.py - On-demand sampling profiler
+"""
+Samples Python stacks with sys._current_frames() from a background thread and
+aggregates them as collapsed stacks ("frame;frame;frame count"), the input format
+of flamegraph.pl, speedscope and inferno.
+
+Two modes, both admin-only (see app/routes/profiler.py):
+- worker: profile every thread in this worker process for a time window
+- request: profile only the thread handling one request, enabled by sending
+  the X-Profile header on that request
+
+Nothing runs unless PROFILER_ENABLED is true, and even then no thread exists
+outside an active profile.
+"""
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+
+from flask import g, request
+
+PROFILE_HEADER = 'X-Profile'
+MAX_STORED_PROFILES = 20
+MAX_STACK_DEPTH = 128
+
+
+class SamplingProfiler:
+    """Background thread that samples stacks of the given threads (or all threads)"""
+
+    def __init__(self, interval_ms=10, thread_ids=None, max_duration=60, label='worker'):
+        self.id = uuid.uuid4().hex[:12]
+        self.interval = max(interval_ms, 1) / 1000.0
+        self.thread_ids = set(thread_ids) if thread_ids else None
+        self.max_duration = max_duration
+        self.label = label
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = None
+        self.stopped_at = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name=f'sampling-profiler-{self.id}', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1)
+        if self.stopped_at is None:
+            self.stopped_at = time.time()
+        return self
+
+    def _run(self):
+        own_id = threading.get_ident()
+        deadline = self.started_at + self.max_duration
+
+        while not self._stop.is_set() and time.time() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if self.thread_ids is not None and thread_id not in self.thread_ids:
+                    continue
+                self.stacks[self._collapse(frame)] += 1
+            self.samples += 1
+            self._stop.wait(self.interval)
+
+        self.stopped_at = time.time()
+
+    @staticmethod
+    def _collapse(frame):
+        parts = []
+        while frame is not None and len(parts) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ';'.join(reversed(parts))
+
+    def collapsed(self):
+        """Flame-graph input: one 'frame;frame;frame count' line per unique stack"""
+        return '\n'.join(f'{stack} {count}' for stack, count in self.stacks.most_common()) + '\n'
+
+    def summary(self):
+        duration = (self.stopped_at or time.time()) - (self.started_at or time.time())
+        return {
+            'id': self.id,
+            'label': self.label,
+            'pid': os.getpid(),
+            'running': self.running,
+            'interval_ms': round(self.interval * 1000, 3),
+            'samples': self.samples,
+            'unique_stacks': len(self.stacks),
+            'duration_seconds': round(duration, 3),
+            'started_at': datetime.utcfromtimestamp(self.started_at).isoformat() if self.started_at else None,
+        }
+
+
+class ProfilerRegistry:
+    """Per-worker state: at most one worker-wide profile plus recent finished profiles"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = None
+        self.profiles = deque(maxlen=MAX_STORED_PROFILES)
+
+    def start_worker_profile(self, duration, interval_ms):
+        with self.lock:
+            if self.active is not None and self.active.running:
+                return None
+            self.active = SamplingProfiler(interval_ms=interval_ms, max_duration=duration).start()
+            self.profiles.appendleft(self.active)
+            return self.active
+
+    def stop_worker_profile(self):
+        with self.lock:
+            profiler, self.active = self.active, None
+        if profiler is not None:
+            profiler.stop()
+        return profiler
+
+    def add(self, profiler):
+        with self.lock:
+            self.profiles.appendleft(profiler)
+
+    def get(self, profile_id):
+        with self.lock:
+            return next((p for p in self.profiles if p.id == profile_id), None)
+
+    def list(self):
+        with self.lock:
+            return [p.summary() for p in self.profiles]
+
+
+registry = ProfilerRegistry()
+
+
+def _start_request_profile():
+    # Header check first: requests without it never touch current_user or the profiler
+    if PROFILE_HEADER not in request.headers:
+        return
+
+    from flask import current_app
+    from flask_login import current_user
+
+    if not (current_user.is_authenticated and current_user.is_admin):
+        return
+
+    interval_ms = current_app.config.get('PROFILER_REQUEST_INTERVAL_MS', 1)
+    g.request_profiler = SamplingProfiler(
+        interval_ms=interval_ms,
+        thread_ids=[threading.get_ident()],
+        max_duration=current_app.config.get('PROFILER_MAX_DURATION', 60),
+        label=f'{request.method} {request.path}'
+    ).start()
+
+
+def _finish_request_profile(response):
+    profiler = g.pop('request_profiler', None)
+    if profiler is not None:
+        profiler.stop()
+        registry.add(profiler)
+        response.headers['X-Profile-Id'] = profiler.id
+    return response
+
+
+def init_profiler(app):
+    """Register the per-request profiling hooks when PROFILER_ENABLED is true"""
+    if not app.config.get('PROFILER_ENABLED'):
+        return
+
+    app.before_request(_start_request_profile)
+    app.after_request(_finish_request_profile)
@@ -0,0 +1,121 @@
+# backend/app/utils/query_counter.py - SQL query counting per request
+import threading
+import time
+
+from flask import g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_local = threading.local()
+_listeners_installed = False
+_listeners_lock = threading.Lock()
+
+
+class QueryCounter:
+    """
+    Counts SQL statements executed on the current thread while active.
+
+    Usage:
+        with QueryCounter() as counter:
+            client.get('/api/marketplace/listings')
+        print(counter.count, counter.duration_ms)
+    """
+
+    def __init__(self, keep_statements: bool = False):
+        self.count = 0
+        self.duration = 0.0
+        self.keep_statements = keep_statements
+        self.statements = []
+
+    @property
+    def duration_ms(self) -> float:
+        return self.duration * 1000
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.duration += elapsed
+        if self.keep_statements:
+            self.statements.append(statement)
+
+    def __enter__(self):
+        install_query_listeners()
+        _active_counters().append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _active_counters().remove(self)
+
+
+def _active_counters():
+    if not hasattr(_local, 'counters'):
+        _local.counters = []
+    return _local.counters
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_times', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get('query_start_times')
+    if not start_times:
+        return
+    elapsed = time.perf_counter() - start_times.pop()
+
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+        g.query_time = g.get('query_time', 0.0) + elapsed
+
+    for counter in _active_counters():
+        counter.record(statement, elapsed)
+
+
+def _handle_error(exception_context):
+    # Failed statements never reach after_cursor_execute; drop their start time
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('query_start_times'):
+        conn.info['query_start_times'].pop()
+
+
+def install_query_listeners():
+    """Attach the counting listeners to every SQLAlchemy engine (idempotent)"""
+    global _listeners_installed
+    with _listeners_lock:
+        if _listeners_installed:
+            return
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+        _listeners_installed = True
+
+
+def init_query_counter(app):
+    """
+    Count queries per request on flask.g (query_count, query_time).
+    - QUERY_COUNT_HEADERS: add X-Query-Count / X-Query-Time-Ms response headers
+    - QUERY_COUNT_WARN_THRESHOLD: log requests that issue more queries than this
+    """
+    install_query_listeners()
+
+    show_headers = app.config.get('QUERY_COUNT_HEADERS', False)
+    warn_threshold = app.config.get('QUERY_COUNT_WARN_THRESHOLD')
+
+    if not show_headers and not warn_threshold:
+        return
+
+    @app.after_request
+    def report_query_count(response):
+        from flask import request
+
+        query_count = g.get('query_count', 0)
+        query_time_ms = g.get('query_time', 0.0) * 1000
+
+        if show_headers:
+            response.headers['X-Query-Count'] = str(query_count)
+            response.headers['X-Query-Time-Ms'] = f'{query_time_ms:.2f}'
+
+        if warn_threshold and query_count > warn_threshold:
+            print(f"⚠️ {request.method} {request.path} issued {query_count} queries "
+                  f"({query_time_ms:.1f}ms), threshold is {warn_threshold}")
+
+        return response
@@ -0,0 +1,278 @@
+# backend/app/utils/response_cache.py - Read-through cache for public JSON responses
+"""
+Caches GET responses keyed on the path and normalized query parameters, serves
+ETag / If-None-Match revalidation, and invalidates by bumping a per-namespace
+generation whenever the data behind the namespace is committed.
+
+Backends:
+- memory (default): per-worker LRU with TTL. Invalidation events only reach the
+  worker that committed the change, so other workers may serve a stale page for
+  up to RESPONSE_CACHE_TTL seconds.
+- redis (RESPONSE_CACHE_REDIS_URL): shared by all workers, invalidation is global.
+  Requires the optional `redis` package.
+"""
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, has_app_context, make_response, request
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.utils.db_routing import primary_pinned, use_primary
+from app.utils.metrics import record_cache_lookup
+
+MARKETPLACE_NAMESPACE = 'marketplace'
+
+# User columns that appear in listing payloads (seller_name, payment capability, liability status)
+SELLER_COLUMNS = (
+    'username', 'stripe_account_id', 'stripe_account_status', 'stripe_onboarding_completed',
+    'stripe_capabilities_enabled', 'stripe_requirements_due', 'seller_verification_level',
+)
+
+
+class CachedResponse:
+    __slots__ = ('body', 'etag', 'mimetype')
+
+    def __init__(self, body, etag, mimetype):
+        self.body = body
+        self.etag = etag
+        self.mimetype = mimetype
+
+
+class MemoryCacheBackend:
+    """Thread-safe LRU with per-entry expiry"""
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def generation(self, namespace):
+        with self._lock:
+            return self._generations.get(namespace, 0)
+
+    def bump(self, namespace):
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            # Entries from older generations can never be read again
+            stale = [key for key in self._entries if key.startswith(f'{namespace}:')]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCacheBackend:
+    """Shared cache for multi-worker deployments"""
+
+    def __init__(self, url, prefix='stubcollect:response_cache:'):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("RESPONSE_CACHE_REDIS_URL is set but the 'redis' package is not installed")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        data = self.client.get(self.prefix + key)
+        return pickle.loads(data) if data else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=max(int(ttl), 1))
+
+    def generation(self, namespace):
+        return int(self.client.get(f'{self.prefix}generation:{namespace}') or 0)
+
+    def bump(self, namespace):
+        self.client.incr(f'{self.prefix}generation:{namespace}')
+
+    def clear(self):
+        for key in self.client.scan_iter(f'{self.prefix}*'):
+            self.client.delete(key)
+
+
+class ResponseCache:
+    def __init__(self, backend, ttl=60, enabled=True):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+
+    def key(self, namespace, path, params):
+        generation = self.backend.generation(namespace)
+        raw = f'{path}?{params}'
+        digest = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+        return f'{namespace}:{generation}:{digest}'
+
+    def invalidate(self, namespace):
+        self.backend.bump(namespace)
+
+
+def normalized_params(defaults=None, lowercase=(), exclude=()):
+    """
+    Canonical query string: defaults filled in, empty values dropped, keys sorted,
+    case-insensitive params lowercased. '?per_page=4&page=1' == '' for the listings page.
+    """
+    params = dict(defaults or {})
+    for key in request.args:
+        value = request.args.get(key, '').strip()
+        if value == '':
+            continue
+        params[key] = value.lower() if key in lowercase else value
+    return '&'.join(f'{key}={params[key]}' for key in sorted(params) if key not in exclude)
+
+
+def _conditional(entry, cache_status):
+    if entry.etag in request.if_none_match:
+        response = make_response('', 304)
+    else:
+        response = make_response(entry.body)
+        response.mimetype = entry.mimetype
+    response.set_etag(entry.etag)
+    response.headers['Cache-Control'] = 'public, no-cache'
+    response.headers['X-Cache'] = cache_status
+    return response
+
+
+def cached_response(namespace, defaults=None, lowercase=()):
+    """
+    Read-through cache for an anonymous GET view returning JSON.
+
+    Usage:
+        @bp.route('/marketplace/listings', methods=['GET'])
+        @cached_response('marketplace', defaults={'page': '1'})
+        def get_listings(): ...
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = current_app.extensions.get('response_cache')
+            if cache is None or not cache.enabled or primary_pinned():
+                # A user who just wrote reads their own writes from the primary, uncached
+                return view(*args, **kwargs)
+
+            # The generation is read before the view runs, so a response computed
+            # while an invalidation lands is stored under the superseded key
+            key = cache.key(namespace, request.path, normalized_params(defaults, lowercase))
+            entry = cache.backend.get(key)
+            record_cache_lookup(namespace, entry is not None)
+            if entry is not None:
+                return _conditional(entry, 'HIT')
+
+            # Fill from the primary: a lagging replica could cache a page the
+            # invalidation that emptied this key was meant to replace
+            use_primary()
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.direct_passthrough:
+                return response
+
+            body = response.get_data()
+            entry = CachedResponse(body, hashlib.sha1(body).hexdigest(), response.mimetype)
+            cache.backend.set(key, entry, cache.ttl)
+            return _conditional(entry, 'MISS')
+        return wrapper
+    return decorator
+
+
+def cached_value(namespace, name, params, compute):
+    """
+    Read-through cache for a value computed inside a view (pickled for redis),
+    invalidated with the namespace like cached responses. `params` is the
+    signature it depends on, usually from normalized_params.
+    """
+    cache = current_app.extensions.get('response_cache')
+    if cache is None or not cache.enabled or primary_pinned():
+        return compute()
+
+    key = cache.key(namespace, name, params)
+    value = cache.backend.get(key)
+    record_cache_lookup(name, value is not None)
+    if value is None:
+        use_primary()  # as in cached_response
+        value = compute()
+        cache.backend.set(key, value, cache.ttl)
+    return value
+
+
+def _track_marketplace_changes(session, flush_context, instances):
+    from app.models.stub import Stub
+    from app.models.stub_listing import StubListing
+    from app.models.stub_order import StubOrder
+    from app.models.user import User
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        # Orders appear in the listing detail's order_history
+        if isinstance(obj, (StubListing, Stub, StubOrder)):
+            if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+                continue
+            session.info['invalidate_marketplace'] = True
+            return
+        if isinstance(obj, User) and obj in session.dirty:
+            state = inspect(obj)
+            if any(state.attrs[column].history.has_changes() for column in SELLER_COLUMNS):
+                session.info['invalidate_marketplace'] = True
+                return
+
+
+def _invalidate_after_commit(session):
+    if session.info.pop('invalidate_marketplace', False) and has_app_context():
+        cache = current_app.extensions.get('response_cache')
+        if cache is not None:
+            cache.invalidate(MARKETPLACE_NAMESPACE)
+
+
+def _discard_after_rollback(session, previous_transaction):
+    session.info.pop('invalidate_marketplace', None)
+
+
+_listeners_installed = False
+
+
+def init_response_cache(app):
+    """Create the cache and invalidate the marketplace namespace on relevant commits"""
+    global _listeners_installed
+
+    redis_url = app.config.get('RESPONSE_CACHE_REDIS_URL')
+    if redis_url:
+        backend = RedisCacheBackend(redis_url)
+    else:
+        backend = MemoryCacheBackend(app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 1000))
+
+    cache = ResponseCache(
+        backend,
+        ttl=app.config.get('RESPONSE_CACHE_TTL', 60),
+        enabled=app.config.get('RESPONSE_CACHE_ENABLED', True)
+    )
+    app.extensions['response_cache'] = cache
+
+    if not _listeners_installed:
+        event.listen(Session, 'before_flush', _track_marketplace_changes)
+        event.listen(Session, 'after_commit', _invalidate_after_commit)
+        event.listen(Session, 'after_soft_rollback', _discard_after_rollback)
+        _listeners_installed = True
+    return cache
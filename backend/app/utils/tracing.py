@@ -0,0 +1,285 @@
+# backend/app/utils/tracing.py - OpenTelemetry tracing
+"""
+Spans for every route, SQL statement, Stripe call, Gemini/LiteLLM call and PIL
+operation, exported to a JSON-lines file or an OTLP collector.
+
+Overhead is controlled by head sampling: TRACING_SAMPLE_RATE of incoming requests
+are recorded, and unsampled requests never create SQL spans at all. A client's
+traceparent header is ignored (any caller could otherwise force every request to
+be sampled) unless TRACING_TRUST_TRACEPARENT is set, for deployments where only a
+trusted gateway or internal services can reach the app. Everything below is a no-op
+unless TRACING_ENABLED is true.
+"""
+import functools
+import threading
+from contextlib import contextmanager, nullcontext
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_tracer = None
+_sql_spans = False
+_sql_statement_limit = 1000
+_trust_traceparent = False
+_noop = nullcontext()
+
+
+def tracing_enabled():
+    return _tracer is not None
+
+
+def trace_span(name, kind='internal', **attributes):
+    """
+    Context manager for a child span of the current span (no-op when tracing is off).
+
+    Usage:
+        with trace_span('StubOrder.from_listing', listing_id=listing.id):
+            order = StubOrder.from_listing(...)
+    """
+    if _tracer is None:
+        return _noop
+    return _start_span(name, kind, attributes)
+
+
+@contextmanager
+def _start_span(name, kind, attributes):
+    from opentelemetry.trace import SpanKind, Status, StatusCode
+
+    span_kind = SpanKind.CLIENT if kind == 'client' else SpanKind.INTERNAL
+    with _tracer.start_as_current_span(name, kind=span_kind, record_exception=False,
+                                       set_status_on_exception=False) as span:
+        if span.is_recording():
+            for key, value in attributes.items():
+                if value is not None:
+                    span.set_attribute(key, value)
+        try:
+            yield span
+        except Exception as e:
+            if span.is_recording():
+                span.record_exception(e)
+                span.set_status(Status(StatusCode.ERROR, str(e)))
+            raise
+
+
+def traced(name=None, kind='internal'):
+    """Decorator form of trace_span; the span name defaults to Class.method"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with _start_span(span_name, kind, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_trace_id():
+    """Hex trace id of the current sampled span, or None"""
+    if _tracer is None:
+        return None
+    from opentelemetry import trace
+
+    span_context = trace.get_current_span().get_span_context()
+    if not span_context.is_valid or not span_context.trace_flags.sampled:
+        return None
+    return format(span_context.trace_id, '032x')
+
+
+# ----------------------------------------------------------------------
+# Flask request spans
+# ----------------------------------------------------------------------
+
+def _start_request_span():
+    from opentelemetry import context, trace
+    from opentelemetry.propagate import extract
+    from opentelemetry.trace import SpanKind
+
+    route = request.url_rule.rule if request.url_rule else '<unmatched>'
+    span = _tracer.start_span(
+        f'{request.method} {route}',
+        # Untrusted callers get a root span, sampled at TRACING_SAMPLE_RATE
+        context=extract(request.headers) if _trust_traceparent else context.Context(),
+        kind=SpanKind.SERVER
+    )
+    if span.is_recording():
+        span.set_attribute('http.request.method', request.method)
+        span.set_attribute('http.route', route)
+        span.set_attribute('url.path', request.path)
+        span.set_attribute('flask.blueprint', request.blueprint or 'app')
+
+    g.trace_span = span
+    g.trace_token = context.attach(trace.set_span_in_context(span))
+
+
+def _finish_request_span(response):
+    span = g.get('trace_span')
+    if span is not None and span.is_recording():
+        span.set_attribute('http.response.status_code', response.status_code)
+        span.set_attribute('db.query_count', g.get('query_count', 0))
+        trace_id = current_trace_id()
+        if trace_id:
+            response.headers['X-Trace-Id'] = trace_id
+    return response
+
+
+def _teardown_request_span(exc):
+    from opentelemetry import context
+    from opentelemetry.trace import Status, StatusCode
+
+    span = g.pop('trace_span', None)
+    token = g.pop('trace_token', None)
+    if span is None:
+        return
+
+    if exc is not None and span.is_recording():
+        span.record_exception(exc)
+        span.set_status(Status(StatusCode.ERROR, str(exc)))
+    span.end()
+    if token is not None:
+        context.detach(token)
+
+
+# ----------------------------------------------------------------------
+# SQLAlchemy statement spans
+# ----------------------------------------------------------------------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _tracer is None or not _sql_spans:
+        return
+
+    from opentelemetry import trace
+    from opentelemetry.trace import SpanKind
+
+    # Only trace statements inside a sampled request; keeps unsampled overhead at zero
+    if not trace.get_current_span().is_recording():
+        return
+
+    operation = statement.lstrip().split(' ', 1)[0].upper()
+    span = _tracer.start_span(f'SQL {operation}', kind=SpanKind.CLIENT)
+    span.set_attribute('db.system', conn.dialect.name)
+    span.set_attribute('db.operation', operation)
+    span.set_attribute('db.statement', statement[:_sql_statement_limit])
+    if executemany:
+        span.set_attribute('db.executemany', True)
+    conn.info.setdefault('trace_spans', []).append(span)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    spans = conn.info.get('trace_spans')
+    if spans:
+        span = spans.pop()
+        if cursor is not None and cursor.rowcount is not None and cursor.rowcount >= 0:
+            span.set_attribute('db.rowcount', cursor.rowcount)
+        span.end()
+
+
+def _handle_error(exception_context):
+    from opentelemetry.trace import Status, StatusCode
+
+    conn = exception_context.connection
+    spans = conn.info.get('trace_spans') if conn is not None else None
+    if spans:
+        span = spans.pop()
+        span.record_exception(exception_context.original_exception)
+        span.set_status(Status(StatusCode.ERROR, str(exception_context.original_exception)))
+        span.end()
+
+
+# ----------------------------------------------------------------------
+# Exporters and setup
+# ----------------------------------------------------------------------
+
+class JsonLinesSpanExporter:
+    """Append finished spans to a file, one JSON object per line"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        from opentelemetry.sdk.trace.export import SpanExportResult
+
+        lines = [span.to_json(indent=None) for span in spans]
+        with self._lock, open(self.path, 'a') as f:
+            f.write('\n'.join(lines) + '\n')
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+    def force_flush(self, timeout_millis=30000):
+        return True
+
+
+def build_exporter(config):
+    exporter = (config.get('TRACING_EXPORTER') or 'file').lower()
+
+    if exporter == 'otlp':
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        endpoint = config.get('TRACING_OTLP_ENDPOINT')
+        return OTLPSpanExporter(endpoint=endpoint) if endpoint else OTLPSpanExporter()
+
+    if exporter == 'console':
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+        return ConsoleSpanExporter()
+
+    if exporter == 'file':
+        return JsonLinesSpanExporter(config.get('TRACING_FILE') or 'traces.jsonl')
+
+    raise ValueError(f"Unknown TRACING_EXPORTER: {exporter}. Options: file, otlp, console")
+
+
+def init_tracing(app):
+    """Configure the tracer provider and request/SQL instrumentation"""
+    global _tracer, _sql_spans, _sql_statement_limit, _trust_traceparent
+
+    if not app.config.get('TRACING_ENABLED'):
+        return
+
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+    except ImportError:
+        print("⚠️ TRACING_ENABLED is set but opentelemetry-sdk is not installed; tracing disabled")
+        return
+
+    if _tracer is None:
+        sample_rate = float(app.config.get('TRACING_SAMPLE_RATE', 0.01))
+        provider = TracerProvider(
+            resource=Resource.create({'service.name': app.config.get('TRACING_SERVICE_NAME', 'stubcollect-backend')}),
+            sampler=ParentBased(TraceIdRatioBased(sample_rate))
+        )
+        provider.add_span_processor(BatchSpanProcessor(build_exporter(app.config)))
+        trace.set_tracer_provider(provider)
+        _tracer = trace.get_tracer('stubcollect')
+
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+    _sql_spans = app.config.get('TRACING_SQL_SPANS', True)
+    _sql_statement_limit = int(app.config.get('TRACING_SQL_STATEMENT_LIMIT', 1000))
+    _trust_traceparent = app.config.get('TRACING_TRUST_TRACEPARENT', False)
+
+    app.before_request(_start_request_span)
+    app.after_request(_finish_request_span)
+    app.teardown_request(_teardown_request_span)
+    print(f"🔭 Tracing enabled ({app.config.get('TRACING_EXPORTER', 'file')}, "
+          f"sample rate {app.config.get('TRACING_SAMPLE_RATE', 0.01)})")
+
+
+def shutdown_tracing():
+    """Flush pending spans (call before the process exits in scripts and benchmarks)"""
+    if _tracer is None:
+        return
+    from opentelemetry import trace
+    provider = trace.get_tracer_provider()
+    if hasattr(provider, 'shutdown'):
+        provider.shutdown()
@@ -0,0 +1,163 @@
+# backend/app/utils/user_cache.py - Per-process cache for the Flask-Login user loader
+"""
+Caches User rows for the user_loader so authenticated requests skip the
+primary-key SELECT that Flask-Login would otherwise run on every request.
+
+Entries hold column values, not ORM instances. A hit rebuilds a User and attaches
+it to the request's session with merge(load=False), so relationships still lazy
+load and changes to current_user flush as usual.
+
+Invalidation is version-based: committing any change to a User (profile edits,
+Stripe onboarding, the account.updated webhook) bumps that user's version and
+drops the entry. A loader that read the row before the bump cannot store it
+afterwards. Users are always loaded from the primary, even on @read_replica
+endpoints: a lagging replica could return the pre-bump row after the bump, and it
+would be cached. Other worker processes only see the change once their entry expires,
+so USER_CACHE_TTL bounds cross-worker staleness.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.session import make_transient_to_detached
+
+from app.utils.metrics import record_cache_lookup
+
+
+class UserCache:
+    """LRU of user_id -> column values with a TTL and per-user versions"""
+
+    def __init__(self, ttl=30, max_entries=10000, enabled=True):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries = OrderedDict()
+        # Versions come from one increasing counter and are kept for the last max_entries
+        # invalidated users; an evicted version raises the floor every other user reports,
+        # so a loader in flight never matches a version from before the eviction
+        self._versions = OrderedDict()
+        self._counter = 0
+        self._floor = 0
+        self._lock = threading.Lock()
+
+    def version(self, user_id):
+        return self._versions.get(user_id, self._floor)
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, values = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return values
+
+    def set(self, user_id, values, version):
+        """Store unless the user changed since `version` was read"""
+        with self._lock:
+            if self._versions.get(user_id, self._floor) != version:
+                return
+            self._entries[user_id] = (time.monotonic() + self.ttl, values)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._counter += 1
+            self._versions[user_id] = self._counter
+            self._versions.move_to_end(user_id)
+            while len(self._versions) > self.max_entries:
+                _, evicted = self._versions.popitem(last=False)
+                self._floor = max(self._floor, evicted)
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _column_values(user):
+    return {attr.key: getattr(user, attr.key) for attr in inspect(user).mapper.column_attrs}
+
+
+def _attach(model, values):
+    from app import db
+
+    user = inspect(model).class_manager.new_instance()
+    for key, value in values.items():
+        set_committed_value(user, key, value)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+def load_user(user_id):
+    """user_loader body: cached column values, or one SELECT on a miss"""
+    from app import db
+    from app.models.user import User
+
+    primary = {'bind': db.engine}  # not a replica; see the module docstring
+    cache = current_app.extensions.get('user_cache')
+    if cache is None or not cache.enabled:
+        return db.session.get(User, user_id, bind_arguments=primary)
+
+    values = cache.get(user_id)
+    record_cache_lookup('user', values is not None)
+    if values is not None:
+        return _attach(User, values)
+
+    version = cache.version(user_id)
+    user = db.session.get(User, user_id, bind_arguments=primary)
+    if user is not None:
+        cache.set(user_id, _column_values(user), version)
+    return user
+
+
+def _track_user_changes(session, flush_context, instances):
+    from app.models.user import User
+
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and (obj in session.deleted or session.is_modified(obj, include_collections=False)):
+            session.info.setdefault('changed_user_ids', set()).add(obj.id)
+
+
+def _invalidate_after_commit(session):
+    user_ids = session.info.pop('changed_user_ids', None)
+    if user_ids and has_app_context():
+        cache = current_app.extensions.get('user_cache')
+        if cache is not None:
+            for user_id in user_ids:
+                cache.invalidate(user_id)
+
+
+def _discard_after_rollback(session, previous_transaction):
+    session.info.pop('changed_user_ids', None)
+
+
+_listeners_installed = False
+
+
+def init_user_cache(app):
+    """Create the cache and invalidate users on commits that change them"""
+    global _listeners_installed
+
+    cache = UserCache(
+        ttl=app.config.get('USER_CACHE_TTL', 30),
+        max_entries=app.config.get('USER_CACHE_MAX_ENTRIES', 10000),
+        enabled=app.config.get('USER_CACHE_ENABLED', True)
+    )
+    app.extensions['user_cache'] = cache
+
+    if not _listeners_installed:
+        event.listen(Session, 'before_flush', _track_user_changes)
+        event.listen(Session, 'after_commit', _invalidate_after_commit)
+        event.listen(Session, 'after_soft_rollback', _discard_after_rollback)
+        _listeners_installed = True
+    return cache
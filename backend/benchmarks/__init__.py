@@ -0,0 +1 @@
+# Offline benchmarking and load-testing tools for the Stub Collector backend
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Entity Match Benchmark
+Loads synthetic canonical events and venues into the entity index
+(app/services/entity_normalizer.py) and times lookups of spelling variants:
+exact re-spellings (case, punctuation, word order, filler words), typos and
+extra words, and names that should not match anything.
+
+Fails when the p99 lookup exceeds the budget (default 1 ms), when a re-spelling
+does not resolve to its entity or when an unknown name matches one. Typos are
+reported only: whether one still clears the threshold depends on the name.
+The garbage collector is off while timing, as with timeit, so collector pauses
+caused by the rest of the process are not charged to single lookups.
+
+Examples:
+    python -m benchmarks.entity_match
+    python -m benchmarks.entity_match --entities 50000 --lookups 20000
+"""
+
+import argparse
+import gc
+import random
+import sys
+import time
+from datetime import datetime
+
+from benchmarks.harness import BenchmarkEnvironment, percentile
+
+# Common words shared by many names; the distinctive part (artist, team, venue) is generated
+WORDS = [
+    'arctic', 'monkeys', 'madison', 'square', 'garden', 'royal', 'albert', 'hall', 'taylor', 'swift', 'eras',
+    'tour', 'coldplay', 'spheres', 'lakers', 'celtics', 'yankees', 'red', 'sox', 'arsenal', 'chelsea', 'united',
+    'city', 'stadium', 'arena', 'theatre', 'finals', 'game', 'world', 'series', 'live', 'festival', 'summer',
+    'winter', 'symphony', 'orchestra', 'opera', 'house', 'park', 'field', 'center', 'dome', 'bowl', 'cup',
+    'champions', 'league', 'grand', 'prix', 'open', 'classic', 'reunion', 'farewell', 'acoustic', 'night',
+]
+
+
+CONSONANTS = 'bcdfghjklmnprstvwz'
+VOWELS = 'aeiou'
+
+
+def proper_word(rng):
+    """Pronounceable made-up word, about as varied in trigrams as artist and team names"""
+    return ''.join(rng.choice(CONSONANTS) + rng.choice(VOWELS) + rng.choice(['', '', 'n', 'r', 'l', 's'])
+                   for _ in range(rng.randint(2, 3)))
+
+
+def synthetic_names(rng, count):
+    """Distinct names; word order does not make a new entity, so one name per word set"""
+    from app.services.entity_normalizer import match_key
+
+    vocabulary = sorted({proper_word(rng) for _ in range(max(count // 4, 100))})
+    names = {}
+    while len(names) < count:
+        # Like 'Taylor Swift The Eras Tour' or 'Wembley Stadium': distinctive words plus at most one common one
+        words = rng.sample(vocabulary, rng.randint(1, 3)) + rng.sample(WORDS, rng.randint(0, 1))
+        if rng.random() < 0.3:
+            words.append(str(rng.randint(1990, 2030)))
+        name = ' '.join(word.capitalize() for word in words)
+        names.setdefault(match_key(name), name)
+    return sorted(names.values())
+
+
+def respell(rng, name):
+    """Same entity: case, punctuation, order and filler words change"""
+    words = name.split()
+    rng.shuffle(words)
+    words.insert(rng.randint(0, len(words)), rng.choice(['the', 'vs', 'at', 'FC']))
+    return ' '.join(word.upper() if rng.random() < 0.5 else word.lower() for word in words) + rng.choice(['', '!', ' -'])
+
+
+def typo(rng, name):
+    """Probably the same entity: one character dropped from the longest word"""
+    words = name.split()
+    longest = max(range(len(words)), key=lambda i: len(words[i]) if not words[i].isdigit() else 0)
+    word = words[longest]
+    position = rng.randint(1, len(word) - 2)
+    words[longest] = word[:position] + word[position + 1:]
+    return ' '.join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time fuzzy event/venue lookups against the entity index')
+    parser.add_argument('--entities', type=int, default=20000, help='Entities per kind')
+    parser.add_argument('--lookups', type=int, default=10000)
+    parser.add_argument('--budget-us', type=float, default=1000.0, help='p99 lookup budget in microseconds')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    names = synthetic_names(rng, args.entities)
+
+    with BenchmarkEnvironment(seed=args.seed) as env:
+        with env.app.app_context():
+            from app import db
+            from app.models.canonical_entity import CanonicalEntity
+            from app.services.entity_normalizer import get_entity_index, match_key
+
+            now = datetime.utcnow()
+            db.session.execute(CanonicalEntity.__table__.insert(), [
+                {'kind': 'event', 'name': name, 'match_key': match_key(name), 'created_at': now} for name in names
+            ])
+            db.session.commit()
+            ids = dict(db.session.query(CanonicalEntity.name, CanonicalEntity.id).filter_by(kind='event'))
+
+            index = get_entity_index()
+            started = time.perf_counter()
+            index.refresh()
+            load_ms = (time.perf_counter() - started) * 1000
+
+            cases = []
+            for _ in range(args.lookups):
+                name = rng.choice(names)
+                kind = rng.random()
+                if kind < 0.5:
+                    cases.append(('respelled', respell(rng, name), ids[name]))
+                elif kind < 0.85:
+                    cases.append(('typo', typo(rng, name), ids[name]))
+                else:
+                    cases.append(('unknown', f'Qzx{rng.randint(0, 10 ** 6)} Vwk {rng.choice(WORDS)}', None))
+
+            timings, outcomes = [], {}
+            gc.disable()
+            for label, query, expected in cases:
+                started = time.perf_counter()
+                entity_id, _ = index.match('event', query)
+                timings.append((time.perf_counter() - started) * 1e6)
+                hits, total = outcomes.get(label, (0, 0))
+                outcomes[label] = (hits + (entity_id == expected), total + 1)
+            gc.enable()
+
+    timings.sort()
+    p50, p99 = percentile(timings, 50), percentile(timings, 99)
+    print(f"\n🔤 ENTITY MATCH ({len(names)} events, {len(cases)} lookups, index loaded in {load_ms:.0f} ms)")
+    print(f"   p50 {p50:.0f} µs   p99 {p99:.0f} µs   max {timings[-1]:.0f} µs   (budget p99 {args.budget_us:.0f} µs)")
+    for label, (hits, total) in sorted(outcomes.items()):
+        print(f"   {label:<10} {hits / total:6.1%} resolved as expected ({hits}/{total})")
+
+    failures = []
+    if p99 > args.budget_us:
+        failures.append(f'p99 {p99:.0f} µs > budget {args.budget_us:.0f} µs')
+    if outcomes['respelled'][0] != outcomes['respelled'][1]:
+        failures.append('respelled names must always resolve to their entity')
+    if outcomes['unknown'][0] != outcomes['unknown'][1]:
+        failures.append('unknown names must not match an entity')
+    if failures:
+        print('\n❌ ' + '\n❌ '.join(failures))
+        sys.exit(1)
+    print('\n✅ Lookups within budget')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+EXPLAIN Checks
+Runs the hot stub / marketplace routes against a seeded database, captures the
+SQL each one issues and asks the database for the plan of every statement.
+A route fails when:
+- an index it is expected to use does not appear in any plan
+- stub or stub_listing is scanned in full (unless the check allows it: aggregates
+  over every active listing read most of the table whichever plan is used)
+- a paginated (LIMIT) stub / stub_listing query sorts instead of walking an index;
+  unpaginated queries may sort, since that costs about the same as reading the rows,
+  and so may top-N aggregates (GROUP BY ... ORDER BY count), which sort groups, not rows
+
+Statistics are gathered (ANALYZE) after seeding, as a production database would have.
+
+SQLite plans come from EXPLAIN QUERY PLAN. On PostgreSQL (--database-url) plans
+come from EXPLAIN (FORMAT JSON) with sequential scans disabled, since the small
+benchmark tables would otherwise always be read sequentially.
+
+Examples:
+    python -m benchmarks.explain_check
+    python -m benchmarks.explain_check --verbose          # print every plan
+    python -m benchmarks.explain_check --database-url postgresql+psycopg2://localhost/stub_bench
+"""
+
+import argparse
+import json
+import re
+import sys
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from benchmarks.harness import BenchmarkEnvironment
+from benchmarks.query_budgets import (
+    BudgetContext, export_stubs, listing_browse, listing_by_event, listing_create, listing_facets, my_listings,
+    price_stats_lookup, seller_listings, seller_stubs, stub_list
+)
+
+CHECKED_TABLES = ('stub', 'stub_listing', 'price_index')
+
+_capture = threading.local()
+
+
+@dataclass
+class ExplainCheck:
+    name: str
+    request: Callable  # (ctx, per_page) -> (client, method, path, kwargs), shared with query_budgets
+    indexes: Tuple[str, ...] = ()  # every one must show up in at least one plan
+    expected_status: int = 200
+    full_scans_allowed: Tuple[str, ...] = ()
+
+
+CHECKS = [
+    ExplainCheck('GET /api/stubs', stub_list, ('ix_stub_user_id_created_at',)),
+    ExplainCheck('GET /api/marketplace/listings', listing_browse,
+                 ('ix_stub_listing_status_listed_at', 'ix_stub_listing_stub_id_status')),
+    ExplainCheck('GET /api/marketplace/listings?event', listing_by_event, ('ix_stub_event_id',)),
+    ExplainCheck('GET /api/marketplace/listings?facets', listing_facets, ('ix_stub_listing_status_listed_at',),
+                 full_scans_allowed=('stub_listing',)),
+    ExplainCheck('GET /api/marketplace/my-listings', my_listings, ('ix_stub_listing_seller_id_status_listed_at',)),
+    ExplainCheck('GET /api/marketplace/sellers/<id>/listings', seller_listings,
+                 ('ix_stub_listing_seller_id_status_listed_at',)),
+    ExplainCheck('GET /api/marketplace/sellers/<id>/stubs', seller_stubs,
+                 ('ix_stub_user_id_created_at', 'ix_stub_listing_stub_id_status')),
+    ExplainCheck('GET /api/exports/stubs', export_stubs, ('ix_stub_user_id_created_at',)),
+    ExplainCheck('POST /api/marketplace/list', listing_create, ('ix_stub_listing_stub_id_status',), expected_status=201),
+    ExplainCheck('GET /api/marketplace/price-stats', price_stats_lookup, ('uq_price_index_bucket',)),
+]
+
+
+@dataclass
+class StatementPlan:
+    statement: str
+    plan: List[str]
+    indexes: set = field(default_factory=set)
+    full_scans: set = field(default_factory=set)
+    sorts: bool = False
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    statements = getattr(_capture, 'statements', None)
+    if statements is not None and not executemany and statement.lstrip().upper().startswith('SELECT'):
+        statements.append((statement, parameters))
+
+
+def _touches_checked_table(statement):
+    return any(re.search(rf'\bFROM {table}\b|\bJOIN {table}\b', statement) for table in CHECKED_TABLES)
+
+
+def explain_sqlite(conn, statement, parameters) -> StatementPlan:
+    rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+    result = StatementPlan(statement, [row[-1] for row in rows])
+    for detail in result.plan:
+        match = re.search(r'USING (?:COVERING )?INDEX (\w+)', detail)
+        if match:
+            result.indexes.add(match.group(1))
+        scan = re.match(r'SCAN (\w+?)(?:_\d+)?(?: |$)', detail)
+        if scan and scan.group(1) in CHECKED_TABLES:
+            result.full_scans.add(scan.group(1))
+        if 'USE TEMP B-TREE FOR ORDER BY' in detail:
+            result.sorts = True
+    return result
+
+
+def explain_postgresql(conn, statement, parameters) -> StatementPlan:
+    conn.exec_driver_sql('SET enable_seqscan = off')
+    plan = conn.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {statement}', parameters).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    result = StatementPlan(statement, [])
+
+    def walk(node, depth=0):
+        label = node['Node Type']
+        if node.get('Index Name'):
+            result.indexes.add(node['Index Name'])
+            label += f" using {node['Index Name']}"
+        if node.get('Relation Name'):
+            label += f" on {node['Relation Name']}"
+            if node['Node Type'] == 'Seq Scan' and node['Relation Name'] in CHECKED_TABLES:
+                result.full_scans.add(node['Relation Name'])
+        if node['Node Type'] == 'Sort':
+            result.sorts = True
+        result.plan.append('  ' * depth + label)
+        for child in node.get('Plans', []):
+            walk(child, depth + 1)
+
+    walk(plan[0]['Plan'])
+    return result
+
+
+def run_check(ctx, check: ExplainCheck):
+    client, method, path, kwargs = check.request(ctx, 20)
+
+    _capture.statements = []
+    try:
+        response = client.open(path, method=method, **kwargs)
+        response.get_data()  # streamed responses run their queries while being read
+    finally:
+        statements, _capture.statements = _capture.statements, None
+
+    failures = []
+    if response.status_code != check.expected_status:
+        failures.append(f'status {response.status_code}, expected {check.expected_status}')
+
+    from app import db
+    plans = []
+    with ctx.env.app.app_context(), db.engine.connect() as conn:
+        explain = explain_postgresql if conn.dialect.name == 'postgresql' else explain_sqlite
+        for statement, parameters in statements:
+            if _touches_checked_table(statement):
+                plans.append(explain(conn, statement, parameters))
+
+    used = set().union(*(plan.indexes for plan in plans)) if plans else set()
+    for index in check.indexes:
+        if index not in used:
+            failures.append(f'{index} not used')
+    for plan in plans:
+        for table in sorted(plan.full_scans - set(check.full_scans_allowed)):
+            failures.append(f'full scan of {table}')
+        if plan.sorts and 'LIMIT' in plan.statement and 'GROUP BY' not in plan.statement:
+            failures.append('paginated ORDER BY sorts instead of walking an index')
+
+    return {'check': check, 'plans': plans, 'failures': sorted(set(failures))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that the hot queries use their indexes')
+    parser.add_argument('--database-url', default=None, help='Run against this database instead of a temp SQLite file')
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--stubs-per-user', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--verbose', action='store_true', help='Print the plan of every statement')
+    args = parser.parse_args()
+
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    results = []
+    with BenchmarkEnvironment(seed=args.seed, database_url=args.database_url) as env:
+        env.app.extensions['response_cache'].enabled = False
+        summary = env.seed(users=args.users, stubs_per_user=args.stubs_per_user, listing_ratio=0.5)
+        with env.app.app_context():
+            from app import db
+            with db.engine.begin() as conn:
+                conn.exec_driver_sql('ANALYZE')
+        ctx = BudgetContext(env, summary)
+        for check in CHECKS:
+            results.append(run_check(ctx, check))
+
+    print(f"\n🔎 EXPLAIN CHECKS ({len(results)} routes)")
+    failed = []
+    for result in results:
+        check = result['check']
+        marker = '❌' if result['failures'] else '✅'
+        used = sorted(set().union(*(plan.indexes for plan in result['plans']))) if result['plans'] else []
+        print(f"{marker} {check.name:<50} {', '.join(used) or '-'}")
+        for failure in result['failures']:
+            print(f"     {failure}")
+        if args.verbose:
+            for plan in result['plans']:
+                print(f"     {' '.join(plan.statement.split())[:160]}")
+                for line in plan.plan:
+                    print(f"        {line}")
+        if result['failures']:
+            failed.append(check.name)
+
+    if failed:
+        print(f"\n❌ {len(failed)} route(s) not using their indexes")
+        sys.exit(1)
+    print("\n✅ All hot queries use their indexes")
+
+
+if __name__ == '__main__':
+    main()
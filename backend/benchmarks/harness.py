@@ -0,0 +1,248 @@
+"""
+Shared setup for the offline benchmarks: a throwaway database, the fake model
+provider, the local Stripe mock and deterministic seed data.
+"""
+
+import io
+import os
+import random
+import shutil
+import tempfile
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+BENCH_PASSWORD = 'benchpass123'
+BENCH_WEBHOOK_SECRET = 'whsec_benchmark'
+
+EVENTS = [
+    'FC Barcelona vs Real Madrid', 'Taylor Swift The Eras Tour', 'Coldplay Music of the Spheres',
+    'Lakers vs Celtics', 'Yankees vs Red Sox', 'Beyonce Renaissance Tour', 'Super Bowl LVIII',
+    'Manchester United vs Liverpool', 'Ed Sheeran Mathematics Tour', 'NBA Finals Game 7',
+    'Metallica M72 World Tour', 'Wimbledon Centre Court', 'Hamilton on Broadway', 'U2 at Sphere',
+    'Dallas Mavericks vs Washington Wizards', 'World Series Game 1',
+]
+
+VENUES = [
+    'Camp Nou', 'MetLife Stadium', 'Wembley Stadium', 'Madison Square Garden', 'Fenway Park',
+    'Crypto.com Arena', 'Allegiant Stadium', 'Old Trafford', 'Anfield', 'Sphere',
+    'American Airlines Center', 'Richard Rodgers Theatre', 'Yankee Stadium', 'SoFi Stadium',
+]
+
+
+@dataclass
+class SeedSummary:
+    user_ids: List[int] = field(default_factory=list)
+    emails: List[str] = field(default_factory=list)
+    stub_ids: List[int] = field(default_factory=list)
+    listing_ids: List[int] = field(default_factory=list)
+    listing_sellers: dict = field(default_factory=dict)
+    search_terms: List[str] = field(default_factory=list)
+
+
+class BenchmarkEnvironment:
+    """
+    Owns the temporary database, Stripe mock and Flask app for one benchmark run.
+
+    Usage:
+        with BenchmarkEnvironment(seed=42) as env:
+            summary = env.seed(users=20, stubs_per_user=10)
+            client = env.login_client(summary.emails[0])
+    """
+
+    def __init__(self, seed: int = 42, stripe_latency: str = 'fixed:0', model_latency: str = 'fixed:0',
+                 database_url: Optional[str] = None, stripe_failure_rate: float = 0.0,
+                 storage: str = 'filesystem'):
+        self.seed_value = seed
+        self.storage = storage
+        self.stripe_latency = stripe_latency
+        self.model_latency = model_latency
+        self.stripe_failure_rate = stripe_failure_rate
+        self.tempdir = tempfile.mkdtemp(prefix='stubcollect_bench_')
+        self.database_url = database_url or f"sqlite:///{os.path.join(self.tempdir, 'bench.db')}"
+        self.upload_folder = os.path.join(self.tempdir, 'uploads')
+        self.stripe_mock = None
+        self.s3_mock = None
+        self.app = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def start(self):
+        # Everything below reads the environment when the app and services are created
+        os.environ['DATABASE_URL'] = self.database_url
+        os.environ['MODEL_PROVIDER'] = 'fake'
+        os.environ['FAKE_MODEL_LATENCY'] = self.model_latency
+        os.environ['FAKE_MODEL_SEED'] = str(self.seed_value)
+        os.environ.setdefault('GEMINI_API_KEY', 'benchmark')
+        os.environ['STRIPE_SECRET_KEY'] = 'sk_test_benchmark'
+        os.environ['STRIPE_WEBHOOK_SECRET'] = BENCH_WEBHOOK_SECRET
+        os.environ['STRIPE_WEBHOOK_IP_CHECK'] = 'false'
+
+        from benchmarks.stripe_mock import StripeMock
+        self.stripe_mock = StripeMock(
+            latency=self.stripe_latency,
+            failure_rate=self.stripe_failure_rate,
+            seed=self.seed_value,
+            webhook_secret=BENCH_WEBHOOK_SECRET
+        )
+        os.environ['STRIPE_API_BASE'] = self.stripe_mock.start()
+
+        from app import create_app
+        from app.services.model_provider import set_model_provider
+        set_model_provider(None)
+
+        storage_config = {}
+        if self.storage == 's3':
+            from benchmarks.s3_mock import S3Mock
+            self.s3_mock = S3Mock(bucket='stubcollect-bench', seed=self.seed_value)
+            self.s3_mock.start()
+            storage_config = {'STORAGE_BACKEND': 's3', **self.s3_mock.storage_config()}
+
+        self.app = create_app(benchmark_config(self.database_url, self.upload_folder, **storage_config))
+        return self.app
+
+    def stop(self):
+        if self.stripe_mock:
+            self.stripe_mock.stop()
+        if self.s3_mock:
+            self.s3_mock.stop()
+        if self.app:
+            from app import db
+            with self.app.app_context():
+                db.session.remove()
+                db.engine.dispose()
+        shutil.rmtree(self.tempdir, ignore_errors=True)
+
+    def seed(self, users: int = 20, stubs_per_user: int = 10, listing_ratio: float = 0.5) -> SeedSummary:
+        """Insert deterministic users (all onboarded sellers), stubs and active listings"""
+        from werkzeug.security import generate_password_hash
+        from app import db
+        from app.models.user import User
+        from app.models.stub import Stub
+        from app.models.stub_listing import StubListing
+
+        rng = random.Random(self.seed_value)
+        summary = SeedSummary()
+        password_hash = generate_password_hash(BENCH_PASSWORD)  # Hash once; it is deliberately slow
+
+        with self.app.app_context():
+            user_rows = []
+            for index in range(users):
+                user_rows.append(User(
+                    username=f'bench_user_{index}',
+                    email=f'bench_user_{index}@example.com',
+                    password_hash=password_hash,
+                    stripe_account_id=f'acct_bench{index:06d}',
+                    stripe_account_status='active',
+                    stripe_onboarding_completed=True,
+                    stripe_capabilities_enabled=True,
+                    is_seller=True,
+                    seller_verification_level='verified'
+                ))
+            db.session.add_all(user_rows)
+            db.session.flush()
+
+            base_date = datetime(2015, 1, 1)
+            stub_rows = []
+            for user in user_rows:
+                for _ in range(stubs_per_user):
+                    event = rng.choice(EVENTS)
+                    venue = rng.choice(VENUES)
+                    event_date = base_date + timedelta(days=rng.randint(0, 3650))
+                    stub_rows.append(Stub(
+                        user_id=user.id,
+                        title=f'{event} {event_date.year}',
+                        image_path=f'{user.id}/seed.jpg',
+                        raw_text='Seeded by benchmarks.harness',
+                        event_name=event,
+                        event_date=event_date,
+                        venue_name=venue,
+                        ticket_price=round(rng.uniform(20, 400), 2),
+                        currency='USD',
+                        seat_info=f'Section {rng.randint(100, 350)}, Row {rng.randint(1, 40)}',
+                        status='processed'
+                    ))
+            db.session.add_all(stub_rows)
+            db.session.flush()
+
+            listing_rows = []
+            for stub in stub_rows:
+                if rng.random() < listing_ratio:
+                    listing_rows.append(StubListing(
+                        stub_id=stub.id,
+                        seller_id=stub.user_id,
+                        asking_price=round(rng.uniform(10, 500), 2),
+                        currency='USD',
+                        description='Seeded listing',
+                        status='active',
+                        payment_required=True
+                    ))
+            db.session.add_all(listing_rows)
+            db.session.commit()
+
+            summary.user_ids = [user.id for user in user_rows]
+            summary.emails = [user.email for user in user_rows]
+            summary.stub_ids = [stub.id for stub in stub_rows]
+            summary.listing_ids = [listing.id for listing in listing_rows]
+            summary.listing_sellers = {listing.id: listing.seller_id for listing in listing_rows}
+            summary.search_terms = sorted({word for event in EVENTS for word in event.split() if len(word) > 4})
+
+            # Canonical events and venues, as `flask canonicalize-stubs` would assign them
+            from app.services.entity_normalizer import canonicalize_stubs
+            canonicalize_stubs()
+
+        return summary
+
+    def login_client(self, email: str):
+        """Return a test client with a logged-in session"""
+        client = self.app.test_client()
+        response = client.post('/auth/login', json={'email': email, 'password': BENCH_PASSWORD})
+        if response.status_code != 200:
+            raise RuntimeError(f"Benchmark login failed for {email}: {response.status_code}")
+        return client
+
+
+def benchmark_config(database_url: str, upload_folder: str, **overrides):
+    """Config subclass for in-process benchmarks (no rate limits, plain HTTP cookies)"""
+    from config import Config
+
+    class BenchmarkConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        STUB_UPLOAD_FOLDER = upload_folder
+        RATELIMIT_ENABLED = False
+        SESSION_COOKIE_DOMAIN = None
+        SESSION_COOKIE_SECURE = False
+        SESSION_COOKIE_SAMESITE = 'Lax'
+        TESTING = True
+
+    for name, value in overrides.items():
+        setattr(BenchmarkConfig, name, value)
+    return BenchmarkConfig
+
+
+def sample_jpeg_bytes(size=(400, 240)) -> bytes:
+    """A small generated JPEG for upload scenarios"""
+    from PIL import Image, ImageDraw
+
+    image = Image.new('RGB', size, color=(255, 255, 255))
+    ImageDraw.Draw(image).text((10, 10), 'BENCHMARK STUB', fill=(0, 0, 0))
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=80)
+    return buffer.getvalue()
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Linear-interpolated percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    rank = (len(sorted_values) - 1) * pct / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (rank - lower)
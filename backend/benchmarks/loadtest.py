@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+End-to-end Load Test
+Seeds a throwaway database and drives a realistic request mix through the Flask app
+in-process (fake model provider, local Stripe mock, no network), then reports
+p50/p95/p99 latency and throughput per endpoint.
+
+Examples:
+    python -m benchmarks.loadtest --users 50 --stubs-per-user 20 --requests 5000 --concurrency 8
+    python -m benchmarks.loadtest --save-baseline benchmarks/baselines/loadtest.json
+    python -m benchmarks.loadtest --compare benchmarks/baselines/loadtest.json --tolerance 0.25
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from benchmarks.harness import BenchmarkEnvironment, percentile, sample_jpeg_bytes
+
+DEFAULT_MIX = 'browse=40,search=20,listing=15,seller=10,my_stubs=5,upload=3,checkout=4,webhook=3'
+
+
+class LoadTestContext:
+    """State shared by all workers during a run"""
+
+    def __init__(self, env, summary, seed):
+        self.env = env
+        self.summary = summary
+        self.image_bytes = sample_jpeg_bytes()
+        self.pending_intents = []
+        self.available_listings = list(summary.listing_ids)
+        self.lock = threading.Lock()
+        self.rng = random.Random(seed)
+
+    def take_listing(self, buyer_id):
+        """Pop an active listing the buyer does not own (None when sold out)"""
+        with self.lock:
+            for index, listing_id in enumerate(self.available_listings):
+                if self.summary.listing_sellers[listing_id] != buyer_id:
+                    return self.available_listings.pop(index)
+        return None
+
+
+# ----------------------------------------------------------------------
+# Scenarios: each returns (endpoint label, response or None when skipped)
+# ----------------------------------------------------------------------
+
+def scenario_browse(client, ctx, rng, user_id):
+    page = rng.randint(1, 5)
+    return 'GET /api/marketplace/listings', client.get(f'/api/marketplace/listings?page={page}&per_page=20')
+
+
+def scenario_search(client, ctx, rng, user_id):
+    term = rng.choice(ctx.summary.search_terms)
+    max_price = rng.choice([100, 250, 500])
+    return 'GET /api/marketplace/listings?title', client.get(
+        f'/api/marketplace/listings?title={term}&max_price={max_price}&per_page=20'
+    )
+
+
+def scenario_listing(client, ctx, rng, user_id):
+    listing_id = rng.choice(ctx.summary.listing_ids)
+    return 'GET /api/marketplace/listings/<id>', client.get(f'/api/marketplace/listings/{listing_id}')
+
+
+def scenario_seller(client, ctx, rng, user_id):
+    seller_id = rng.choice(ctx.summary.user_ids)
+    view = rng.choice(['', '/listings', '/stubs'])
+    return f'GET /api/marketplace/sellers/<id>{view}', client.get(f'/api/marketplace/sellers/{seller_id}{view}')
+
+
+def scenario_my_stubs(client, ctx, rng, user_id):
+    return 'GET /api/stubs', client.get('/api/stubs?per_page=20')
+
+
+def scenario_upload(client, ctx, rng, user_id):
+    import io
+    data = {'title': 'Load test upload', 'image': (io.BytesIO(ctx.image_bytes), 'loadtest.jpg')}
+    return 'POST /api/stubs/upload', client.post('/api/stubs/upload', data=data, content_type='multipart/form-data')
+
+
+def scenario_checkout(client, ctx, rng, user_id):
+    listing_id = ctx.take_listing(user_id)
+    if listing_id is None:
+        return 'POST /api/payments/create-payment-intent', None
+
+    response = client.post('/api/payments/create-payment-intent', json={'listing_id': listing_id})
+    if response.status_code == 200:
+        with ctx.lock:
+            ctx.pending_intents.append(response.get_json()['payment_intent_id'])
+    return 'POST /api/payments/create-payment-intent', response
+
+
+def scenario_webhook(client, ctx, rng, user_id):
+    with ctx.lock:
+        intent_id = ctx.pending_intents.pop(0) if ctx.pending_intents else None
+    if intent_id is None:
+        return 'POST /api/payments/webhook', None
+
+    event = ctx.env.stripe_mock.succeed_payment_intent(intent_id)
+    payload, headers = ctx.env.stripe_mock.webhook_request(event)
+    return 'POST /api/payments/webhook', client.post('/api/payments/webhook', data=payload, headers=headers)
+
+
+SCENARIOS = {
+    'browse': scenario_browse,
+    'search': scenario_search,
+    'listing': scenario_listing,
+    'seller': scenario_seller,
+    'my_stubs': scenario_my_stubs,
+    'upload': scenario_upload,
+    'checkout': scenario_checkout,
+    'webhook': scenario_webhook,
+}
+
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario '{name}'. Options: {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def run_load_test(users=20, stubs_per_user=10, listing_ratio=0.5, requests=2000, concurrency=4,
+                  mix=DEFAULT_MIX, seed=42, stripe_latency='fixed:0', model_latency='fixed:0',
+                  storage='filesystem'):
+    """Run one load test and return the report dict"""
+    mix = parse_mix(mix) if isinstance(mix, str) else mix
+
+    with BenchmarkEnvironment(seed=seed, stripe_latency=stripe_latency, model_latency=model_latency,
+                              storage=storage) as env:
+        summary = env.seed(users=users, stubs_per_user=stubs_per_user, listing_ratio=listing_ratio)
+        ctx = LoadTestContext(env, summary, seed)
+
+        # The schedule is fixed up front so every run issues the same sequence of operations
+        names = list(mix)
+        weights = [mix[name] for name in names]
+        schedule = ctx.rng.choices(names, weights=weights, k=requests)
+        worker_users = [ctx.rng.randrange(len(summary.user_ids)) for _ in range(concurrency)]
+
+        samples = defaultdict(list)
+        errors = defaultdict(int)
+        skipped = defaultdict(int)
+        samples_lock = threading.Lock()
+
+        def worker(worker_index):
+            user_index = worker_users[worker_index]
+            user_id = summary.user_ids[user_index]
+            client = env.login_client(summary.emails[user_index])
+            rng = random.Random(seed * 1000 + worker_index)
+
+            for position in range(worker_index, len(schedule), concurrency):
+                started = time.perf_counter()
+                label, response = SCENARIOS[schedule[position]](client, ctx, rng, user_id)
+                elapsed_ms = (time.perf_counter() - started) * 1000
+
+                with samples_lock:
+                    if response is None:
+                        skipped[label] += 1
+                        continue
+                    samples[label].append(elapsed_ms)
+                    if response.status_code >= 400:
+                        errors[label] += 1
+
+        wall_started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(worker, range(concurrency)))
+        wall_seconds = time.perf_counter() - wall_started
+
+    endpoints = {}
+    for label in sorted(samples):
+        values = sorted(samples[label])
+        endpoints[label] = {
+            'count': len(values),
+            'errors': errors[label],
+            'skipped': skipped[label],
+            'mean_ms': round(sum(values) / len(values), 3),
+            'p50_ms': round(percentile(values, 50), 3),
+            'p95_ms': round(percentile(values, 95), 3),
+            'p99_ms': round(percentile(values, 99), 3),
+            'max_ms': round(values[-1], 3),
+            'throughput_rps': round(len(values) / wall_seconds, 2),
+        }
+
+    total = sum(len(values) for values in samples.values())
+    return {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': seed,
+            'users': users,
+            'stubs_per_user': stubs_per_user,
+            'listing_ratio': listing_ratio,
+            'requests': requests,
+            'concurrency': concurrency,
+            'mix': mix,
+            'stripe_latency': stripe_latency,
+            'model_latency': model_latency,
+            'storage': storage,
+        },
+        'totals': {
+            'requests': total,
+            'errors': sum(errors.values()),
+            'wall_seconds': round(wall_seconds, 3),
+            'throughput_rps': round(total / wall_seconds, 2) if wall_seconds else 0,
+        },
+        'endpoints': endpoints,
+    }
+
+
+def compare_to_baseline(report, baseline, tolerance):
+    """Return a list of regression messages (p95 slower than tolerance or more errors)"""
+    regressions = []
+    for label, current in report['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(label)
+        if not previous:
+            continue
+        if previous['p95_ms'] and current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{label}: p95 {previous['p95_ms']:.1f}ms -> {current['p95_ms']:.1f}ms")
+        if current['errors'] > previous['errors']:
+            regressions.append(f"{label}: errors {previous['errors']} -> {current['errors']}")
+    return regressions
+
+
+def print_report(report):
+    print(f"\n📊 LOAD TEST REPORT ({report['totals']['requests']} requests, "
+          f"{report['meta']['concurrency']} workers, {report['totals']['wall_seconds']}s)")
+    header = f"{'endpoint':<52} {'count':>6} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rps':>9}"
+    print(header)
+    print('-' * len(header))
+    for label, stats in report['endpoints'].items():
+        print(f"{label:<52} {stats['count']:>6} {stats['errors']:>5} {stats['p50_ms']:>9.1f} "
+              f"{stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f} {stats['throughput_rps']:>9.1f}")
+    print(f"\nTotal throughput: {report['totals']['throughput_rps']} req/s, errors: {report['totals']['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline end-to-end load test for the Flask API')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--stubs-per-user', type=int, default=10)
+    parser.add_argument('--listing-ratio', type=float, default=0.5)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Scenario weights (default: {DEFAULT_MIX})')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--stripe-latency', default='fixed:0')
+    parser.add_argument('--model-latency', default='fixed:0')
+    parser.add_argument('--storage', choices=['filesystem', 's3'], default='filesystem',
+                        help='Image storage backend (s3 runs against the local S3 stand-in)')
+    parser.add_argument('--output', help='Write the full JSON report to this path')
+    parser.add_argument('--save-baseline', help='Save this run as the JSON baseline at this path')
+    parser.add_argument('--compare', help='Compare against a saved JSON baseline and exit 1 on regression')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed p95 slowdown vs baseline (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    report = run_load_test(
+        users=args.users,
+        stubs_per_user=args.stubs_per_user,
+        listing_ratio=args.listing_ratio,
+        requests=args.requests,
+        concurrency=args.concurrency,
+        mix=args.mix,
+        seed=args.seed,
+        stripe_latency=args.stripe_latency,
+        model_latency=args.model_latency,
+        storage=args.storage
+    )
+    print_report(report)
+
+    for path in filter(None, [args.output, args.save_baseline]):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report saved to {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        if regressions:
+            print("\n❌ Regressions against baseline:")
+            for message in regressions:
+                print(f"   {message}")
+            sys.exit(1)
+        print("\n✅ No regressions against baseline")
+
+
+if __name__ == '__main__':
+    main()
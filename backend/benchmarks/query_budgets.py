@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Query Budget Checks
+Runs every stubs / marketplace / payments route against a seeded database and
+fails when a route issues more SQL queries or takes longer than its budget.
+List endpoints are also run at two page sizes: a query count that grows with
+the page size is an N+1 and fails regardless of the budget.
+
+Examples:
+    python -m benchmarks.query_budgets
+    python -m benchmarks.query_budgets --only marketplace --verbose
+    python -m benchmarks.query_budgets --report      # print counts without asserting
+"""
+
+import argparse
+import io
+import statistics
+import sys
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from benchmarks.harness import EVENTS, VENUES, BenchmarkEnvironment, sample_jpeg_bytes
+
+
+@dataclass
+class QueryBudget:
+    blueprint: str
+    name: str
+    max_queries: int
+    max_ms: float
+    request: Callable  # (ctx, per_page) -> (client, method, path, kwargs)
+    expected_status: int = 200
+    paginated: bool = False
+    repeat: bool = True  # False for routes that consume their fixture
+
+
+class BudgetContext:
+    """Logged-in clients and fixture ids shared by the budget requests"""
+
+    def __init__(self, env, summary):
+        self.env = env
+        self.summary = summary
+        self.seller_id = summary.user_ids[0]
+        self.buyer_id = summary.user_ids[1]
+        self.seller = env.login_client(summary.emails[0])
+        self.buyer = env.login_client(summary.emails[1])
+        self.image_bytes = sample_jpeg_bytes()
+
+        from app.models.stub import Stub
+        from app.models.stub_listing import StubListing
+        with env.app.app_context():
+            self.seller_stub_ids = [
+                stub.id for stub in Stub.query.filter_by(user_id=self.seller_id).order_by(Stub.id).all()
+                if not stub.listings
+            ]
+            self.seller_listing_ids = [
+                listing.id for listing in
+                StubListing.query.filter_by(seller_id=self.seller_id, status='active').order_by(StubListing.id).all()
+            ]
+
+        self.payment_intent_id = None
+        self.order_id = None
+
+    def unlisted_stub(self):
+        return self.seller_stub_ids.pop()
+
+    def listing_for_sale(self):
+        return self.seller_listing_ids.pop()
+
+    def checkout(self):
+        """Buy one of the seller's listings and complete the payment via webhook"""
+        listing_id = self.listing_for_sale()
+        response = self.buyer.post('/api/payments/create-payment-intent', json={'listing_id': listing_id})
+        self.payment_intent_id = response.get_json()['payment_intent_id']
+        self.order_id = response.get_json()['order_id']
+        event = self.env.stripe_mock.succeed_payment_intent(self.payment_intent_id)
+        payload, headers = self.env.stripe_mock.webhook_request(event)
+        self.buyer.post('/api/payments/webhook', data=payload, headers=headers)
+
+
+# ----------------------------------------------------------------------
+# Request builders: (ctx, per_page) -> (client, method, path, kwargs)
+# ----------------------------------------------------------------------
+
+def stub_upload(ctx, per_page):
+    data = {'title': 'Budget upload', 'image': (io.BytesIO(ctx.image_bytes), 'budget.jpg')}
+    return ctx.seller, 'POST', '/api/stubs/upload', {'data': data, 'content_type': 'multipart/form-data'}
+
+
+def stub_import(ctx, per_page):
+    # Seeded event / venue names, so the import resolves them without creating entities
+    rows = ''.join(f'Budget import {i},{EVENTS[i % len(EVENTS)]},{VENUES[i % len(VENUES)]},2024-06-01\n'
+                   for i in range(per_page))
+    data = {'file': (io.BytesIO(f'title,event_name,venue_name,event_date\n{rows}'.encode()), 'stubs.csv')}
+    return ctx.seller, 'POST', '/api/stubs/import', {'data': data, 'content_type': 'multipart/form-data'}
+
+
+def stub_update(ctx, per_page):
+    return ctx.seller, 'PUT', f'/api/stubs/{ctx.seller_stub_ids[0]}', {'json': {'title': 'Updated by budget check'}}
+
+
+def stub_delete(ctx, per_page):
+    return ctx.seller, 'DELETE', f'/api/stubs/{ctx.unlisted_stub()}', {}
+
+
+def stub_list(ctx, per_page):
+    return ctx.seller, 'GET', f'/api/stubs?per_page={per_page}', {}
+
+
+def stub_detail(ctx, per_page):
+    return ctx.seller, 'GET', f'/api/stubs/{ctx.seller_stub_ids[0]}', {}
+
+
+def listing_create(ctx, per_page):
+    return ctx.seller, 'POST', '/api/marketplace/list', {
+        'json': {'stub_id': ctx.unlisted_stub(), 'asking_price': 42.5, 'currency': 'USD', 'description': 'Budget listing'}
+    }
+
+
+def listing_browse(ctx, per_page):
+    return ctx.buyer, 'GET', f'/api/marketplace/listings?per_page={per_page}', {}
+
+
+def listing_search(ctx, per_page):
+    return ctx.buyer, 'GET', f'/api/marketplace/listings?title=Tour&max_price=400&per_page={per_page}', {}
+
+
+def listing_facets(ctx, per_page):
+    return ctx.buyer, 'GET', '/api/marketplace/listings', {'query_string': {'facets': 'true', 'per_page': per_page}}
+
+
+def listing_by_event(ctx, per_page):
+    # A spelling variant of a seeded event; resolves to the canonical event id
+    event = f'The {EVENTS[0].upper()}!'
+    return ctx.buyer, 'GET', '/api/marketplace/listings', {'query_string': {'event': event, 'per_page': per_page}}
+
+
+def listing_detail(ctx, per_page):
+    return ctx.buyer, 'GET', f'/api/marketplace/listings/{ctx.seller_listing_ids[0]}', {}
+
+
+def my_listings(ctx, per_page):
+    return ctx.seller, 'GET', '/api/marketplace/my-listings', {}
+
+
+def listing_update(ctx, per_page):
+    return ctx.seller, 'PUT', f'/api/marketplace/listings/{ctx.seller_listing_ids[0]}', {'json': {'asking_price': 55}}
+
+
+def listing_cancel(ctx, per_page):
+    return ctx.seller, 'DELETE', f'/api/marketplace/listings/{ctx.listing_for_sale()}', {}
+
+
+# Bulk builders send per_page // 2 items, so the N+1 check compares batches of 1 and 10
+def bulk_list(ctx, per_page):
+    listings = [{'stub_id': ctx.unlisted_stub(), 'asking_price': 40 + i, 'currency': 'USD'} for i in range(per_page // 2)]
+    return ctx.seller, 'POST', '/api/marketplace/bulk/list', {'json': {'listings': listings}}
+
+
+def bulk_reprice(ctx, per_page):
+    # A price that differs between the two batch sizes, so both runs write
+    listings = [{'listing_id': listing_id, 'asking_price': 50 + per_page} for listing_id in ctx.seller_listing_ids[:per_page // 2]]
+    return ctx.seller, 'PUT', '/api/marketplace/bulk/reprice', {'json': {'listings': listings}}
+
+
+def bulk_cancel(ctx, per_page):
+    listing_ids = [ctx.listing_for_sale() for _ in range(per_page // 2)]
+    return ctx.seller, 'POST', '/api/marketplace/bulk/cancel', {'json': {'listing_ids': listing_ids}}
+
+
+def export_stubs(ctx, per_page):
+    return ctx.seller, 'GET', '/api/exports/stubs', {}
+
+
+def export_sales(ctx, per_page):
+    return ctx.seller, 'GET', '/api/exports/sales', {'query_string': {'format': 'ndjson'}}
+
+
+def seller_profile(ctx, per_page):
+    return ctx.buyer, 'GET', f'/api/marketplace/sellers/{ctx.seller_id}', {}
+
+
+def seller_listings(ctx, per_page):
+    return ctx.buyer, 'GET', f'/api/marketplace/sellers/{ctx.seller_id}/listings?per_page={per_page}', {}
+
+
+def seller_stubs(ctx, per_page):
+    return ctx.buyer, 'GET', f'/api/marketplace/sellers/{ctx.seller_id}/stubs', {}
+
+
+def price_stats_lookup(ctx, per_page):
+    return ctx.buyer, 'GET', '/api/marketplace/price-stats', {'query_string': {'event': EVENTS[0], 'venue': VENUES[0]}}
+
+
+def typeahead(ctx, per_page):
+    return ctx.buyer, 'GET', '/api/marketplace/typeahead', {'query_string': {'q': EVENTS[0].split()[-1][:4]}}
+
+
+def payment_compatibility(ctx, per_page):
+    return ctx.seller, 'GET', '/api/marketplace/payment-compatibility', {}
+
+
+def my_orders(ctx, per_page):
+    return ctx.buyer, 'GET', '/api/marketplace/my-orders', {}
+
+
+def onboard_status(ctx, per_page):
+    return ctx.seller, 'GET', '/api/payments/connect/onboard-status', {}
+
+
+def create_payment_intent(ctx, per_page):
+    return ctx.buyer, 'POST', '/api/payments/create-payment-intent', {'json': {'listing_id': ctx.listing_for_sale()}}
+
+
+def payment_webhook(ctx, per_page):
+    listing_id = ctx.listing_for_sale()
+    response = ctx.buyer.post('/api/payments/create-payment-intent', json={'listing_id': listing_id})
+    event = ctx.env.stripe_mock.succeed_payment_intent(response.get_json()['payment_intent_id'])
+    payload, headers = ctx.env.stripe_mock.webhook_request(event)
+    return ctx.buyer, 'POST', '/api/payments/webhook', {'data': payload, 'headers': headers}
+
+
+def order_complete(ctx, per_page):
+    ctx.checkout()
+    return ctx.buyer, 'POST', f'/api/payments/orders/{ctx.order_id}/complete', {}
+
+
+def order_refund(ctx, per_page):
+    ctx.checkout()
+    return ctx.buyer, 'POST', f'/api/payments/orders/{ctx.order_id}/refund', {'json': {'reason': 'requested_by_customer'}}
+
+
+def seller_dashboard(ctx, per_page):
+    return ctx.seller, 'GET', '/api/payments/connect/dashboard', {}
+
+
+def seller_balance(ctx, per_page):
+    return ctx.seller, 'GET', '/api/payments/connect/balance', {}
+
+
+def account_status(ctx, per_page):
+    return ctx.seller, 'GET', '/api/payments/connect/status', {}
+
+
+def payments_health(ctx, per_page):
+    return ctx.seller, 'GET', '/api/payments/health', {}
+
+
+# Budgets are per request. Time budgets are for the median run against SQLite and
+# the local Stripe mock; they catch order-of-magnitude regressions, not noise.
+BUDGETS = [
+    # stubs
+    QueryBudget('stubs', 'POST /api/stubs/upload', 6, 150, stub_upload, expected_status=201, repeat=False),
+    QueryBudget('stubs', 'POST /api/stubs/import', 2, 150, stub_import, expected_status=201, paginated=True),
+    QueryBudget('stubs', 'PUT /api/stubs/<id>', 5, 50, stub_update),
+    QueryBudget('stubs', 'DELETE /api/stubs/<id>', 4, 50, stub_delete, repeat=False),
+    QueryBudget('stubs', 'GET /api/stubs', 4, 50, stub_list, paginated=True),
+    QueryBudget('stubs', 'GET /api/stubs/<id>', 3, 30, stub_detail),
+
+    # marketplace
+    QueryBudget('marketplace', 'POST /api/marketplace/list', 7, 50, listing_create, expected_status=201, repeat=False),
+    QueryBudget('marketplace', 'GET /api/marketplace/listings', 3, 50, listing_browse, paginated=True),
+    QueryBudget('marketplace', 'GET /api/marketplace/listings?title', 3, 50, listing_search, paginated=True),
+    QueryBudget('marketplace', 'GET /api/marketplace/listings?event', 3, 50, listing_by_event, paginated=True),
+    QueryBudget('marketplace', 'GET /api/marketplace/listings?facets', 4, 75, listing_facets, paginated=True),
+    QueryBudget('marketplace', 'GET /api/marketplace/listings/<id>', 4, 30, listing_detail),
+    QueryBudget('marketplace', 'GET /api/marketplace/my-listings', 4, 75, my_listings),
+    QueryBudget('marketplace', 'PUT /api/marketplace/listings/<id>', 8, 50, listing_update),
+    QueryBudget('marketplace', 'DELETE /api/marketplace/listings/<id>', 8, 50, listing_cancel, repeat=False),
+    # Not N+1 checked: SQLite has no insert sentinel for the ORM to batch INSERT .. RETURNING,
+    # so the 10 listings are 10 INSERTs here (one statement on PostgreSQL)
+    QueryBudget('marketplace', 'POST /api/marketplace/bulk/list', 15, 100, bulk_list, expected_status=201, repeat=False),
+    QueryBudget('marketplace', 'PUT /api/marketplace/bulk/reprice', 5, 100, bulk_reprice, paginated=True),
+    QueryBudget('marketplace', 'POST /api/marketplace/bulk/cancel', 5, 100, bulk_cancel, repeat=False, paginated=True),
+    QueryBudget('marketplace', 'GET /api/marketplace/sellers/<id>', 3, 30, seller_profile),
+    QueryBudget('marketplace', 'GET /api/marketplace/sellers/<id>/listings', 5, 50, seller_listings, paginated=True),
+    QueryBudget('marketplace', 'GET /api/marketplace/sellers/<id>/stubs', 5, 50, seller_stubs),
+    QueryBudget('marketplace', 'GET /api/marketplace/payment-compatibility', 0, 20, payment_compatibility),
+    QueryBudget('marketplace', 'GET /api/marketplace/my-orders', 3, 30, my_orders),
+    QueryBudget('marketplace', 'GET /api/marketplace/price-stats', 2, 30, price_stats_lookup),
+    QueryBudget('marketplace', 'GET /api/marketplace/typeahead', 1, 10, typeahead),
+
+    # direct_charges_payments
+    QueryBudget('direct_charges_payments', 'GET /api/payments/connect/onboard-status', 3, 100, onboard_status),
+    QueryBudget('direct_charges_payments', 'POST /api/payments/create-payment-intent', 17, 200, create_payment_intent, repeat=False),
+    QueryBudget('direct_charges_payments', 'POST /api/payments/webhook', 10, 100, payment_webhook, repeat=False),
+    QueryBudget('direct_charges_payments', 'POST /api/payments/orders/<id>/complete', 8, 75, order_complete, repeat=False),
+    QueryBudget('direct_charges_payments', 'POST /api/payments/orders/<id>/refund', 11, 100, order_refund, repeat=False),
+    QueryBudget('exports', 'GET /api/exports/stubs', 1, 100, export_stubs),
+    QueryBudget('exports', 'GET /api/exports/sales', 1, 100, export_sales),
+    QueryBudget('direct_charges_payments', 'GET /api/payments/connect/dashboard', 1, 75, seller_dashboard),
+    QueryBudget('direct_charges_payments', 'GET /api/payments/connect/balance', 1, 75, seller_balance),
+    QueryBudget('direct_charges_payments', 'GET /api/payments/connect/status', 3, 100, account_status),
+    QueryBudget('direct_charges_payments', 'GET /api/payments/health', 0, 20, payments_health),
+]
+
+
+def measure(ctx, budget, per_page):
+    """Issue one request and return (status_code, query_count, elapsed_ms, statements)"""
+    from app.utils.query_counter import QueryCounter
+
+    client, method, path, kwargs = budget.request(ctx, per_page)
+    with QueryCounter(keep_statements=True) as counter:
+        started = time.perf_counter()
+        response = client.open(path, method=method, **kwargs)
+        response.get_data()  # streamed responses run their queries while being read
+        elapsed_ms = (time.perf_counter() - started) * 1000
+    return response.status_code, counter.count, elapsed_ms, counter.statements
+
+
+def check_budget(ctx, budget, runs, small_page, large_page):
+    """Return a result dict with any failures for one budget"""
+    failures = []
+    counts, timings, statements = [], [], []
+
+    for _ in range(runs if budget.repeat else 1):
+        status, count, elapsed_ms, statements = measure(ctx, budget, large_page)
+        counts.append(count)
+        timings.append(elapsed_ms)
+        if status != budget.expected_status:
+            failures.append(f'status {status}, expected {budget.expected_status}')
+            break
+
+    query_count = max(counts)
+    median_ms = statistics.median(timings)
+
+    if query_count > budget.max_queries:
+        failures.append(f'{query_count} queries > budget {budget.max_queries}')
+    if median_ms > budget.max_ms:
+        failures.append(f'{median_ms:.1f}ms > budget {budget.max_ms:.0f}ms')
+
+    small_count = None
+    if budget.paginated:
+        _, small_count, _, _ = measure(ctx, budget, small_page)
+        if query_count > small_count:
+            failures.append(f'N+1: {small_count} queries at per_page={small_page}, '
+                            f'{query_count} at per_page={large_page}')
+
+    return {
+        'budget': budget,
+        'queries': query_count,
+        'small_page_queries': small_count,
+        'median_ms': median_ms,
+        'failures': failures,
+        'statements': statements,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Assert per-route SQL query and latency budgets')
+    parser.add_argument('--only', choices=sorted({b.blueprint for b in BUDGETS}), help='Check one blueprint')
+    parser.add_argument('--runs', type=int, default=5, help='Runs per read-only route (median time is used)')
+    parser.add_argument('--users', type=int, default=6)
+    parser.add_argument('--stubs-per-user', type=int, default=40)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--report', action='store_true', help='Print measurements without failing')
+    parser.add_argument('--verbose', action='store_true', help='Print the SQL of failing routes')
+    args = parser.parse_args()
+
+    budgets = [b for b in BUDGETS if not args.only or b.blueprint == args.only]
+    results = []
+
+    with BenchmarkEnvironment(seed=args.seed) as env:
+        # Budgets describe what the view itself costs; a response cache hit would hide it
+        env.app.extensions['response_cache'].enabled = False
+        summary = env.seed(users=args.users, stubs_per_user=args.stubs_per_user, listing_ratio=0.5)
+        ctx = BudgetContext(env, summary)
+        for budget in budgets:
+            results.append(check_budget(ctx, budget, args.runs, small_page=2, large_page=20))
+
+    print(f"\n📐 QUERY BUDGETS ({len(results)} routes)")
+    header = f"{'route':<52} {'queries':>9} {'budget':>7} {'median ms':>10} {'budget':>7}"
+    print(header)
+    print('-' * len(header))
+
+    failed = []
+    for result in results:
+        budget = result['budget']
+        marker = '❌' if result['failures'] else '✅'
+        print(f"{marker} {budget.name:<50} {result['queries']:>9} {budget.max_queries:>7} "
+              f"{result['median_ms']:>10.1f} {budget.max_ms:>7.0f}")
+        if result['failures']:
+            failed.append(result)
+
+    if not failed:
+        print("\n✅ All routes within budget")
+        return
+
+    print(f"\n❌ {len(failed)} route(s) over budget:")
+    for result in failed:
+        print(f"   {result['budget'].name}: {'; '.join(result['failures'])}")
+        if args.verbose:
+            for statement in result['statements']:
+                print(f"      {' '.join(statement.split())[:160]}")
+
+    if not args.report:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Local S3 Stand-in
+In-memory, path-style fake of the S3 API calls S3Storage makes, so the object
+storage backend can be exercised offline (MinIO works too; this avoids the
+extra service for benchmarks and smoke checks).
+
+Covers:
+- Buckets: create
+- Objects: put, get (with Range), head, delete
+- Multipart uploads: create, upload part, complete, abort
+- Pre-signed GET URLs: expiry is enforced, signatures are not checked
+
+Usage in-process:
+    with S3Mock(bucket='stubs') as mock:
+        app.config.update(STORAGE_BACKEND='s3', **mock.storage_config())
+
+Usage as a server:
+    python -m benchmarks.s3_mock --port 9000 --bucket stubcollect
+"""
+
+import argparse
+import hashlib
+import re
+import secrets
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+from app.services.model_provider import LatencyDistribution
+
+
+class S3MockError(Exception):
+    """Raised inside a handler to return an S3-shaped XML error"""
+
+    def __init__(self, status: int, code: str, message: str):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.message = message
+
+    def to_xml(self) -> bytes:
+        return (f'<?xml version="1.0" encoding="UTF-8"?>\n<Error><Code>{self.code}</Code>'
+                f'<Message>{escape(self.message)}</Message></Error>').encode('utf-8')
+
+
+def decode_aws_chunked(body: bytes) -> bytes:
+    """Strip aws-chunked framing ('size;chunk-signature=...\\r\\ndata\\r\\n', then trailers)"""
+    data, pos = bytearray(), 0
+    while pos < len(body):
+        line_end = body.index(b'\r\n', pos)
+        size = int(body[pos:line_end].split(b';', 1)[0], 16)
+        if size == 0:
+            break
+        data += body[line_end + 2:line_end + 2 + size]
+        pos = line_end + 2 + size + 2
+    return bytes(data)
+
+
+class S3Mock:
+    """Thread-safe in-memory object store speaking enough S3 for boto3"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, bucket: Optional[str] = 'stubcollect',
+                 latency: str = 'fixed:0', seed: Optional[int] = None):
+        self.host = host
+        self.port = port
+        self.latency = LatencyDistribution(latency, seed)
+
+        self._lock = threading.Lock()
+        self.buckets: Dict[str, Dict[str, Dict]] = {}
+        self.uploads: Dict[str, Dict] = {}
+        self.request_counts: Dict[str, int] = {}
+        if bucket:
+            self.buckets[bucket] = {}
+        self.default_bucket = bucket
+
+        self._server = None
+        self._thread = None
+
+    # ------------------------------------------------------------------
+    # Server lifecycle
+    # ------------------------------------------------------------------
+
+    @property
+    def endpoint_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> str:
+        mock = self
+
+        class Handler(S3MockRequestHandler):
+            s3_mock = mock
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='s3-mock', daemon=True)
+        self._thread.start()
+        return self.endpoint_url
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def storage_config(self) -> Dict[str, str]:
+        """Config values pointing S3Storage at this mock"""
+        return {
+            'STORAGE_S3_BUCKET': self.default_bucket,
+            'STORAGE_S3_ENDPOINT_URL': self.endpoint_url,
+            'STORAGE_S3_REGION': 'us-east-1',
+            'STORAGE_S3_ACCESS_KEY_ID': 'mock',
+            'STORAGE_S3_SECRET_ACCESS_KEY': 'mock',
+        }
+
+    # ------------------------------------------------------------------
+    # Dispatch
+    # ------------------------------------------------------------------
+
+    def dispatch(self, method: str, path: str, query: Dict, headers: Dict, body: bytes) -> Tuple[int, Dict, bytes]:
+        time.sleep(self.latency.sample_seconds())
+
+        bucket, _, key = unquote(path).lstrip('/').partition('/')
+        if key:
+            if method == 'POST' and 'uploads' in query:
+                name = 'create_multipart_upload'
+            elif method == 'PUT' and 'uploadId' in query:
+                name = 'upload_part'
+            elif method == 'POST' and 'uploadId' in query:
+                name = 'complete_multipart_upload'
+            elif method == 'DELETE' and 'uploadId' in query:
+                name = 'abort_multipart_upload'
+            else:
+                name = {'PUT': 'put_object', 'GET': 'get_object', 'HEAD': 'head_object',
+                        'DELETE': 'delete_object'}.get(method)
+        else:
+            name = 'create_bucket' if method == 'PUT' else None
+
+        if name is None:
+            return 405, {}, S3MockError(405, 'MethodNotAllowed', f'{method} {path}').to_xml()
+
+        with self._lock:
+            self.request_counts[name] = self.request_counts.get(name, 0) + 1
+            try:
+                if name != 'create_bucket' and bucket not in self.buckets:
+                    raise S3MockError(404, 'NoSuchBucket', f'Bucket {bucket} does not exist')
+                return getattr(self, name)(bucket, key, query, headers, body)
+            except S3MockError as e:
+                return e.status, {'Content-Type': 'application/xml'}, e.to_xml()
+
+    # ------------------------------------------------------------------
+    # Handlers
+    # ------------------------------------------------------------------
+
+    def create_bucket(self, bucket, key, query, headers, body):
+        self.buckets.setdefault(bucket, {})
+        return 200, {'Location': f'/{bucket}'}, b''
+
+    def _store(self, bucket, key, data, etag, headers):
+        self.buckets[bucket][key] = {
+            'data': data,
+            'etag': etag,
+            'content_type': headers.get('Content-Type', 'binary/octet-stream'),
+            'cache_control': headers.get('Cache-Control'),
+            'last_modified': time.time(),
+        }
+
+    def put_object(self, bucket, key, query, headers, body):
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        self._store(bucket, key, body, etag, headers)
+        return 200, {'ETag': etag}, b''
+
+    def _object(self, bucket, key, query):
+        expires = query.get('X-Amz-Expires')
+        if expires:
+            signed_at = datetime.strptime(query['X-Amz-Date'], '%Y%m%dT%H%M%SZ').replace(tzinfo=timezone.utc)
+            if signed_at.timestamp() + int(expires) < time.time():
+                raise S3MockError(403, 'AccessDenied', 'Request has expired')
+
+        obj = self.buckets[bucket].get(key)
+        if obj is None:
+            raise S3MockError(404, 'NoSuchKey', 'The specified key does not exist.')
+        return obj
+
+    def _object_headers(self, obj):
+        headers = {
+            'ETag': obj['etag'],
+            'Content-Type': obj['content_type'],
+            'Last-Modified': formatdate(obj['last_modified'], usegmt=True),
+            'Accept-Ranges': 'bytes',
+        }
+        if obj['cache_control']:
+            headers['Cache-Control'] = obj['cache_control']
+        return headers
+
+    def get_object(self, bucket, key, query, headers, body):
+        obj = self._object(bucket, key, query)
+        data = obj['data']
+        response_headers = self._object_headers(obj)
+
+        match = re.match(r'bytes=(\d*)-(\d*)$', headers.get('Range', ''))
+        if match and data:
+            start, end = match.groups()
+            if start:
+                start, end = int(start), min(int(end) if end else len(data) - 1, len(data) - 1)
+            else:
+                start, end = max(len(data) - int(end), 0), len(data) - 1
+            response_headers['Content-Range'] = f'bytes {start}-{end}/{len(data)}'
+            return 206, response_headers, data[start:end + 1]
+        return 200, response_headers, data
+
+    def head_object(self, bucket, key, query, headers, body):
+        obj = self._object(bucket, key, query)
+        response_headers = self._object_headers(obj)
+        response_headers['Content-Length'] = str(len(obj['data']))
+        return 200, response_headers, b''
+
+    def delete_object(self, bucket, key, query, headers, body):
+        self.buckets[bucket].pop(key, None)
+        return 204, {}, b''
+
+    def create_multipart_upload(self, bucket, key, query, headers, body):
+        upload_id = secrets.token_hex(16)
+        self.uploads[upload_id] = {'bucket': bucket, 'key': key, 'parts': {}, 'headers': dict(headers)}
+        xml = (f'<?xml version="1.0" encoding="UTF-8"?>\n<InitiateMultipartUploadResult>'
+               f'<Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key><UploadId>{upload_id}</UploadId>'
+               f'</InitiateMultipartUploadResult>')
+        return 200, {'Content-Type': 'application/xml'}, xml.encode('utf-8')
+
+    def _upload(self, query):
+        upload = self.uploads.get(query['uploadId'])
+        if upload is None:
+            raise S3MockError(404, 'NoSuchUpload', 'The specified upload does not exist.')
+        return upload
+
+    def upload_part(self, bucket, key, query, headers, body):
+        upload = self._upload(query)
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        upload['parts'][int(query['partNumber'])] = (etag, body)
+        return 200, {'ETag': etag}, b''
+
+    def complete_multipart_upload(self, bucket, key, query, headers, body):
+        upload = self._upload(query)
+        root = ElementTree.fromstring(body)
+        numbers = [int(el.text) for el in root.iter() if el.tag.endswith('PartNumber')]
+        if not numbers or any(n not in upload['parts'] for n in numbers):
+            raise S3MockError(400, 'InvalidPart', 'One or more of the specified parts could not be found.')
+
+        data = b''.join(upload['parts'][n][1] for n in numbers)
+        digests = b''.join(bytes.fromhex(upload['parts'][n][0].strip('"')) for n in numbers)
+        etag = f'"{hashlib.md5(digests).hexdigest()}-{len(numbers)}"'
+        self._store(bucket, key, data, etag, upload['headers'])
+        del self.uploads[query['uploadId']]
+
+        xml = (f'<?xml version="1.0" encoding="UTF-8"?>\n<CompleteMultipartUploadResult>'
+               f'<Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key><ETag>{escape(etag)}</ETag>'
+               f'</CompleteMultipartUploadResult>')
+        return 200, {'Content-Type': 'application/xml'}, xml.encode('utf-8')
+
+    def abort_multipart_upload(self, bucket, key, query, headers, body):
+        self.uploads.pop(query['uploadId'], None)
+        return 204, {}, b''
+
+
+class S3MockRequestHandler(BaseHTTPRequestHandler):
+    s3_mock: S3Mock = None
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def _read_body(self) -> bytes:
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            body = bytearray()
+            while True:
+                size = int(self.rfile.readline().split(b';', 1)[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                body += self.rfile.read(size)
+                self.rfile.readline()
+            body = bytes(body)
+        else:
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else b''
+
+        if 'aws-chunked' in self.headers.get('Content-Encoding', ''):
+            body = decode_aws_chunked(body)
+        return body
+
+    def _handle(self, method):
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query, keep_blank_values=True).items()}
+        status, headers, data = self.s3_mock.dispatch(method, url.path, query, dict(self.headers), self._read_body())
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if 'Content-Length' not in headers:
+            self.send_header('Content-Length', str(len(data)))
+        self.send_header('x-amz-request-id', secrets.token_hex(8))
+        self.end_headers()
+        if method != 'HEAD':
+            self.wfile.write(data)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_HEAD(self):
+        self._handle('HEAD')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local S3 stand-in server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--bucket', default='stubcollect')
+    parser.add_argument('--latency', default='fixed:0', help='fixed:50, uniform:20:80, normal:50:10 or lognormal:50:0.5 (ms)')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    mock = S3Mock(host=args.host, port=args.port, bucket=args.bucket, latency=args.latency, seed=args.seed)
+    print(f"🪣 S3 mock listening on {mock.start()}")
+    print(f"   Set STORAGE_BACKEND=s3 STORAGE_S3_ENDPOINT_URL={mock.endpoint_url} STORAGE_S3_BUCKET={args.bucket}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        mock.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,581 @@
+#!/usr/bin/env python3
+"""
+Local Stripe Stand-in
+In-process (or localhost) fake of the Stripe API endpoints the payment services use,
+for offline throughput and contention benchmarks of checkout and webhook processing.
+
+Covers:
+- Accounts: create, retrieve, modify, delete, login links, account links
+- PaymentIntents: create, retrieve (with expand), confirm
+- Refunds: create
+- Balance and balance transactions
+- Webhook event construction and Stripe-Signature signing
+
+Usage in-process:
+    with StripeMock(latency='uniform:5:20', failure_rate=0.01) as mock:
+        mock.install()   # points stripe.api_base at the mock
+        ...
+
+Usage as a server (then set STRIPE_API_BASE=http://127.0.0.1:12111):
+    python -m benchmarks.stripe_mock --port 12111 --latency normal:40:10
+"""
+
+import argparse
+import copy
+import hashlib
+import hmac
+import json
+import random
+import re
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from app.services.model_provider import LatencyDistribution
+
+STRIPE_FEE_PERCENT = 0.029
+STRIPE_FEE_FIXED_CENTS = 30
+
+ERROR_TYPES = {
+    400: 'invalid_request_error',
+    402: 'card_error',
+    404: 'invalid_request_error',
+    429: 'rate_limit_error',
+}
+
+
+class StripeMockError(Exception):
+    """Raised inside a handler to return a Stripe-shaped error response"""
+
+    def __init__(self, status: int, message: str, code: Optional[str] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.code = code
+
+    def to_dict(self):
+        return {
+            'error': {
+                'type': ERROR_TYPES.get(self.status, 'api_error'),
+                'message': self.message,
+                'code': self.code,
+            }
+        }
+
+
+def decode_form(pairs) -> Dict:
+    """Decode Stripe's bracketed form encoding (a[b][0]=c) into nested dicts and lists"""
+    root: Dict = {}
+    for key, value in pairs:
+        parts = re.findall(r'[^\[\]]+', key)
+        node = root
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = value
+    return _listify(root)
+
+
+def _listify(node):
+    if not isinstance(node, dict):
+        return node
+    if node and all(key.isdigit() for key in node):
+        return [_listify(node[key]) for key in sorted(node, key=int)]
+    return {key: _listify(value) for key, value in node.items()}
+
+
+def _deep_merge(target: Dict, updates: Dict):
+    for key, value in updates.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _deep_merge(target[key], value)
+        else:
+            target[key] = value
+
+
+def sign_webhook_payload(payload: bytes, secret: str, timestamp: Optional[int] = None) -> str:
+    """Build a Stripe-Signature header value for a webhook payload"""
+    timestamp = timestamp or int(time.time())
+    signed = f"{timestamp}.".encode('utf-8') + payload
+    signature = hmac.new(secret.encode('utf-8'), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+class StripeMock:
+    """Thread-safe in-memory Stripe API with injectable latency and failures"""
+
+    ROUTES = [
+        ('POST', r'/v1/accounts', 'create_account'),
+        ('GET', r'/v1/accounts/(?P<id>[^/]+)', 'retrieve_account'),
+        ('POST', r'/v1/accounts/(?P<id>[^/]+)', 'modify_account'),
+        ('DELETE', r'/v1/accounts/(?P<id>[^/]+)', 'delete_account'),
+        ('POST', r'/v1/accounts/(?P<id>[^/]+)/login_links', 'create_login_link'),
+        ('POST', r'/v1/account_links', 'create_account_link'),
+        ('POST', r'/v1/payment_intents', 'create_payment_intent'),
+        ('GET', r'/v1/payment_intents/(?P<id>[^/]+)', 'retrieve_payment_intent'),
+        ('POST', r'/v1/payment_intents/(?P<id>[^/]+)/confirm', 'confirm_payment_intent'),
+        ('POST', r'/v1/refunds', 'create_refund'),
+        ('GET', r'/v1/balance', 'retrieve_balance'),
+        ('GET', r'/v1/balance_transactions', 'list_balance_transactions'),
+    ]
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        latency: str = 'fixed:0',
+        failure_rate: float = 0.0,
+        failure_status: int = 500,
+        fail_paths: Optional[str] = None,
+        seed: Optional[int] = None,
+        webhook_secret: str = 'whsec_mock',
+        auto_activate_accounts: bool = True
+    ):
+        self.host = host
+        self.port = port
+        self.latency = LatencyDistribution(latency, seed)
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.fail_paths = re.compile(fail_paths) if fail_paths else None
+        self.webhook_secret = webhook_secret
+        self.auto_activate_accounts = auto_activate_accounts
+
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._routes = [(method, re.compile(f'^{pattern}$'), handler) for method, pattern, handler in self.ROUTES]
+
+        self.objects: Dict[str, Dict] = {}
+        self.balances: Dict[str, Dict[str, int]] = {}
+        self.account_transactions: Dict[str, list] = {}
+        self.idempotent_responses: Dict[str, Tuple[int, Dict]] = {}
+        self.request_counts: Dict[str, int] = {}
+
+        self._server = None
+        self._thread = None
+        self._previous_api_base = None
+
+    # ------------------------------------------------------------------
+    # Server lifecycle
+    # ------------------------------------------------------------------
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> str:
+        """Start serving on a background thread and return the base URL"""
+        mock = self
+
+        class Handler(StripeMockRequestHandler):
+            stripe_mock = mock
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='stripe-mock', daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.uninstall()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def install(self):
+        """Point the global stripe SDK configuration at this mock"""
+        import stripe
+        self._previous_api_base = stripe.api_base
+        stripe.api_base = self.base_url
+
+    def uninstall(self):
+        if self._previous_api_base is not None:
+            import stripe
+            stripe.api_base = self._previous_api_base
+            self._previous_api_base = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    # ------------------------------------------------------------------
+    # Dispatch
+    # ------------------------------------------------------------------
+
+    def dispatch(self, method: str, path: str, params: Dict, headers: Dict) -> Tuple[int, Dict]:
+        time.sleep(self.latency.sample_seconds())
+
+        for route_method, pattern, handler_name in self._routes:
+            match = pattern.match(path)
+            if route_method == method and match:
+                break
+        else:
+            return 404, StripeMockError(404, f"Unrecognized request URL ({method}: {path})").to_dict()
+
+        with self._lock:
+            self.request_counts[handler_name] = self.request_counts.get(handler_name, 0) + 1
+
+            idempotency_key = headers.get('Idempotency-Key')
+            if method == 'POST' and idempotency_key and idempotency_key in self.idempotent_responses:
+                return self.idempotent_responses[idempotency_key]
+
+            if self.failure_rate and (not self.fail_paths or self.fail_paths.search(path)):
+                if self._random.random() < self.failure_rate:
+                    error = StripeMockError(self.failure_status, 'Injected failure from StripeMock', 'mock_injected_failure')
+                    return error.status, error.to_dict()
+
+            try:
+                handler = getattr(self, handler_name)
+                body = handler(params, headers, **match.groupdict())
+                response = (200, body)
+            except StripeMockError as e:
+                response = (e.status, e.to_dict())
+
+            if method == 'POST' and idempotency_key:
+                self.idempotent_responses[idempotency_key] = response
+            return response
+
+    # ------------------------------------------------------------------
+    # Object helpers
+    # ------------------------------------------------------------------
+
+    def _new_id(self, prefix: str) -> str:
+        return f"{prefix}_{secrets.token_hex(12)}"
+
+    def _get(self, object_id: str, object_type: str) -> Dict:
+        obj = self.objects.get(object_id)
+        if not obj or obj['object'] != object_type:
+            raise StripeMockError(404, f"No such {object_type}: '{object_id}'", 'resource_missing')
+        return obj
+
+    def _expand(self, obj: Dict, paths) -> Dict:
+        """Return a copy of obj with dotted expand paths replaced by full objects"""
+        result = copy.deepcopy(obj)
+        for path in paths or []:
+            node = result
+            for part in path.split('.'):
+                if not isinstance(node, dict):
+                    break
+                value = node.get(part)
+                if isinstance(value, str) and value in self.objects:
+                    node[part] = copy.deepcopy(self.objects[value])
+                node = node.get(part)
+        return result
+
+    def add_account(self, account_id: Optional[str] = None, active: Optional[bool] = None, **fields) -> Dict:
+        """Create an account directly (e.g. for sellers seeded into the database)"""
+        with self._lock:
+            active = self.auto_activate_accounts if active is None else active
+            account = {
+                'id': account_id or self._new_id('acct'),
+                'object': 'account',
+                'type': 'express',
+                'email': None,
+                'country': 'US',
+                'business_type': 'individual',
+                'charges_enabled': active,
+                'payouts_enabled': active,
+                'details_submitted': active,
+                'capabilities': {
+                    'card_payments': 'active' if active else 'inactive',
+                    'transfers': 'active' if active else 'inactive',
+                },
+                'requirements': {
+                    'currently_due': [] if active else ['individual.verification.document'],
+                    'eventually_due': [],
+                    'past_due': [],
+                    'current_deadline': None,
+                },
+                'settings': {'payouts': {'schedule': {'interval': 'daily', 'delay_days': 2}}},
+                'metadata': {},
+                'created': int(time.time()),
+            }
+            _deep_merge(account, fields)
+            self.objects[account['id']] = account
+            self.balances.setdefault(account['id'], {'available': 0, 'pending': 0})
+            return account
+
+    # ------------------------------------------------------------------
+    # Accounts
+    # ------------------------------------------------------------------
+
+    def create_account(self, params, headers):
+        fields = {key: value for key, value in params.items() if key in ('type', 'email', 'country', 'metadata', 'business_profile')}
+        return self.add_account(**fields)
+
+    def retrieve_account(self, params, headers, id):
+        if id not in self.objects and self.auto_activate_accounts and id.startswith('acct_'):
+            # Unknown seeded sellers are treated as fully onboarded
+            self.add_account(id)
+        return self._get(id, 'account')
+
+    def modify_account(self, params, headers, id):
+        account = self.retrieve_account(params, headers, id)
+        _deep_merge(account, params)
+        return account
+
+    def delete_account(self, params, headers, id):
+        self._get(id, 'account')
+        del self.objects[id]
+        return {'id': id, 'object': 'account', 'deleted': True}
+
+    def create_login_link(self, params, headers, id):
+        self._get(id, 'account')
+        return {'object': 'login_link', 'url': f"{self.base_url}/express/{id}", 'created': int(time.time())}
+
+    def create_account_link(self, params, headers):
+        account_id = params.get('account')
+        self._get(account_id, 'account')
+        return {
+            'object': 'account_link',
+            'url': f"{self.base_url}/setup/{account_id}",
+            'created': int(time.time()),
+            'expires_at': int(time.time()) + 300,
+        }
+
+    # ------------------------------------------------------------------
+    # PaymentIntents and charges
+    # ------------------------------------------------------------------
+
+    def create_payment_intent(self, params, headers):
+        try:
+            amount = int(params['amount'])
+        except (KeyError, ValueError):
+            raise StripeMockError(400, 'Missing required param: amount.', 'parameter_missing')
+
+        if amount < 50:
+            raise StripeMockError(400, 'Amount must be at least $0.50 usd', 'amount_too_small')
+
+        destination = (params.get('transfer_data') or {}).get('destination')
+        if destination:
+            self.retrieve_account({}, headers, destination)
+
+        intent_id = self._new_id('pi')
+        intent = {
+            'id': intent_id,
+            'object': 'payment_intent',
+            'amount': amount,
+            'currency': params.get('currency', 'usd'),
+            'status': 'requires_payment_method',
+            'client_secret': f"{intent_id}_secret_{secrets.token_hex(8)}",
+            'capture_method': params.get('capture_method', 'automatic'),
+            'payment_method_types': params.get('payment_method_types', ['card']),
+            'application_fee_amount': int(params['application_fee_amount']) if params.get('application_fee_amount') else None,
+            'transfer_data': params.get('transfer_data'),
+            'transfer_group': params.get('transfer_group'),
+            'metadata': params.get('metadata', {}),
+            'latest_charge': None,
+            'created': int(time.time()),
+            'livemode': False,
+        }
+        self.objects[intent_id] = intent
+        return intent
+
+    def retrieve_payment_intent(self, params, headers, id):
+        intent = self._get(id, 'payment_intent')
+        return self._expand(intent, params.get('expand'))
+
+    def confirm_payment_intent(self, params, headers, id):
+        intent = self._get(id, 'payment_intent')
+        if intent['status'] == 'succeeded':
+            raise StripeMockError(400, 'This PaymentIntent has already succeeded.', 'payment_intent_unexpected_state')
+        self._succeed(intent)
+        return self._expand(intent, params.get('expand'))
+
+    def _succeed(self, intent: Dict):
+        fee = int(round(intent['amount'] * STRIPE_FEE_PERCENT)) + STRIPE_FEE_FIXED_CENTS
+        transaction = {
+            'id': self._new_id('txn'),
+            'object': 'balance_transaction',
+            'amount': intent['amount'],
+            'currency': intent['currency'],
+            'description': f"Payment for {intent['id']}",
+            'fee': fee,
+            'net': intent['amount'] - fee,
+            'status': 'pending',
+            'type': 'charge',
+            'created': int(time.time()),
+        }
+        charge = {
+            'id': self._new_id('ch'),
+            'object': 'charge',
+            'amount': intent['amount'],
+            'currency': intent['currency'],
+            'paid': True,
+            'status': 'succeeded',
+            'refunded': False,
+            'payment_intent': intent['id'],
+            'balance_transaction': transaction['id'],
+            'created': int(time.time()),
+        }
+        self.objects[transaction['id']] = transaction
+        self.objects[charge['id']] = charge
+
+        intent['status'] = 'succeeded'
+        intent['latest_charge'] = charge['id']
+
+        destination = (intent.get('transfer_data') or {}).get('destination')
+        if destination:
+            seller_amount = intent['amount'] - (intent.get('application_fee_amount') or 0)
+            self.balances.setdefault(destination, {'available': 0, 'pending': 0})['pending'] += seller_amount
+            self.account_transactions.setdefault(destination, []).append(transaction['id'])
+
+    def succeed_payment_intent(self, intent_id: str) -> Dict:
+        """Mark a PaymentIntent as paid (as if the buyer confirmed) and return the webhook event"""
+        with self._lock:
+            intent = self._get(intent_id, 'payment_intent')
+            if intent['status'] != 'succeeded':
+                self._succeed(intent)
+            return self.build_event('payment_intent.succeeded', intent)
+
+    # ------------------------------------------------------------------
+    # Refunds and balances
+    # ------------------------------------------------------------------
+
+    def create_refund(self, params, headers):
+        intent = self._get(params.get('payment_intent', ''), 'payment_intent')
+        if intent['status'] != 'succeeded':
+            raise StripeMockError(400, 'This PaymentIntent does not have a successful charge to refund.', 'charge_not_refundable')
+
+        amount = int(params.get('amount') or intent['amount'])
+        charge = self.objects[intent['latest_charge']]
+        charge['refunded'] = True
+
+        destination = (intent.get('transfer_data') or {}).get('destination')
+        if destination and params.get('reverse_transfer') in ('true', True):
+            seller_amount = amount - (intent.get('application_fee_amount') or 0)
+            self.balances.setdefault(destination, {'available': 0, 'pending': 0})['pending'] -= seller_amount
+
+        refund = {
+            'id': self._new_id('re'),
+            'object': 'refund',
+            'amount': amount,
+            'currency': intent['currency'],
+            'charge': charge['id'],
+            'payment_intent': intent['id'],
+            'reason': params.get('reason'),
+            'status': 'succeeded',
+            'metadata': params.get('metadata', {}),
+            'created': int(time.time()),
+        }
+        self.objects[refund['id']] = refund
+        return refund
+
+    def retrieve_balance(self, params, headers):
+        account_id = headers.get('Stripe-Account')
+        balance = self.balances.get(account_id, {'available': 0, 'pending': 0})
+        return {
+            'object': 'balance',
+            'available': [{'amount': balance['available'], 'currency': 'usd'}],
+            'pending': [{'amount': balance['pending'], 'currency': 'usd'}],
+            'livemode': False,
+        }
+
+    def list_balance_transactions(self, params, headers):
+        account_id = headers.get('Stripe-Account')
+        limit = int(params.get('limit', 10))
+        transaction_ids = self.account_transactions.get(account_id, [])
+        data = [self.objects[txn_id] for txn_id in reversed(transaction_ids)][:limit]
+        return {
+            'object': 'list',
+            'data': data,
+            'has_more': len(transaction_ids) > limit,
+            'url': '/v1/balance_transactions',
+        }
+
+    # ------------------------------------------------------------------
+    # Webhooks
+    # ------------------------------------------------------------------
+
+    def build_event(self, event_type: str, data_object: Dict) -> Dict:
+        return {
+            'id': self._new_id('evt'),
+            'object': 'event',
+            'type': event_type,
+            'created': int(time.time()),
+            'livemode': False,
+            'api_version': '2024-06-20',
+            'data': {'object': copy.deepcopy(data_object)},
+        }
+
+    def webhook_request(self, event: Dict, secret: Optional[str] = None) -> Tuple[bytes, Dict[str, str]]:
+        """Serialize and sign an event the way Stripe delivers it to /payments/webhook"""
+        payload = json.dumps(event).encode('utf-8')
+        return payload, {
+            'Content-Type': 'application/json',
+            'Stripe-Signature': sign_webhook_payload(payload, secret or self.webhook_secret),
+        }
+
+
+class StripeMockRequestHandler(BaseHTTPRequestHandler):
+    stripe_mock: StripeMock = None
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # Keep-alive + Nagle adds ~40ms per call via delayed ACKs
+
+    def _handle(self, method):
+        url = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8') if length else ''
+
+        pairs = parse_qsl(url.query, keep_blank_values=True) + parse_qsl(body, keep_blank_values=True)
+        status, payload = self.stripe_mock.dispatch(method, url.path, decode_form(pairs), dict(self.headers))
+
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Request-Id', f"req_{secrets.token_hex(8)}")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local Stripe stand-in server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=12111)
+    parser.add_argument('--latency', default='fixed:0', help='fixed:50, uniform:20:80, normal:50:10 or lognormal:50:0.5 (ms)')
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--failure-status', type=int, default=500)
+    parser.add_argument('--fail-paths', default=None, help='Regex of request paths eligible for injected failures')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--webhook-secret', default='whsec_mock')
+    args = parser.parse_args()
+
+    mock = StripeMock(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        failure_rate=args.failure_rate,
+        failure_status=args.failure_status,
+        fail_paths=args.fail_paths,
+        seed=args.seed,
+        webhook_secret=args.webhook_secret
+    )
+    print(f"🧪 Stripe mock listening on {mock.start()}")
+    print(f"   Set STRIPE_API_BASE={mock.base_url} and STRIPE_WEBHOOK_SECRET={args.webhook_secret}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        mock.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Add composite indexes for the marketplace and stub collection queries
+
+Revision ID: 3c5e1f7a9b2d
+Revises: 8a16549428be
+Create Date: 2026-10-19 16:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c5e1f7a9b2d'
+down_revision = '8a16549428be'
+branch_labels = None
+depends_on = None
+
+
+# name, table, columns (each matched to a query shape, see the model __table_args__)
+INDEXES = [
+    ('ix_stub_user_id_created_at', 'stub', ['user_id', sa.text('created_at DESC')]),
+    ('ix_stub_listing_status_listed_at', 'stub_listing', ['status', sa.text('listed_at DESC')]),
+    ('ix_stub_listing_seller_id_status_listed_at', 'stub_listing', ['seller_id', 'status', 'listed_at']),
+    ('ix_stub_listing_stub_id_status', 'stub_listing', ['stub_id', 'status']),
+]
+
+
+def _concurrently():
+    # PostgreSQL can build indexes without blocking writes, but not inside a transaction
+    return op.get_context().dialect.name == 'postgresql'
+
+
+def upgrade():
+    concurrently = _concurrently()
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=concurrently)
+
+        # Leading column of ix_stub_listing_status_listed_at; one less index to maintain on writes
+        op.drop_index('ix_stub_listing_status', table_name='stub_listing', postgresql_concurrently=concurrently)
+
+
+def downgrade():
+    concurrently = _concurrently()
+    with op.get_context().autocommit_block():
+        op.create_index('ix_stub_listing_status', 'stub_listing', ['status'], unique=False,
+                        postgresql_concurrently=concurrently)
+
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=concurrently)
@@ -0,0 +1,49 @@
+"""Enforce one open (active or payment_pending) listing per stub with a partial unique index
+
+Revision ID: 5d2a8c4e6f10
+Revises: 3c5e1f7a9b2d
+Create Date: 2026-10-19 16:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2a8c4e6f10'
+down_revision = '3c5e1f7a9b2d'
+branch_labels = None
+depends_on = None
+
+
+INDEX_NAME = 'uq_stub_listing_open_stub_id'
+OPEN_WHERE = sa.text("status IN ('active', 'payment_pending')")
+
+
+def upgrade():
+    conn = op.get_bind()
+    duplicates = conn.execute(sa.text(
+        "SELECT stub_id, COUNT(*) FROM stub_listing "
+        "WHERE status IN ('active', 'payment_pending') "
+        "GROUP BY stub_id HAVING COUNT(*) > 1"
+    )).fetchall()
+    if duplicates:
+        stub_ids = ', '.join(str(row[0]) for row in duplicates)
+        raise RuntimeError(
+            f"Cannot create {INDEX_NAME}: stubs {stub_ids} have more than one open listing. "
+            "Cancel the extra listings (status = 'cancelled') and rerun the migration."
+        )
+
+    concurrently = op.get_context().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        op.create_index(
+            INDEX_NAME, 'stub_listing', ['stub_id'], unique=True,
+            sqlite_where=OPEN_WHERE, postgresql_where=OPEN_WHERE,
+            postgresql_concurrently=concurrently
+        )
+
+
+def downgrade():
+    concurrently = op.get_context().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        op.drop_index(INDEX_NAME, table_name='stub_listing', postgresql_concurrently=concurrently)
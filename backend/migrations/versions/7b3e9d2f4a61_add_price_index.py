@@ -0,0 +1,52 @@
+"""Add price_index: sold and listed price aggregates per event, venue and month
+
+Revision ID: 7b3e9d2f4a61
+Revises: 5d2a8c4e6f10
+Create Date: 2026-10-19 18:05:00.000000
+
+Backfill existing listings after upgrading with `flask rebuild-price-index`.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b3e9d2f4a61'
+down_revision = '5d2a8c4e6f10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # create_app() runs db.create_all(), so the table may exist before this migration runs
+    inspector = sa.inspect(op.get_bind())
+    if 'price_index' in inspector.get_table_names():
+        if 'uq_price_index_bucket' not in {index['name'] for index in inspector.get_indexes('price_index')}:
+            op.create_index('uq_price_index_bucket', 'price_index', ['event_key', 'venue_key', 'event_month'], unique=True)
+        return
+
+    op.create_table('price_index',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('event_key', sa.String(length=255), nullable=False),
+    sa.Column('venue_key', sa.String(length=255), nullable=False),
+    sa.Column('event_month', sa.String(length=7), nullable=False),
+    sa.Column('sold_count', sa.Integer(), nullable=False),
+    sa.Column('sold_total_cents', sa.BigInteger(), nullable=False),
+    sa.Column('sold_min_cents', sa.Integer(), nullable=True),
+    sa.Column('sold_max_cents', sa.Integer(), nullable=True),
+    sa.Column('last_sold_cents', sa.Integer(), nullable=True),
+    sa.Column('last_sold_at', sa.DateTime(), nullable=True),
+    sa.Column('listed_count', sa.Integer(), nullable=False),
+    sa.Column('listed_total_cents', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('price_index', schema=None) as batch_op:
+        batch_op.create_index('uq_price_index_bucket', ['event_key', 'venue_key', 'event_month'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('price_index', schema=None) as batch_op:
+        batch_op.drop_index('uq_price_index_bucket')
+
+    op.drop_table('price_index')
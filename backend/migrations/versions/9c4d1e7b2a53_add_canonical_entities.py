@@ -0,0 +1,57 @@
+"""Add canonical_entity and stub.event_id / stub.venue_id
+
+Revision ID: 9c4d1e7b2a53
+Revises: 7b3e9d2f4a61
+Create Date: 2026-10-19 19:20:00.000000
+
+Backfill existing stubs after upgrading with `flask canonicalize-stubs`
+(it also rebuilds the price index on canonical keys).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4d1e7b2a53'
+down_revision = '7b3e9d2f4a61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # create_app() runs db.create_all(), so the table may exist before this migration runs
+    inspector = sa.inspect(op.get_bind())
+    if 'canonical_entity' not in inspector.get_table_names():
+        op.create_table('canonical_entity',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=10), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('match_key', sa.String(length=255), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if 'uq_canonical_entity_kind_match_key' not in {index['name'] for index in inspector.get_indexes('canonical_entity')}:
+        op.create_index('uq_canonical_entity_kind_match_key', 'canonical_entity', ['kind', 'match_key'], unique=True)
+
+    with op.batch_alter_table('stub', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('event_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('venue_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_stub_event_id'), ['event_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_stub_venue_id'), ['venue_id'], unique=False)
+        batch_op.create_foreign_key('fk_stub_event_id_canonical_entity', 'canonical_entity', ['event_id'], ['id'])
+        batch_op.create_foreign_key('fk_stub_venue_id_canonical_entity', 'canonical_entity', ['venue_id'], ['id'])
+
+
+def downgrade():
+    with op.batch_alter_table('stub', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_stub_venue_id_canonical_entity', type_='foreignkey')
+        batch_op.drop_constraint('fk_stub_event_id_canonical_entity', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_stub_venue_id'))
+        batch_op.drop_index(batch_op.f('ix_stub_event_id'))
+        batch_op.drop_column('venue_id')
+        batch_op.drop_column('event_id')
+
+    with op.batch_alter_table('canonical_entity', schema=None) as batch_op:
+        batch_op.drop_index('uq_canonical_entity_kind_match_key')
+
+    op.drop_table('canonical_entity')